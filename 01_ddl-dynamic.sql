@@ -341,6 +341,7 @@ COMMENT ON COLUMN dynamic.dp_price_change_history.base_price_choice IS 'Source o
 -- Create indexes for efficient querying
 CREATE INDEX IF NOT EXISTS idx_dp_price_change_history_latest ON dynamic.dp_price_change_history(property_id, checkin_date, as_of DESC);
 CREATE INDEX IF NOT EXISTS idx_dp_price_change_history_date ON dynamic.dp_price_change_history(checkin_date);
+CREATE INDEX IF NOT EXISTS idx_dp_price_change_history_as_of ON dynamic.dp_price_change_history(property_id, as_of DESC);
 
 -- ============================================================================
 -- NEW TABLES ADDED TO MATCH DJANGO MODELS
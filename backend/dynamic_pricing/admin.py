@@ -3,8 +3,9 @@ from .models import (
     Property, PropertyManagementSystem, DpGeneralSettings, DpPropertyCompetitor,
     DpDynamicIncrementsV2, DpOfferIncrements, DpLosSetup, DpLosReduction,
     DpMinimumSellingPrice, DpRoomRates, DpPriceChangeHistory,
-    UnifiedRoomsAndRates, Competitor, OverwritePriceHistory
+    UnifiedRoomsAndRates, Competitor, OverwritePriceHistory, DpRoomClassMapping, DpFxRate
 )
+from .room_classes import invalidate_room_classes
 
 
 @admin.register(PropertyManagementSystem)
@@ -24,8 +25,8 @@ class CompetitorAdmin(admin.ModelAdmin):
 
 @admin.register(Property)
 class PropertyAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'pms_name', 'city', 'country', 'is_active', 'created_at')
-    list_filter = ('pms_name', 'is_active', 'created_at')
+    list_display = ('id', 'name', 'pms_name', 'city', 'country', 'currency', 'is_active', 'created_at')
+    list_filter = ('pms_name', 'currency', 'is_active', 'created_at')
     search_fields = ('name', 'city', 'country')
     readonly_fields = ('created_at', 'updated_at')
     ordering = ('name',)
@@ -144,6 +145,39 @@ class OverwritePriceHistoryAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(DpRoomClassMapping)
+class DpRoomClassMappingAdmin(admin.ModelAdmin):
+    list_display = ('room_name', 'room_class', 'is_manual', 'updated_at')
+    list_filter = ('room_class', 'is_manual')
+    search_fields = ('room_name',)
+    readonly_fields = ('created_at', 'updated_at')
+    ordering = ('room_name',)
+
+    def save_model(self, request, obj, form, change):
+        # Corrections made here are kept by later syncs
+        obj.is_manual = True
+        super().save_model(request, obj, form, change)
+        invalidate_room_classes()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate_room_classes()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        invalidate_room_classes()
+
+
+@admin.register(DpFxRate)
+class DpFxRateAdmin(admin.ModelAdmin):
+    list_display = ('rate_date', 'currency', 'rate', 'source', 'updated_at')
+    list_filter = ('currency',)
+    search_fields = ('currency', 'source')
+    readonly_fields = ('created_at', 'updated_at')
+    date_hierarchy = 'rate_date'
+    ordering = ('-rate_date', 'currency')
+
+
 # Register the models
 admin.site.register(DpDynamicIncrementsV2, DpDynamicIncrementsV2Admin)
 # Note: DpPriceChangeHistory is unmanaged (external schema) - only for read operations
@@ -0,0 +1,210 @@
+"""
+Portfolio Batch Repricing
+
+Computes the recommended prices of many properties with the vectorized pricing
+engine and appends them to price_change_history as one pricing run (one as_of).
+
+The rule tables of all properties are loaded in bulk up front
+(load_portfolio_rule_rows); properties are then priced in chunks
+(reprice_chunk), each chunk loading its own inputs and writing its rows, so
+chunks can run in parallel worker processes (see the reprice_portfolio command).
+Rows are written with COPY on PostgreSQL and with bulk_create elsewhere; the
+current price calendar projection of every property is refreshed right after its
+rows are written, which also invalidates its cached calendar responses.
+"""
+
+import logging
+import math
+from datetime import timedelta
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import DpPriceChangeHistory, Property
+from .price_calendar import refresh_current_price_calendar
+from .pricing_engine import (
+    BASE_PRICE_COMPETITOR, BASE_PRICE_MANUAL, compute_recommended_prices, load_portfolio_rule_rows,
+    load_pricing_inputs, rules_from_rows
+)
+
+logger = logging.getLogger(__name__)
+
+# price_change_history columns written by a pricing run, in COPY order
+PRICE_HISTORY_COLUMNS = [
+    'property_id', 'user_id', 'checkin_date', 'as_of', 'occupancy', 'pms_hotel_id', 'msp',
+    'recom_price', 'recom_los', 'base_price', 'base_price_choice',
+]
+
+
+def get_portfolio_jobs(property_ids=None):
+    """
+    Build one pricing job per active property (eight queries in total).
+
+    A job is a picklable dict with the property id, its pms_hotel_id, the owner
+    user id written to price_change_history and its rule set. Properties without
+    an owner profile are skipped, since every history row needs a user.
+
+    Returns:
+        list: job dicts ordered by property id
+    """
+    properties = Property.objects.filter(is_active=True)
+    if property_ids:
+        properties = properties.filter(id__in=property_ids)
+    pms_hotel_ids = dict(properties.order_by('id').values_list('id', 'pms_hotel_id'))
+
+    owners = {}
+    for property_id, user_id in (
+        Property.profiles.through.objects
+        .filter(property_id__in=list(pms_hotel_ids))
+        .order_by('id')
+        .values_list('property_id', 'profile__user_id')
+    ):
+        owners.setdefault(property_id, user_id)
+
+    missing = [property_id for property_id in pms_hotel_ids if property_id not in owners]
+    if missing:
+        logger.warning(f"Skipping {len(missing)} property(ies) without an owner: {', '.join(missing[:10])}")
+
+    rule_rows = load_portfolio_rule_rows(owners)
+    return [
+        {
+            'property_id': property_id,
+            'pms_hotel_id': pms_hotel_ids[property_id] or '',
+            'user_id': owners[property_id],
+            'rules': rules_from_rows(rule_rows[property_id]),
+        }
+        for property_id in pms_hotel_ids
+        if property_id in owners
+    ]
+
+
+def chunk_jobs(jobs, chunk_size):
+    """
+    Split jobs into chunks of at most chunk_size, for distribution across workers.
+    """
+    return [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+
+
+def build_price_history_rows(job, start_date, result, as_of):
+    """
+    Convert a compute_recommended_prices result into PRICE_HISTORY_COLUMNS tuples.
+
+    Dates without a recommended price (no market price and no MSP) are left out.
+    """
+    rows = []
+    for i in range(len(result['recom_price'])):
+        recom_price = result['recom_price'][i]
+        if math.isnan(recom_price):
+            continue
+        occupancy = result['occupancy'][i]
+        msp = result['msp'][i]
+        rows.append((
+            job['property_id'],
+            job['user_id'],
+            start_date + timedelta(days=i),
+            as_of,
+            None if math.isnan(occupancy) else round(float(occupancy), 2),
+            job['pms_hotel_id'],
+            0 if math.isnan(msp) else int(msp),
+            int(recom_price),
+            int(result['recom_los'][i]),
+            int(round(result['base_price'][i])),
+            BASE_PRICE_COMPETITOR if result['base_is_competitor'][i] else BASE_PRICE_MANUAL,
+        ))
+    return rows
+
+
+def write_price_history_rows(rows, batch_size=10000):
+    """
+    Append rows to price_change_history, with COPY on PostgreSQL and bulk_create elsewhere.
+
+    Returns:
+        int: Number of rows written
+    """
+    if not rows:
+        return 0
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            columns = ', '.join(PRICE_HISTORY_COLUMNS)
+            with connection.cursor() as cursor:
+                with cursor.copy(f"COPY {DpPriceChangeHistory._meta.db_table} ({columns}) FROM STDIN") as copy:
+                    for row in rows:
+                        copy.write_row(row)
+        else:
+            fields = [
+                'property_id_id' if column == 'property_id' else column
+                for column in PRICE_HISTORY_COLUMNS
+            ]
+            DpPriceChangeHistory.objects.bulk_create(
+                [DpPriceChangeHistory(**dict(zip(fields, row))) for row in rows],
+                batch_size=batch_size,
+            )
+    return len(rows)
+
+
+def publish_price_history_rows(rows, property_ids, batch_size=10000):
+    """
+    Write the rows of a batch of properties, then refresh their current price calendar.
+
+    Refreshing the projection makes the run visible to the calendar, ETag and export
+    endpoints right away and invalidates the properties' cached calendar responses.
+
+    Returns:
+        int: Number of rows written
+    """
+    written = write_price_history_rows(rows, batch_size)
+    for property_id in property_ids:
+        refresh_current_price_calendar(property_id)
+    return written
+
+
+def reprice_chunk(jobs, start_date, as_of, days=None, batch_size=10000, dry_run=False, today=None):
+    """
+    Price a chunk of properties and write their rows in batches of batch_size.
+
+    Runs in the calling process, so it can be used directly or as a pool task.
+
+    Args:
+        start_date: First date to price
+        days: Dates per property (default: each property's future_days_to_price)
+        dry_run: Compute without writing
+        today: Date lead times count from (default: today)
+
+    Returns:
+        dict: {'properties': int, 'property_days': int, 'rows': int, 'errors': [(property_id, message)]}
+    """
+    today = today or timezone.now().date()
+    stats = {'properties': 0, 'property_days': 0, 'rows': 0, 'errors': []}
+    pending = []
+    pending_properties = []
+    for job in jobs:
+        try:
+            rules = job['rules']
+            property_days = days or rules['future_days_to_price']
+            occupancy, market_price = load_pricing_inputs(job['property_id'], start_date, property_days, rules)
+            result = compute_recommended_prices(start_date, occupancy, market_price, rules, today=today)
+            pending.extend(build_price_history_rows(job, start_date, result, as_of))
+            pending_properties.append(job['property_id'])
+            stats['properties'] += 1
+            stats['property_days'] += property_days
+        except Exception as e:
+            logger.error(f"Error repricing property {job['property_id']}: {str(e)}", exc_info=True)
+            stats['errors'].append((job['property_id'], str(e)))
+            continue
+
+        if len(pending) >= batch_size:
+            stats['rows'] += len(pending) if dry_run else publish_price_history_rows(pending, pending_properties, batch_size)
+            pending = []
+            pending_properties = []
+
+    stats['rows'] += len(pending) if dry_run else publish_price_history_rows(pending, pending_properties, batch_size)
+    return stats
+
+
+def merge_stats(totals, stats):
+    """
+    Add the reprice_chunk stats of one chunk to the running totals.
+    """
+    for key in ('properties', 'property_days', 'rows'):
+        totals[key] += stats[key]
+    totals['errors'].extend(stats['errors'])
+    return totals
@@ -0,0 +1,122 @@
+"""
+Columnar Calendar Responses
+
+Opt-in compact encoding for the calendar endpoints (?format=columnar). Instead of
+one object per day, responses carry parallel arrays: dates as a start date plus
+day offsets, prices as integers and occupancy levels as small codes. Year views
+shrink several-fold because keys are no longer repeated per day.
+
+The format is negotiated through DRF's ?format= override: views list
+ColumnarJSONRenderer in their renderer classes and check wants_columnar(request).
+"""
+
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+COLUMNAR_FORMAT = 'columnar'
+
+# Occupancy level codes, index = code
+OCCUPANCY_LEVELS = ['low', 'medium', 'high']
+OCCUPANCY_LEVEL_CODES = {level: code for code, level in enumerate(OCCUPANCY_LEVELS)}
+
+# Competitor prices are sent as integer cents
+COMPETITOR_PRICE_SCALE = 100
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """
+    JSON renderer selected by ?format=columnar.
+
+    Rendering is plain JSON; views build the columnar payload when this renderer
+    was accepted.
+    """
+    format = COLUMNAR_FORMAT
+
+
+# Renderer classes for views supporting the columnar format
+CALENDAR_RENDERER_CLASSES = [*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer]
+
+
+def wants_columnar(request):
+    """
+    Return True if the request negotiated the columnar format.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    return renderer is not None and renderer.format == COLUMNAR_FORMAT
+
+
+def encode_date_offsets(iso_dates):
+    """
+    Encode ISO date strings as (start_date, day offsets from start_date).
+    """
+    if not iso_dates:
+        return None, []
+    dates = [date.fromisoformat(value) for value in iso_dates]
+    start = dates[0]
+    return start.isoformat(), [(d - start).days for d in dates]
+
+
+def encode_price_history_columnar(entries):
+    """
+    Encode price history entries (see encode_price_history_rows) as parallel arrays.
+
+    Returns:
+        dict: {
+            "start_date": "2025-01-01",
+            "day_offsets": [0, 1, ...],
+            "prices": [120, 135, ...],
+            "occupancy_levels": [1, 2, ...],      # codes into occupancy_level_codes
+            "overwrites": [0, 1, ...],
+            "occupancy": [52.5, 80.0, ...],
+            "occupancy_level_codes": ["low", "medium", "high"]
+        }
+    """
+    start_date, offsets = encode_date_offsets([entry['checkin_date'] for entry in entries])
+    return {
+        'start_date': start_date,
+        'day_offsets': offsets,
+        'prices': [entry['price'] for entry in entries],
+        'occupancy_levels': [OCCUPANCY_LEVEL_CODES[entry['occupancy_level']] for entry in entries],
+        'overwrites': [int(entry['overwrite']) for entry in entries],
+        'occupancy': [entry['occupancy'] for entry in entries],
+        'occupancy_level_codes': OCCUPANCY_LEVELS,
+    }
+
+
+def to_price_cents(price):
+    """
+    Convert a competitor price (Decimal/float/int or None) to integer cents.
+    """
+    if price is None:
+        return None
+    cents = Decimal(str(price)) * COMPETITOR_PRICE_SCALE
+    return int(cents.quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def encode_competitor_chart_columnar(iso_dates, competitors_data):
+    """
+    Encode the competitor weekly chart as parallel arrays.
+
+    Returns:
+        dict: {
+            "start_date": "2024-06-10",
+            "day_offsets": [0, 1, ...],
+            "price_scale": 100,
+            "competitor_ids": [1, ...],
+            "competitor_names": ["Hotel X", ...],
+            "prices": [[5600, null, ...], ...],   # integer cents, one row per competitor
+            "sold_out": [[0, 1, ...], ...]
+        }
+    """
+    start_date, offsets = encode_date_offsets(iso_dates)
+    return {
+        'start_date': start_date,
+        'day_offsets': offsets,
+        'price_scale': COMPETITOR_PRICE_SCALE,
+        'competitor_ids': [comp['id'] for comp in competitors_data],
+        'competitor_names': [comp['name'] for comp in competitors_data],
+        'prices': [[to_price_cents(price) for price in comp['prices']] for comp in competitors_data],
+        'sold_out': [[int(flag) for flag in comp['sold_out']] for comp in competitors_data],
+    }
@@ -0,0 +1,239 @@
+"""
+Competitor Price Change Detection
+
+Incremental detector for material competitor price moves on future dates. Each
+run reads only historical_competitor_prices rows with update_tz past the
+watermark (the newest source_update_tz in DpCompetitorPriceState), reduces the
+latest scrape of every (competitor, checkin_date) to its best price, compares it
+with the stored state and upserts the state. Changes above the threshold become
+competitor notifications for every user following the competitor, inserted in
+bulk (one notification per property and competitor per run).
+
+The first run only builds the state, since there is no previous price to compare.
+"""
+
+import logging
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from profiles.notification_utils import create_notifications_in_bulk
+from .market import reduce_best_prices
+from .models import DpCompetitorPriceState, DpHistoricalCompetitorPrice, DpPropertyCompetitor
+
+logger = logging.getLogger(__name__)
+
+# Minimum absolute price change, in percent, that raises a notification
+DEFAULT_CHANGE_THRESHOLD = 10.0
+
+# Changes listed in a notification's metadata / description
+MAX_CHANGES_IN_METADATA = 50
+MAX_CHANGES_IN_DESCRIPTION = 3
+
+SCRAPE_FIELDS = ['competitor_id', 'checkin_date', 'price', 'sold_out_message', 'scrape_date', 'update_tz']
+
+
+def get_change_watermark():
+    """
+    Return the newest scrape update_tz already processed, or None before the first run.
+    """
+    return DpCompetitorPriceState.objects.aggregate(watermark=Max('source_update_tz'))['watermark']
+
+
+def collect_latest_scrapes(rows):
+    """
+    Keep only the rows of the latest scrape_date per (competitor, checkin_date).
+
+    Args:
+        rows: Iterable of dicts with SCRAPE_FIELDS
+
+    Returns:
+        dict: {(competitor_id, checkin_date): {'scrape_date', 'update_tz', 'rows': [...]}}
+    """
+    scrapes = {}
+    for row in rows:
+        key = (row['competitor_id'], row['checkin_date'])
+        scrape = scrapes.get(key)
+        if scrape is None or row['scrape_date'] > scrape['scrape_date']:
+            scrapes[key] = {'scrape_date': row['scrape_date'], 'update_tz': row['update_tz'], 'rows': [row]}
+        elif row['scrape_date'] == scrape['scrape_date']:
+            scrape['rows'].append(row)
+            scrape['update_tz'] = max(scrape['update_tz'], row['update_tz'])
+    return scrapes
+
+
+def get_price_change(previous_price, price, threshold):
+    """
+    Return the change in percent between two best prices if it reaches the threshold, else None.
+
+    Sold-out or unpriced days (None) never count as a price change.
+    """
+    if not previous_price or not price:
+        return None
+    change_pct = (price - previous_price) / previous_price * 100
+    if abs(change_pct) < threshold:
+        return None
+    return round(change_pct, 1)
+
+
+def detect_price_changes(threshold=DEFAULT_CHANGE_THRESHOLD, batch_size=1000):
+    """
+    Process new scrape rows, update the price state and return the material changes.
+
+    Args:
+        threshold: Minimum absolute change in percent
+        batch_size: State rows upserted per query
+
+    Returns:
+        tuple: (list of change dicts with competitor_id, checkin_date, previous_price,
+        price and change_pct; stats dict with rows, states, watermark)
+    """
+    watermark = get_change_watermark()
+    new_rows = DpHistoricalCompetitorPrice.objects.filter(checkin_date__gte=timezone.now().date())
+    if watermark is not None:
+        new_rows = new_rows.filter(update_tz__gt=watermark)
+
+    row_count = 0
+
+    def counted(rows):
+        nonlocal row_count
+        for row in rows:
+            row_count += 1
+            yield row
+
+    scrapes = collect_latest_scrapes(counted(new_rows.values(*SCRAPE_FIELDS).iterator(chunk_size=5000)))
+    stats = {'rows': row_count, 'states': 0, 'watermark': watermark}
+    if not scrapes:
+        return [], stats
+
+    price_map = reduce_best_prices(row for scrape in scrapes.values() for row in scrape['rows'])
+
+    competitor_ids = {competitor_id for competitor_id, _ in scrapes}
+    dates = [checkin_date for _, checkin_date in scrapes]
+    states = {
+        (state.competitor_id, state.checkin_date): state
+        for state in DpCompetitorPriceState.objects.filter(
+            competitor_id__in=competitor_ids,
+            checkin_date__gte=min(dates),
+            checkin_date__lte=max(dates),
+        )
+    }
+
+    changes = []
+    updated_states = []
+    for (competitor_id, checkin_date), scrape in scrapes.items():
+        state = states.get((competitor_id, checkin_date))
+        # Late rows of an older scrape never overwrite a newer state
+        if state is not None and state.scrape_date > scrape['scrape_date']:
+            continue
+
+        day = price_map[int(competitor_id)][checkin_date]
+        price = day['best_price']
+        if state is not None:
+            change_pct = get_price_change(state.best_price, price, threshold)
+            if change_pct is not None:
+                changes.append({
+                    'competitor_id': competitor_id,
+                    'checkin_date': checkin_date,
+                    'previous_price': state.best_price,
+                    'price': price,
+                    'change_pct': change_pct,
+                })
+
+        updated_states.append(DpCompetitorPriceState(
+            competitor_id=competitor_id,
+            checkin_date=checkin_date,
+            best_price=price,
+            sold_out=price is None and day['sold_out'],
+            scrape_date=scrape['scrape_date'],
+            source_update_tz=scrape['update_tz'],
+        ))
+
+    with transaction.atomic():
+        DpCompetitorPriceState.objects.bulk_create(
+            updated_states,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['competitor', 'checkin_date'],
+            update_fields=['best_price', 'sold_out', 'scrape_date', 'source_update_tz', 'updated_at'],
+        )
+    stats['states'] = len(updated_states)
+    return changes, stats
+
+
+def _format_change(change):
+    sign = '+' if change['change_pct'] > 0 else ''
+    return (
+        f"{change['checkin_date'].strftime('%b %d, %Y')}: {change['previous_price']:.2f} to "
+        f"{change['price']:.2f} ({sign}{change['change_pct']}%)"
+    )
+
+
+def build_change_notifications(changes, threshold=DEFAULT_CHANGE_THRESHOLD):
+    """
+    Build one competitor notification per following property and competitor.
+
+    Returns:
+        list: create_notifications_in_bulk entries
+    """
+    changes_by_competitor = {}
+    for change in changes:
+        changes_by_competitor.setdefault(change['competitor_id'], []).append(change)
+
+    links = (
+        DpPropertyCompetitor.objects
+        .filter(competitor_id__in=changes_by_competitor.keys(), deleted_at__isnull=True)
+        .select_related('property_id', 'competitor')
+    )
+    entries = []
+    for link in links:
+        competitor_changes = sorted(
+            changes_by_competitor[link.competitor_id],
+            key=lambda change: (-abs(change['change_pct']), change['checkin_date'])
+        )
+        largest = competitor_changes[0]
+        description = '; '.join(_format_change(change) for change in competitor_changes[:MAX_CHANGES_IN_DESCRIPTION])
+        if len(competitor_changes) > MAX_CHANGES_IN_DESCRIPTION:
+            description += f"; and {len(competitor_changes) - MAX_CHANGES_IN_DESCRIPTION} more date(s)"
+
+        entries.append({
+            'user': link.user_id,
+            'notification_type': 'info',
+            'title': f"{link.competitor.competitor_name} changed prices for {len(competitor_changes)} date(s)",
+            'description': f"Price changes of at least {threshold:g}% for {link.property_id.name}: {description}.",
+            'category': 'competitor',
+            'priority': 'high' if abs(largest['change_pct']) >= 2 * threshold else 'medium',
+            'action_url': '/dashboard/competitors',
+            'metadata': {
+                'property_id': str(link.property_id_id),
+                'property_name': link.property_id.name,
+                'competitor_id': link.competitor_id,
+                'competitor_name': link.competitor.competitor_name,
+                'threshold': threshold,
+                'changes': [
+                    {**change, 'checkin_date': change['checkin_date'].isoformat()}
+                    for change in competitor_changes[:MAX_CHANGES_IN_METADATA]
+                ],
+                'notification_type': 'competitor_price_change',
+            },
+        })
+    return entries
+
+
+def process_competitor_price_changes(threshold=DEFAULT_CHANGE_THRESHOLD, notify=True, batch_size=1000):
+    """
+    Run one incremental detection pass and raise the notifications.
+
+    Returns:
+        dict: {'rows': int, 'states': int, 'changes': int, 'notifications': int, 'watermark': datetime or None}
+    """
+    changes, stats = detect_price_changes(threshold=threshold, batch_size=batch_size)
+    entries = build_change_notifications(changes, threshold) if changes else []
+    notifications = create_notifications_in_bulk(entries) if notify and entries else []
+
+    stats.update(changes=len(changes), notifications=len(notifications) if notify else len(entries))
+    logger.info(
+        f"Competitor price change pass: {stats['rows']} new rows, {stats['states']} states, "
+        f"{stats['changes']} changes, {stats['notifications']} notifications (watermark={stats['watermark']})"
+    )
+    return stats
@@ -0,0 +1,108 @@
+"""
+Conditional GET Helpers
+
+Cheap ETag validators for the calendar and competitor endpoints. Validators are
+built from aggregates that only change when the underlying data changes (newest
+as_of snapshot, newest overwrite, newest scrape update_tz), so a matching
+If-None-Match can be answered with 304 before any rows are loaded or serialized.
+"""
+
+import hashlib
+from django.db.models import Count, Max
+from django.utils.cache import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import DpPriceChangeHistory, OverwritePriceHistory, CompetitorPriceMV
+
+
+def compute_etag(*parts):
+    """
+    Build a weak ETag from the given validator parts.
+    """
+    digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request, etag):
+    """
+    Return True if the request's If-None-Match header matches the ETag (weak comparison).
+    """
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    candidates = parse_etags(header)
+    if '*' in candidates:
+        return True
+    opaque = etag.removeprefix('W/')
+    return any(candidate.removeprefix('W/') == opaque for candidate in candidates)
+
+
+def with_etag(response, etag):
+    """
+    Attach the ETag to a response and ask clients to revalidate before reuse.
+    """
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def not_modified_response(etag):
+    """
+    Return an empty 304 Not Modified response carrying the ETag.
+    """
+    return with_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+
+def get_price_history_validator(property_id, start_date, end_date):
+    """
+    Return validator parts for price calendar responses of a property and date range.
+
+    Combines the newest as_of snapshot in the range with the newest overwrite update
+    (and the overwrite count, so removed overwrites also change the validator). Both
+    are read from the source tables (two indexed aggregates), never from a cache, so
+    a 304 is only returned when the data really is unchanged.
+    """
+    history = (
+        DpPriceChangeHistory.objects
+        .filter(
+            property_id=property_id,
+            checkin_date__gte=start_date,
+            checkin_date__lte=end_date,
+        )
+        .aggregate(latest_as_of=Max('as_of'))
+    )
+    overwrites = (
+        OverwritePriceHistory.objects
+        .filter(
+            property_id=property_id,
+            checkin_date__gte=start_date,
+            checkin_date__lte=end_date,
+        )
+        .aggregate(latest_update=Max('updated_at'), count=Count('id'))
+    )
+    return (
+        history['latest_as_of'],
+        overwrites['latest_update'],
+        overwrites['count'],
+    )
+
+
+def get_competitor_prices_validator(competitors, mv_filter):
+    """
+    Return validator parts for competitor price responses.
+
+    Args:
+        competitors: Competitor instances shown in the response (ids and names are part of the validator)
+        mv_filter: dict of CompetitorPriceMV filter kwargs selecting the rows behind the response
+    """
+    scrape = (
+        CompetitorPriceMV.objects
+        .filter(**mv_filter)
+        .aggregate(latest_update=Max('update_tz'), count=Count('*'))
+    )
+    return (
+        tuple(sorted((comp.id, comp.competitor_name) for comp in competitors)),
+        scrape['latest_update'],
+        scrape['count'],
+    )
@@ -0,0 +1,255 @@
+"""
+Currency Normalization
+
+Converts competitor prices (historical_competitor_prices / comp_prices_mv carry
+the scraped currency per row) to the property currency with the local FX rates
+in DpFxRate, loaded from a file by the load_fx_rates management command.
+
+Rates are quoted per 1 unit of FX_BASE_CURRENCY (EUR). A conversion uses the
+latest rate on or before the rate date, at most FX_RATE_MAX_AGE_DAYS old, so
+weekends and holidays without a fixing use the previous one. The rates of a day
+are read with one query and cached in process (get_fx_rates), so converting the
+rows of a chart or an aggregate adds no per-row database lookups. The in-process
+entries are keyed by a version token in the shared cache, which load_fx_rates
+replaces, so rates loaded by the command reach every worker.
+"""
+
+import csv
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DpFxRate, Property
+
+logger = logging.getLogger(__name__)
+
+FX_BASE_CURRENCY = 'EUR'
+
+# Oldest rate, in days before the rate date, still used for a conversion
+FX_RATE_MAX_AGE_DAYS = 7
+
+# Days of rates kept in the in-process cache
+FX_RATE_CACHE_SIZE = 64
+
+FX_RATES_VERSION_KEY = 'fx_rates:version'
+
+# {(rate_date, version): rates}, least recently used first
+_fx_rates_cache = OrderedDict()
+
+CENT = Decimal('0.01')
+
+
+def normalize_currency(currency):
+    """
+    Return an upper-case ISO 4217 code, or None for a missing currency.
+    """
+    if not currency:
+        return None
+    currency = str(currency).strip().upper()
+    return currency or None
+
+
+def _query_fx_rates(rate_date):
+    rates = {FX_BASE_CURRENCY: Decimal(1)}
+    seen = set()
+    for currency, rate in (
+        DpFxRate.objects
+        .filter(rate_date__lte=rate_date, rate_date__gte=rate_date - timedelta(days=FX_RATE_MAX_AGE_DAYS))
+        .order_by('currency', '-rate_date')
+        .values_list('currency', 'rate')
+    ):
+        if currency not in seen:
+            seen.add(currency)
+            rates[currency] = rate
+    return rates
+
+
+def get_fx_rates_version():
+    """
+    Return the shared FX rate version token, or None if the cache is unavailable.
+    """
+    try:
+        version = cache.get(FX_RATES_VERSION_KEY)
+        if version is None:
+            version = uuid.uuid4().hex
+            cache.set(FX_RATES_VERSION_KEY, version, None)
+        return version
+    except Exception as e:
+        logger.warning(f"FX rate cache unavailable: {str(e)}")
+        return None
+
+
+def get_fx_rates(rate_date):
+    """
+    Return the latest rate of every currency on or before rate_date.
+
+    Costs one shared-cache read for the version token; the rates come from the
+    in-process LRU, or one query on a miss. Days without any rate are not cached,
+    so rates loaded later are picked up on the next call.
+
+    Returns:
+        dict: {currency: Decimal units per 1 FX_BASE_CURRENCY}, including the base currency itself
+    """
+    version = get_fx_rates_version()
+    key = (rate_date, version)
+    rates = _fx_rates_cache.get(key) if version is not None else None
+    if rates is not None:
+        _fx_rates_cache.move_to_end(key)
+        return rates
+
+    rates = _query_fx_rates(rate_date)
+    if version is not None and len(rates) > 1:
+        _fx_rates_cache[key] = rates
+        if len(_fx_rates_cache) > FX_RATE_CACHE_SIZE:
+            _fx_rates_cache.popitem(last=False)
+    return rates
+
+
+def clear_fx_rate_cache():
+    """
+    Drop the FX rates cached in this process.
+    """
+    _fx_rates_cache.clear()
+
+
+def invalidate_fx_rates():
+    """
+    Invalidate the cached FX rates of every process by replacing the version token.
+    """
+    try:
+        cache.set(FX_RATES_VERSION_KEY, uuid.uuid4().hex, None)
+    except Exception as e:
+        logger.warning(f"Could not invalidate FX rate cache: {str(e)}")
+    clear_fx_rate_cache()
+
+
+def get_fx_rate(from_currency, to_currency, rate_date=None):
+    """
+    Return the factor converting from_currency amounts to to_currency, or None without a rate.
+    """
+    from_currency = normalize_currency(from_currency)
+    to_currency = normalize_currency(to_currency)
+    if from_currency == to_currency:
+        return Decimal(1)
+    rates = get_fx_rates(rate_date or timezone.now().date())
+    if not rates.get(from_currency) or not rates.get(to_currency):
+        return None
+    return rates[to_currency] / rates[from_currency]
+
+
+def get_price_converter(to_currency, rate_date=None):
+    """
+    Build a converter of competitor prices to one currency at the rates of rate_date (default: today).
+
+    The returned convert(price, currency) leaves prices without a currency or already in
+    to_currency unchanged, converts the others (rounded to cents) and returns None when no
+    rate is available, so unconvertible prices drop out of aggregates instead of mixing in.
+    """
+    to_currency = normalize_currency(to_currency) or FX_BASE_CURRENCY
+    rate_date = rate_date or timezone.now().date()
+    factors = {}
+
+    def convert(price, currency):
+        currency = normalize_currency(currency)
+        if price is None or currency is None or currency == to_currency:
+            return price
+        if currency not in factors:
+            factors[currency] = get_fx_rate(currency, to_currency, rate_date)
+            if factors[currency] is None:
+                logger.warning(f"No FX rate {currency}->{to_currency} for {rate_date}; prices in {currency} are skipped")
+        factor = factors[currency]
+        if factor is None:
+            return None
+        return (Decimal(price) * factor).quantize(CENT, rounding=ROUND_HALF_UP)
+
+    return convert
+
+
+def get_property_currency(property_id):
+    """
+    Return the currency competitor prices of a property are normalized to.
+    """
+    currency = Property.objects.filter(id=property_id).values_list('currency', flat=True).first()
+    return normalize_currency(currency) or FX_BASE_CURRENCY
+
+
+def parse_fx_rate_file(path):
+    """
+    Parse an FX rate CSV file.
+
+    Two layouts are accepted:
+        - long: date,currency,rate rows
+        - wide: a Date column plus one column per currency (ECB eurofxref-hist.csv)
+    Rates are units per 1 EUR; empty and "N/A" cells are skipped.
+
+    Returns:
+        list: (rate_date, currency, Decimal rate) tuples
+    """
+    rows = []
+    with open(path, newline='', encoding='utf-8-sig') as handle:
+        reader = csv.DictReader(handle, skipinitialspace=True)
+        columns = {name.strip().lower(): name for name in reader.fieldnames or [] if name and name.strip()}
+        if 'date' not in columns:
+            raise ValueError(f"{path}: missing date column")
+        long_format = 'currency' in columns and 'rate' in columns
+
+        for line, record in enumerate(reader, start=2):
+            try:
+                rate_date = datetime.strptime(record[columns['date']].strip(), '%Y-%m-%d').date()
+            except (AttributeError, ValueError):
+                raise ValueError(f"{path}:{line}: invalid date, expected YYYY-MM-DD")
+            if long_format:
+                cells = [(record[columns['currency']], record[columns['rate']])]
+            else:
+                cells = [(name, record.get(name)) for key, name in columns.items() if key != 'date']
+
+            for currency, value in cells:
+                currency = normalize_currency(currency)
+                value = (value or '').strip()
+                if not currency or not value or value.upper() == 'N/A':
+                    continue
+                try:
+                    rate = Decimal(value)
+                except InvalidOperation:
+                    raise ValueError(f"{path}:{line}: invalid rate {value!r} for {currency}")
+                if rate <= 0:
+                    raise ValueError(f"{path}:{line}: rate for {currency} must be positive")
+                if len(currency) != 3:
+                    raise ValueError(f"{path}:{line}: invalid currency code {currency!r}")
+                rows.append((rate_date, currency, rate))
+    return rows
+
+
+def load_fx_rates(rows, source=None, batch_size=1000):
+    """
+    Upsert FX rates and invalidate the cached rates of every process.
+
+    Args:
+        rows: (rate_date, currency, rate) tuples, e.g. from parse_fx_rate_file
+        source: Name of the file the rates come from
+        batch_size: Rates written per query
+
+    Returns:
+        int: Number of rates inserted or updated
+    """
+    rates = [
+        DpFxRate(rate_date=rate_date, currency=currency, rate=rate, source=source)
+        for rate_date, currency, rate in rows
+        if currency != FX_BASE_CURRENCY
+    ]
+    with transaction.atomic():
+        DpFxRate.objects.bulk_create(
+            rates,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['rate_date', 'currency'],
+            update_fields=['rate', 'source', 'updated_at'],
+        )
+    invalidate_fx_rates()
+    logger.info(f"Loaded {len(rates)} FX rates from {source or 'rows'}")
+    return len(rates)
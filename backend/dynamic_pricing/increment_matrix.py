@@ -0,0 +1,226 @@
+"""
+Compiled Dynamic Increment Matrix
+
+Compiles a property's DpDynamicIncrementsV2 rows once into an IncrementMatrix:
+the (type, value) of every occupancy x lead time cell as an array plus the bin
+edges of both axes, so looking up the increment of an (occupancy, lead time)
+pair is an array index instead of a query and category string matching.
+
+The pricing engine loads the increments of a stored rule set through
+get_increment_matrix and prices with to_planes(); unsaved rows (simulations,
+bulk-loaded portfolios) are compiled with IncrementMatrix.compile.
+
+Compiled matrices are cached in Redis (the Django cache) and in process with
+LRU eviction. Both are keyed by a per-property version token, which
+invalidate_increment_matrix replaces after every write to the property's
+increments, so stale matrices in other processes become unreachable. The token
+lives in the shared cache (required outside development, see settings.CACHES)
+and expires after INCREMENT_MATRIX_CACHE_TIMEOUT, which bounds staleness after
+writes that bypass the views and with per-process development caches.
+"""
+
+import logging
+import uuid
+from functools import lru_cache
+import numpy as np
+from django.core.cache import cache
+
+from .models import DpDynamicIncrementsV2
+
+logger = logging.getLogger(__name__)
+
+OCCUPANCY_CATEGORIES = [code for code, _ in DpDynamicIncrementsV2.OCCUPANCY_CATEGORIES]
+LEAD_TIME_CATEGORIES = [code for code, _ in DpDynamicIncrementsV2.LEAD_TIME_CATEGORIES]
+
+# Lower bounds of every category but the first, for np.searchsorted(side='right')
+OCCUPANCY_BIN_EDGES = np.array([30, 50, 70, 80, 90, 100], dtype=float)
+LEAD_TIME_BIN_EDGES = np.array([1, 3, 7, 14, 30, 45, 60], dtype=float)
+
+# Increment kinds: the cell types and the first axis of to_planes()
+INCREMENT_PERCENTAGE = 0
+INCREMENT_ADDITIONAL = 1
+
+# Compiled matrices kept in the in-process cache (one per property and version)
+INCREMENT_MATRIX_CACHE_SIZE = 1024
+
+# Seconds a version token and its compiled matrix are kept in Redis; writes through the
+# views invalidate them explicitly, the timeout bounds staleness after writes that bypass
+# them (admin, scripts)
+INCREMENT_MATRIX_CACHE_TIMEOUT = 3600
+
+INCREMENT_TYPES = {INCREMENT_PERCENTAGE: 'Percentage', INCREMENT_ADDITIONAL: 'Additional'}
+
+_OCCUPANCY_INDEX = {code: i for i, code in enumerate(OCCUPANCY_CATEGORIES)}
+_LEAD_TIME_INDEX = {code: i for i, code in enumerate(LEAD_TIME_CATEGORIES)}
+
+
+def is_percentage(increment_type):
+    """
+    True for 'Percentage' increments; anything else is an Additional amount.
+    """
+    return (increment_type or '').strip().lower() == 'percentage'
+
+
+class IncrementMatrix:
+    """
+    Dynamic increments of one property compiled for O(1) lookups.
+
+    Attributes:
+        types: (7, 8) int8 array of INCREMENT_PERCENTAGE / INCREMENT_ADDITIONAL per cell
+        values: (7, 8) float array of increment values per cell (0 for missing cells)
+        occupancy_edges, lead_time_edges: Lower bounds of every category but the first
+    """
+    __slots__ = ('types', 'values', 'occupancy_edges', 'lead_time_edges')
+
+    def __init__(self, types, values):
+        # Shared between callers through the caches, so never modified in place
+        types.flags.writeable = False
+        values.flags.writeable = False
+        self.types = types
+        self.values = values
+        self.occupancy_edges = OCCUPANCY_BIN_EDGES
+        self.lead_time_edges = LEAD_TIME_BIN_EDGES
+
+    @classmethod
+    def compile(cls, rows):
+        """
+        Build the matrix from (occupancy_category, lead_time_category, increment_type, increment_value) rows.
+        """
+        types = np.full((len(OCCUPANCY_CATEGORIES), len(LEAD_TIME_CATEGORIES)), INCREMENT_ADDITIONAL, dtype=np.int8)
+        values = np.zeros(types.shape)
+        for occupancy_category, lead_time_category, increment_type, increment_value in rows:
+            occupancy = _OCCUPANCY_INDEX.get(occupancy_category)
+            lead_time = _LEAD_TIME_INDEX.get(lead_time_category)
+            if occupancy is None or lead_time is None:
+                continue
+            types[occupancy, lead_time] = INCREMENT_PERCENTAGE if is_percentage(increment_type) else INCREMENT_ADDITIONAL
+            values[occupancy, lead_time] = increment_value or 0
+        return cls(types, values)
+
+    def to_planes(self):
+        """
+        Return the (2, 7, 8) array of increments indexed by [INCREMENT_PERCENTAGE /
+        INCREMENT_ADDITIONAL, occupancy category, lead time category], as used by
+        compute_recommended_prices; each cell is non-zero on its own kind's plane only.
+        """
+        planes = np.zeros((2,) + self.values.shape)
+        for kind in INCREMENT_TYPES:
+            planes[kind] = np.where(self.types == kind, self.values, 0)
+        return planes
+
+    def bins(self, occupancy, lead_days):
+        """
+        Return the (occupancy, lead time) cell index of an occupancy (0-1 or 0-100) and a lead time in days.
+        """
+        if occupancy <= 1:
+            occupancy *= 100
+        return (
+            int(np.searchsorted(self.occupancy_edges, occupancy, side='right')),
+            int(np.searchsorted(self.lead_time_edges, max(lead_days, 0), side='right')),
+        )
+
+    def cell(self, occupancy_index, lead_time_index):
+        """
+        Return the (increment_type, increment_value) of a cell by category index.
+        """
+        return INCREMENT_TYPES[int(self.types[occupancy_index, lead_time_index])], float(self.values[occupancy_index, lead_time_index])
+
+    def lookup(self, occupancy, lead_days):
+        """
+        Return the (increment_type, increment_value) applying at an occupancy and lead time.
+        """
+        return self.cell(*self.bins(occupancy, lead_days))
+
+    def category(self, occupancy_category, lead_time_category):
+        """
+        Return the (increment_type, increment_value) of a cell by category code ('50-70', '60+').
+
+        Raises:
+            KeyError: For an unknown category code
+        """
+        return self.cell(_OCCUPANCY_INDEX[occupancy_category], _LEAD_TIME_INDEX[lead_time_category])
+
+
+def _version_key(property_id):
+    return f"increment_matrix:version:{property_id}"
+
+
+def _matrix_key(property_id, version):
+    return f"increment_matrix:{property_id}:{version}"
+
+
+def compile_property_increments(property_id):
+    """
+    Compile a property's stored increments (one query, no caching).
+    """
+    return IncrementMatrix.compile(
+        DpDynamicIncrementsV2.objects
+        .filter(property_id=property_id)
+        .values_list('occupancy_category', 'lead_time_category', 'increment_type', 'increment_value')
+    )
+
+
+@lru_cache(maxsize=INCREMENT_MATRIX_CACHE_SIZE)
+def _get_versioned_matrix(property_id, version):
+    """
+    Return the compiled matrix of one version of a property's increments, from Redis or the database.
+    """
+    key = _matrix_key(property_id, version)
+    try:
+        cached = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Increment matrix cache unavailable: {str(e)}")
+        cached = None
+    if cached is not None:
+        return IncrementMatrix(*cached)
+
+    matrix = compile_property_increments(property_id)
+    try:
+        cache.set(key, (matrix.types, matrix.values), INCREMENT_MATRIX_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Could not store increment matrix cache entry {key}: {str(e)}")
+    return matrix
+
+
+def get_increment_matrix(property_id):
+    """
+    Return the compiled increment matrix of a property.
+
+    Costs one cache read for the version token; the matrix itself comes from the
+    in-process LRU, then Redis, then the database. Cache errors fall back to
+    compiling from the database, so Redis outages only cost latency.
+    """
+    try:
+        version = cache.get(_version_key(property_id))
+        if version is None:
+            version = uuid.uuid4().hex
+            cache.set(_version_key(property_id), version, INCREMENT_MATRIX_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Increment matrix cache unavailable: {str(e)}")
+        return compile_property_increments(property_id)
+    return _get_versioned_matrix(str(property_id), version)
+
+
+def invalidate_increment_matrix(property_id):
+    """
+    Invalidate the compiled increment matrix of a property in every process.
+
+    Called after dynamic increment writes. Old entries are not deleted one by
+    one; they become unreachable and are evicted or expire.
+    """
+    try:
+        cache.set(_version_key(property_id), uuid.uuid4().hex, INCREMENT_MATRIX_CACHE_TIMEOUT)
+    except Exception as e:
+        # Never fail a write because the cache is unavailable; drop the token instead
+        logger.warning(f"Could not invalidate increment matrix cache for property {property_id}: {str(e)}")
+        try:
+            cache.delete(_version_key(property_id))
+        except Exception:
+            pass
+
+
+def clear_increment_matrix_cache():
+    """
+    Drop the in-process compiled matrices (Redis entries are left to expire).
+    """
+    _get_versioned_matrix.cache_clear()
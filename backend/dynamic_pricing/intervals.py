@@ -0,0 +1,155 @@
+"""
+Interval Index for Date-Ranged Rules
+
+DpMinimumSellingPrice, DpOfferIncrements and DpLosSetup rules apply over
+inclusive (valid_from, valid_until) date ranges. IntervalIndex loads a
+property's ranges once and answers "rule for date d" and "rules over [a, b]"
+with a bisect instead of one query per date.
+
+The ranges are split at every boundary into non-overlapping segments, each
+holding the rules active over it, so a lookup is one bisect over the segment
+starts (O(log n)). On overlaps the rule given last wins; load_msp_index and the
+pricing engine pass rules ordered by (valid_from, id), so the latest valid_from
+wins, then the higher id.
+"""
+
+import logging
+from bisect import bisect_right
+from datetime import timedelta
+
+from .models import DpMinimumSellingPrice
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+ONE_DAY = timedelta(days=1)
+
+
+class IntervalIndex:
+    """
+    Inclusive date ranges indexed for point and range lookups.
+
+    Args:
+        entries: (valid_from, valid_until, value) tuples in priority order; a later
+            entry wins over an earlier one on overlapping dates. Entries with
+            valid_until before valid_from are ignored.
+    """
+    __slots__ = ('values', '_starts', '_active')
+
+    def __init__(self, entries):
+        entries = [entry for entry in entries if entry[0] <= entry[1]]
+        self.values = [value for _, _, value in entries]
+
+        # Sweep over the range boundaries; each segment keeps the entry indexes active
+        # from its start until the next start, in priority order
+        starting = {}
+        ending = {}
+        for i, (valid_from, valid_until, _) in enumerate(entries):
+            starting.setdefault(valid_from, []).append(i)
+            ending.setdefault(valid_until + ONE_DAY, []).append(i)
+        self._starts = sorted(starting.keys() | ending.keys())
+        self._active = []
+        active = set()
+        for boundary in self._starts:
+            active.difference_update(ending.get(boundary, ()))
+            active.update(starting.get(boundary, ()))
+            self._active.append(tuple(sorted(active)))
+
+    def __len__(self):
+        return len(self.values)
+
+    def _segment(self, day):
+        return bisect_right(self._starts, day) - 1
+
+    def covering(self, day):
+        """
+        Return every rule active on a date, in priority order (the winner last).
+        """
+        i = self._segment(day)
+        return tuple(self.values[j] for j in self._active[i]) if i >= 0 else ()
+
+    def at(self, day):
+        """
+        Return the rule that applies on a date, or None.
+        """
+        i = self._segment(day)
+        if i < 0 or not self._active[i]:
+            return None
+        return self.values[self._active[i][-1]]
+
+    def segments(self, start_date, end_date):
+        """
+        Yield (first, last, rules) for consecutive date ranges covering [start_date, end_date].
+
+        rules are the rules active over the whole range, in priority order; gaps
+        without rules are yielded with an empty tuple.
+        """
+        i = self._segment(start_date)
+        first = start_date
+        while first <= end_date:
+            following = self._starts[i + 1] if i + 1 < len(self._starts) else None
+            last = end_date if following is None else min(end_date, following - ONE_DAY)
+            active = self._active[i] if i >= 0 else ()
+            yield first, last, tuple(self.values[j] for j in active)
+            first = last + ONE_DAY
+            i += 1
+
+    def overlapping(self, start_date, end_date):
+        """
+        Return every rule active on at least one date of [start_date, end_date], in priority order.
+        """
+        seen = set()
+        i = max(self._segment(start_date), 0)
+        while i < len(self._starts) and self._starts[i] <= end_date:
+            seen.update(self._active[i])
+            i += 1
+        return [self.values[j] for j in sorted(seen)]
+
+    def uncovered(self, start_date, end_date):
+        """
+        Return the dates of [start_date, end_date] no rule applies to.
+        """
+        missing = []
+        for first, last, rules in self.segments(start_date, end_date):
+            if not rules:
+                missing.extend(first + timedelta(days=offset) for offset in range((last - first).days + 1))
+        return missing
+
+
+def parse_weekday(day_of_week):
+    """
+    Return the weekday number (Monday 0) of a DpLosSetup day_of_week ('Monday', 'mon'), or None.
+    """
+    try:
+        return WEEKDAYS.index((day_of_week or '').strip().lower()[:3])
+    except ValueError:
+        return None
+
+
+def build_weekday_indexes(rows):
+    """
+    Build one IntervalIndex per weekday from (valid_from, valid_until, day_of_week, value) rows.
+
+    Returns:
+        dict: {weekday number: IntervalIndex}
+    """
+    by_weekday = {}
+    for valid_from, valid_until, day_of_week, value in rows:
+        weekday = parse_weekday(day_of_week)
+        if weekday is None:
+            logger.warning(f"Ignoring LOS rule with unknown day_of_week {day_of_week!r}")
+            continue
+        by_weekday.setdefault(weekday, []).append((valid_from, valid_until, value))
+    return {weekday: IntervalIndex(entries) for weekday, entries in by_weekday.items()}
+
+
+def load_msp_index(property_id):
+    """
+    Load a property's MSP periods into an IntervalIndex of DpMinimumSellingPrice instances (one query).
+    """
+    return IntervalIndex(
+        (msp.valid_from, msp.valid_until, msp)
+        for msp in DpMinimumSellingPrice.objects.filter(property_id=property_id).order_by('valid_from', 'id')
+    )
+
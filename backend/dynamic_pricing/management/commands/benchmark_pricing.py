@@ -0,0 +1,475 @@
+"""
+Django management command to benchmark pricing hot paths on synthetic data
+
+In-memory suites create no database rows. Database suites insert their synthetic
+rows inside a transaction that is always rolled back, so the command is safe to
+run against any environment (run them against PostgreSQL for meaningful numbers).
+
+Suites:
+    serializer: PriceHistorySerializer (DRF) vs encode_price_history_rows on a
+                multi-snapshot calendar reduced to the latest snapshot per date
+    as_of:      full history scan vs get_price_rows_as_of (calendar as of T) on a
+                table with hundreds of snapshots per checkin_date (database)
+    bands:      per-date Python loops vs NumPy market positioning bands (p25/p50/p75
+                and our position) over a date x competitor matrix; --snapshots is
+                the number of room rows per competitor and date
+    engine:     per-date Python rule matching vs the vectorized pricing engine
+                (compute_recommended_prices) over the pricing horizon
+
+This command can be run:
+1. Manually: python manage.py benchmark_pricing
+2. Before/after changes to the calendar hot paths, to compare timings
+
+Usage:
+    python manage.py benchmark_pricing
+    python manage.py benchmark_pricing --suite serializer --days 365 --snapshots 6
+    python manage.py benchmark_pricing --suite as_of --days 31 --snapshots 300
+    python manage.py benchmark_pricing --suite bands --days 365 --competitors 30
+    python manage.py benchmark_pricing --suite engine --days 365
+    python manage.py benchmark_pricing --repeat 10
+"""
+
+import json
+import math
+import random
+import time
+from datetime import date, datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+import numpy as np
+from dynamic_pricing.market_bands import build_competitor_price_matrix, compute_price_bands, compute_positions
+from dynamic_pricing.models import DpPriceChangeHistory
+from dynamic_pricing.price_calendar import encode_price_history_rows, get_price_rows_as_of
+from dynamic_pricing.pricing_engine import build_pricing_rules, compute_recommended_prices
+from dynamic_pricing.default_values import DEFAULT_DYNAMIC_INCREMENTS
+from dynamic_pricing.serializers import PriceHistorySerializer
+
+BENCHMARK_PROPERTY_ID = 'benchmark-property'
+
+
+def _best_of(repeat, func):
+    """
+    Run func repeat times and return (best duration in seconds, last result).
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        duration = time.perf_counter() - started
+        best = duration if best is None else min(best, duration)
+    return best, result
+
+
+def build_price_history_dataset(days, snapshots, seed=42):
+    """
+    Build a synthetic price_change_history dataset.
+
+    Returns:
+        tuple: (unsaved DpPriceChangeHistory instances, value tuples of the same
+        rows as (checkin_date, as_of, recom_price, occupancy), overwrite prices by date)
+    """
+    rng = random.Random(seed)
+    start_date = date(2025, 1, 1)
+    first_run = timezone.make_aware(datetime(2024, 12, 1))
+
+    instances = []
+    values = []
+    for day in range(days):
+        checkin_date = start_date + timedelta(days=day)
+        for snapshot in range(snapshots):
+            as_of = first_run + timedelta(hours=4 * snapshot)
+            recom_price = rng.randint(60, 400)
+            # Mix of 0-1 and 0-100 occupancy scales and missing values, like the pricing job writes
+            occupancy = rng.choice([None, rng.random(), rng.uniform(1, 100)])
+            instances.append(DpPriceChangeHistory(
+                property_id_id=BENCHMARK_PROPERTY_ID,
+                checkin_date=checkin_date,
+                as_of=as_of,
+                recom_price=recom_price,
+                occupancy=occupancy,
+            ))
+            values.append((checkin_date, as_of, recom_price, occupancy))
+
+    overwrites = {
+        start_date + timedelta(days=day): rng.randint(80, 300)
+        for day in range(0, days, 7)
+    }
+    return instances, values, overwrites
+
+
+def build_competitor_price_dataset(days, competitors, rooms, seed=42):
+    """
+    Build synthetic comp_prices_mv rows and our recommended prices.
+
+    Returns:
+        tuple: (list of (competitor_id, checkin_date, price) rows, {checkin_date: recom_price})
+    """
+    rng = random.Random(seed)
+    start_date = date(2025, 1, 1)
+    rows = []
+    recom_prices = {}
+    for day in range(days):
+        checkin_date = start_date + timedelta(days=day)
+        recom_prices[checkin_date] = rng.randint(70, 300)
+        for competitor_id in range(1, competitors + 1):
+            # Some competitors are not scraped for some dates
+            if rng.random() < 0.1:
+                continue
+            for _ in range(rooms):
+                rows.append((competitor_id, checkin_date, round(rng.uniform(60, 350), 2)))
+    return rows, recom_prices
+
+
+def build_pricing_engine_dataset(days, seed=42):
+    """
+    Build a synthetic rule set and pricing inputs for one property.
+
+    Returns:
+        tuple: (start_date, rule rows for build_pricing_rules as a dict of keyword
+        arguments, occupancy list, market price list with None gaps)
+    """
+    rng = random.Random(seed)
+    start_date = date(2025, 1, 1)
+    end_date = start_date + timedelta(days=days - 1)
+    rule_rows = {
+        'settings': {'comp_price_calculation': 'min', 'min_competitors': 2, 'future_days_to_price': days},
+        'increments': [
+            (row['occupancy_category'], row['lead_time_category'], rng.choice(['Additional', 'Percentage']), row['increment_value'])
+            for row in DEFAULT_DYNAMIC_INCREMENTS
+        ],
+        'msp_periods': [
+            (start_date + timedelta(days=day), min(start_date + timedelta(days=day + 29), end_date), rng.randint(60, 120))
+            for day in range(0, days, 30)
+        ],
+        'offers': [
+            (start_date + timedelta(days=day), start_date + timedelta(days=day + 20), rng.choice([None, 60]),
+             rng.choice([None, 7]), rng.choice(['Additional', 'Percentage']), rng.randint(-15, -5))
+            for day in range(0, days, 45)
+        ],
+        'room_rates': [
+            ('BAR', True, 'Percentage', 0),
+            ('NRF', False, 'Percentage', -10),
+            ('BB', False, 'Additional', 15),
+        ],
+    }
+    occupancy = [rng.choice([None, rng.random(), rng.uniform(1, 105)]) for _ in range(days)]
+    market = [None if rng.random() < 0.15 else round(rng.uniform(60, 350), 2) for _ in range(days)]
+    return start_date, rule_rows, occupancy, market
+
+
+def _category_index(categories, value):
+    """
+    Index of the 'low-high' / 'low+' category string containing value (lower bounds inclusive).
+    """
+    index = 0
+    for i, category in enumerate(categories):
+        if value >= float(category.rstrip('+').split('-')[0]):
+            index = i
+    return index
+
+
+def _percentile(sorted_values, pct):
+    """
+    Linear-interpolated percentile (NumPy's default method) of a sorted list.
+    """
+    k = (len(sorted_values) - 1) * pct / 100
+    f = math.floor(k)
+    c = min(f + 1, len(sorted_values) - 1)
+    return sorted_values[f] + (sorted_values[c] - sorted_values[f]) * (k - f)
+
+
+class _Rollback(Exception):
+    """
+    Raised to roll back the synthetic rows of a database suite.
+    """
+
+
+class Command(BaseCommand):
+    help = 'Benchmark pricing hot paths on synthetic data'
+
+    suites = ['serializer', 'as_of', 'bands', 'engine']
+
+    # (days, snapshots per day) used when --days / --snapshots are not given
+    suite_defaults = {
+        'serializer': (365, 6),
+        'as_of': (31, 300),
+        'bands': (365, 3),
+        'engine': (365, 1),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--suite',
+            choices=self.suites,
+            action='append',
+            help='Suite to run (repeatable, default: all suites)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Number of checkin dates in the synthetic calendar (default: per suite)',
+        )
+        parser.add_argument(
+            '--snapshots',
+            type=int,
+            help='as_of snapshots per checkin date (default: per suite)',
+        )
+        parser.add_argument(
+            '--competitors',
+            type=int,
+            default=30,
+            help='Competitors in the synthetic market (bands suite, default: 30)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per measurement, the best run is reported (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        for name in ('days', 'snapshots', 'repeat', 'competitors'):
+            if options[name] is not None and options[name] < 1:
+                raise CommandError('--days, --snapshots, --repeat and --competitors must be positive')
+        self.competitors = options['competitors']
+
+        for suite in options['suite'] or self.suites:
+            default_days, default_snapshots = self.suite_defaults[suite]
+            getattr(self, f'run_{suite}')(
+                options['days'] or default_days,
+                options['snapshots'] or default_snapshots,
+                options['repeat'],
+            )
+
+    def report(self, label, baseline, candidate):
+        speedup = baseline / candidate if candidate else float('inf')
+        self.stdout.write(f"  {label}")
+        self.stdout.write(f"    baseline:  {baseline * 1000:9.2f} ms")
+        self.stdout.write(f"    candidate: {candidate * 1000:9.2f} ms")
+        self.stdout.write(self.style.SUCCESS(f"✓ {speedup:.1f}x faster"))
+
+    def run_serializer(self, days, snapshots, repeat):
+        self.stdout.write(
+            f"Suite 'serializer': {days} days x {snapshots} snapshots ({days * snapshots} rows)"
+        )
+        instances, values, overwrites = build_price_history_dataset(days, snapshots)
+        serializer_overwrites = {
+            (checkin_date, BENCHMARK_PROPERTY_ID): price
+            for checkin_date, price in overwrites.items()
+        }
+
+        def drf_path():
+            latest_by_date = {}
+            for row in sorted(instances, key=lambda r: (r.checkin_date, r.as_of), reverse=True):
+                latest_by_date.setdefault(row.checkin_date, row)
+            return [
+                PriceHistorySerializer(row, context={'overwrites': serializer_overwrites}).data
+                for checkin_date, row in sorted(latest_by_date.items())
+            ]
+
+        def fast_path():
+            latest_by_date = {}
+            for checkin_date, as_of, recom_price, occupancy in sorted(values, key=lambda v: (v[0], v[1]), reverse=True):
+                latest_by_date.setdefault(checkin_date, (checkin_date, recom_price, occupancy))
+            return encode_price_history_rows(
+                (latest_by_date[checkin_date] for checkin_date in sorted(latest_by_date)),
+                overwrites
+            )
+
+        baseline, expected = _best_of(repeat, drf_path)
+        candidate, actual = _best_of(repeat, fast_path)
+        if json.dumps(expected) != json.dumps(actual):
+            raise CommandError('encode_price_history_rows output differs from PriceHistorySerializer')
+
+        self.report(f"{len(actual)} calendar entries (output verified identical)", baseline, candidate)
+
+    def run_as_of(self, days, snapshots, repeat):
+        self.stdout.write(
+            f"Suite 'as_of': {days} days x {snapshots} snapshots ({days * snapshots} rows, "
+            f"{connection.vendor})"
+        )
+        _, values, _ = build_price_history_dataset(days, snapshots)
+        start_date = values[0][0]
+        end_date = values[-1][0]
+        # Reconstruct the calendar two thirds into the history
+        as_of = sorted({row[1] for row in values})[(snapshots * 2) // 3]
+
+        try:
+            with transaction.atomic():
+                DpPriceChangeHistory.objects.bulk_create(
+                    [
+                        DpPriceChangeHistory(
+                            property_id_id=BENCHMARK_PROPERTY_ID,
+                            user_id=0,
+                            checkin_date=checkin_date,
+                            as_of=row_as_of,
+                            recom_price=recom_price,
+                            occupancy=occupancy,
+                            pms_hotel_id='benchmark',
+                            msp=recom_price // 2,
+                            recom_los=1,
+                            base_price=recom_price,
+                            base_price_choice='manual',
+                        )
+                        for checkin_date, row_as_of, recom_price, occupancy in values
+                    ],
+                    batch_size=5000,
+                )
+
+                def full_scan():
+                    latest_by_date = {}
+                    for row in (
+                        DpPriceChangeHistory.objects
+                        .filter(
+                            property_id=BENCHMARK_PROPERTY_ID,
+                            checkin_date__gte=start_date,
+                            checkin_date__lte=end_date,
+                            as_of__lte=as_of,
+                        )
+                        .order_by('checkin_date', 'as_of')
+                    ):
+                        latest_by_date[row.checkin_date] = row
+                    return latest_by_date
+
+                def point_in_time():
+                    return get_price_rows_as_of(BENCHMARK_PROPERTY_ID, start_date, end_date, as_of)
+
+                baseline, expected = _best_of(repeat, full_scan)
+                candidate, actual = _best_of(repeat, point_in_time)
+                raise _Rollback((baseline, candidate, expected, actual))
+        except _Rollback as result:
+            baseline, candidate, expected, actual = result.args[0]
+
+        if {d: row.as_of for d, row in expected.items()} != {d: row.as_of for d, row in actual.items()}:
+            raise CommandError('get_price_rows_as_of differs from a full history scan')
+
+        self.report(f"{len(actual)} calendar dates as of {as_of.isoformat()} (output verified identical)", baseline, candidate)
+
+    def run_bands(self, days, rooms, repeat):
+        competitors = self.competitors
+        rows, recom_prices = build_competitor_price_dataset(days, competitors, rooms)
+        self.stdout.write(
+            f"Suite 'bands': {days} days x {competitors} competitors x {rooms} rooms ({len(rows)} rows)"
+        )
+        start_date = min(recom_prices)
+        dates = sorted(recom_prices)
+        competitor_ids = list(range(1, competitors + 1))
+        prices = np.array([recom_prices[d] for d in dates], dtype=float)
+
+        # Stage 1: scrape rows -> lowest price per competitor and date
+        def loop_reduce():
+            best = {}
+            for competitor_id, checkin_date, price in rows:
+                day = best.setdefault(checkin_date, {})
+                if competitor_id not in day or price < day[competitor_id]:
+                    day[competitor_id] = price
+            return best
+
+        def matrix_reduce():
+            return build_competitor_price_matrix(competitor_ids, start_date, days, rows)
+
+        # Stage 2: bands and positions for every date of the horizon
+        def loop_bands(best):
+            result = {}
+            for checkin_date in dates:
+                day_prices = sorted(best.get(checkin_date, {}).values())
+                ours = recom_prices[checkin_date]
+                if not day_prices:
+                    result[checkin_date] = None
+                    continue
+                below = sum(1 for price in day_prices if price < ours)
+                equal = sum(1 for price in day_prices if price == ours)
+                result[checkin_date] = (
+                    [_percentile(day_prices, pct) for pct in (25, 50, 75)],
+                    (below + 0.5 * equal) * 100 / len(day_prices),
+                )
+            return result
+
+        def numpy_bands(matrix):
+            bands, counts = compute_price_bands(matrix)
+            position, _ = compute_positions(matrix, prices, bands, counts)
+            return bands, position
+
+        reduce_baseline, best = _best_of(repeat, loop_reduce)
+        reduce_candidate, matrix = _best_of(repeat, matrix_reduce)
+        bands_baseline, expected = _best_of(repeat, lambda: loop_bands(best))
+        bands_candidate, (bands, position) = _best_of(repeat, lambda: numpy_bands(matrix))
+
+        for i, checkin_date in enumerate(dates):
+            if expected[checkin_date] is None:
+                continue
+            expected_bands, expected_position = expected[checkin_date]
+            if not (np.allclose(bands[:, i], expected_bands) and math.isclose(position[i], expected_position)):
+                raise CommandError(f'NumPy market bands differ from the per-date loop on {checkin_date}')
+
+        self.report(f"{len(rows)} rows reduced to a {days} x {competitors} price matrix", reduce_baseline, reduce_candidate)
+        self.report(f"{days} dates of p25/p50/p75 bands and positions (output verified identical)", bands_baseline, bands_candidate)
+        self.report(
+            "end to end",
+            reduce_baseline + bands_baseline,
+            reduce_candidate + bands_candidate,
+        )
+
+    def run_engine(self, days, snapshots, repeat):
+        self.stdout.write(f"Suite 'engine': {days} days of recommended prices for one property")
+        start_date, rule_rows, occupancy, market = build_pricing_engine_dataset(days)
+        rules = build_pricing_rules(**rule_rows)
+        occupancy_categories = [row[0] for row in rule_rows['increments'][::8]]
+        lead_time_categories = [row[1] for row in rule_rows['increments'][:8]]
+        increments = {(row[0], row[1]): (row[2], row[3]) for row in rule_rows['increments']}
+
+        def loop_engine():
+            # Per-date rule matching: category strings, period scans and rate increments per date
+            prices = []
+            for day in range(days):
+                checkin_date = start_date + timedelta(days=day)
+                msp = None
+                for valid_from, valid_until, value in sorted(rule_rows['msp_periods']):
+                    if valid_from <= checkin_date <= valid_until:
+                        msp = value
+                base = market[day] if market[day] is not None else msp
+                if base is None:
+                    prices.append(None)
+                    continue
+                price = base
+                if occupancy[day] is not None:
+                    occ = occupancy[day] * 100 if occupancy[day] <= 1 else occupancy[day]
+                    cell = (
+                        occupancy_categories[_category_index(occupancy_categories, occ)],
+                        lead_time_categories[_category_index(lead_time_categories, day)],
+                    )
+                    increment_type, value = increments[cell]
+                    price = price * (1 + value / 100) if increment_type == 'Percentage' else price + value
+                percentage = additional = 0
+                for valid_from, valid_until, applied_from, applied_until, increment_type, value in rule_rows['offers']:
+                    if not valid_from <= checkin_date <= valid_until:
+                        continue
+                    if (applied_from is not None and day > applied_from) or (applied_until is not None and day < applied_until):
+                        continue
+                    if increment_type == 'Percentage':
+                        percentage += value
+                    else:
+                        additional += value
+                price = price * (1 + percentage / 100) + additional
+                if msp is not None:
+                    price = max(price, msp)
+                prices.append(round(price))
+            return prices
+
+        occupancy_array = np.array([np.nan if value is None else value for value in occupancy])
+        market_array = np.array([np.nan if value is None else value for value in market])
+
+        def vectorized_engine():
+            return compute_recommended_prices(start_date, occupancy_array, market_array, rules, today=start_date)
+
+        baseline, expected = _best_of(repeat, loop_engine)
+        candidate, actual = _best_of(repeat, vectorized_engine)
+        for day, price in enumerate(expected):
+            recom_price = actual['recom_price'][day]
+            # round() and np.rint both round half to even
+            if (price is None) != bool(np.isnan(recom_price)) or (price is not None and price != recom_price):
+                raise CommandError(f'Pricing engine differs from the per-date loop on day {day}')
+
+        self.report(f"{days} recommended prices (output verified identical)", baseline, candidate)
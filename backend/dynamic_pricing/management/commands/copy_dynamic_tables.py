@@ -22,6 +22,7 @@ from dynamic_pricing.models import (
     OverwritePriceHistory,
     Property,
 )
+from dynamic_pricing.increment_matrix import invalidate_increment_matrix
 
 
 @dataclass
@@ -349,6 +350,7 @@ class Command(BaseCommand):
 
     def _migrate_dynamic_increments(self, dry_run: bool, limit: Optional[int], batch_size: int) -> MigrationStats:
         stats = MigrationStats("dp_dynamic_increments_v2")
+        changed_properties = set()
         query = """
             SELECT
                 id,
@@ -403,6 +405,7 @@ class Command(BaseCommand):
                         id=row["id"],
                         defaults=defaults,
                     )
+                    changed_properties.add(property_obj.pk)
                     if created:
                         stats.created += 1
                         action = "created"
@@ -417,6 +420,8 @@ class Command(BaseCommand):
                     stats.errors += 1
                     self._log_error("dynamic_increment", str(row["id"]), exc)
 
+        for property_id in changed_properties:
+            invalidate_increment_matrix(property_id)
         return stats
 
     def _migrate_offer_increments(self, dry_run: bool, limit: Optional[int], batch_size: int) -> MigrationStats:
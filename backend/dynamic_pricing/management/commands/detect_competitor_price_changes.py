@@ -0,0 +1,88 @@
+"""
+Django management command to detect material competitor price changes
+
+Reads only the historical_competitor_prices rows scraped since the previous run
+(update_tz past the watermark stored in DpCompetitorPriceState), compares each
+competitor's best price per future checkin_date with the stored one and creates
+competitor notifications for changes above the threshold, in bulk.
+
+This command can be run:
+1. Manually: python manage.py detect_competitor_price_changes
+2. Via cron job: after each competitor scrape import
+
+Usage:
+    python manage.py detect_competitor_price_changes
+    python manage.py detect_competitor_price_changes --threshold 15
+    python manage.py detect_competitor_price_changes --no-notify
+"""
+
+import time
+from django.core.management.base import BaseCommand, CommandError
+from dynamic_pricing.competitor_changes import DEFAULT_CHANGE_THRESHOLD, process_competitor_price_changes
+from vivere_stays.logging_utils import get_logger, log_operation, LogLevel, LoggerNames
+
+logger = get_logger(LoggerNames.DYNAMIC_PRICING)
+
+
+class Command(BaseCommand):
+    help = 'Detect material competitor price changes since the last run and notify the following users'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=DEFAULT_CHANGE_THRESHOLD,
+            help=f'Minimum absolute price change in percent (default: {DEFAULT_CHANGE_THRESHOLD:g})',
+        )
+        parser.add_argument(
+            '--no-notify',
+            action='store_true',
+            help='Update the price state without creating notifications (e.g. to re-baseline)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='State rows upserted per query (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        threshold = options['threshold']
+        notify = not options['no_notify']
+        if threshold <= 0:
+            raise CommandError('--threshold must be positive')
+
+        log_operation(
+            logger, LogLevel.INFO,
+            f"Starting competitor price change detection (threshold={threshold}%)",
+            "competitor_price_change_start",
+            None, None,
+            threshold=threshold,
+            notify=notify
+        )
+
+        started = time.monotonic()
+        try:
+            stats = process_competitor_price_changes(
+                threshold=threshold, notify=notify, batch_size=options['batch_size']
+            )
+        except Exception as e:
+            logger.error(f"Error detecting competitor price changes: {str(e)}", exc_info=True)
+            raise CommandError(f"Competitor price change detection failed: {str(e)}")
+
+        duration = time.monotonic() - started
+        log_operation(
+            logger, LogLevel.INFO,
+            f"Competitor price change detection completed",
+            "competitor_price_change_success",
+            None, None,
+            duration_seconds=round(duration, 3),
+            **{key: value for key, value in stats.items() if key != 'watermark'}
+        )
+        verb = 'Created' if notify else 'Skipped'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Processed {stats['rows']} new scrape row(s) into {stats['states']} price state(s): "
+                f"{stats['changes']} change(s), {verb} {stats['notifications']} notification(s) in {duration:.2f}s"
+            )
+        )
@@ -0,0 +1,96 @@
+"""
+Django management command to load FX rates from a file
+
+Upserts daily reference rates (units per 1 EUR) into DpFxRate from a CSV file,
+so competitor prices can be normalized to the property currency without network
+access at request time. Both a long date,currency,rate layout and the wide ECB
+layout (Date,USD,JPY,...; e.g. eurofxref-hist.csv) are accepted.
+
+This command can be run:
+1. Manually: python manage.py load_fx_rates rates.csv
+2. Via cron job: daily, after downloading the reference rates file
+
+Usage:
+    python manage.py load_fx_rates eurofxref-hist.csv
+    python manage.py load_fx_rates rates.csv --since 2025-01-01
+    python manage.py load_fx_rates rates.csv --refresh-aggregates
+"""
+
+import os
+import time
+from datetime import datetime
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from dynamic_pricing.fx import load_fx_rates, parse_fx_rate_file
+from vivere_stays.logging_utils import get_logger, log_operation, LogLevel, LoggerNames
+
+logger = get_logger(LoggerNames.DYNAMIC_PRICING)
+
+
+class Command(BaseCommand):
+    help = 'Load daily FX reference rates (units per 1 EUR) from a CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='CSV file with date,currency,rate rows or ECB Date,USD,JPY,... columns',
+        )
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Only load rates on or after this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rates written per query (default: 1000)',
+        )
+        parser.add_argument(
+            '--refresh-aggregates',
+            action='store_true',
+            help='Rebuild the market aggregates afterwards so they use the new rates',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f"File not found: {path}")
+        since = None
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Invalid --since date, expected YYYY-MM-DD')
+
+        started = time.monotonic()
+        try:
+            rows = parse_fx_rate_file(path)
+        except ValueError as e:
+            raise CommandError(str(e))
+        if since is not None:
+            rows = [row for row in rows if row[0] >= since]
+        if not rows:
+            raise CommandError(f"No FX rates found in {path}")
+
+        loaded = load_fx_rates(rows, source=os.path.basename(path), batch_size=options['batch_size'])
+        duration = time.monotonic() - started
+        dates = [row[0] for row in rows]
+        log_operation(
+            logger, LogLevel.INFO,
+            f"FX rates loaded from {path}",
+            "fx_rates_load_success",
+            None, None,
+            rates=loaded,
+            first_date=str(min(dates)),
+            last_date=str(max(dates)),
+            duration_seconds=round(duration, 3)
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Loaded {loaded} FX rate(s) for {min(dates)} to {max(dates)} in {duration:.2f}s"
+            )
+        )
+
+        if options['refresh_aggregates']:
+            call_command('refresh_market_aggregates', full=True, stdout=self.stdout)
@@ -44,8 +44,9 @@ class Command(BaseCommand):
             for i in range(3):
                 comp_name = f"Competitor {i+1} for {property_obj.name}"
                 comp, created = Competitor.objects.get_or_create(
-                    competitor_name=comp_name,
+                    normalized_name=Competitor.normalize_name(comp_name),
                     defaults={
+                        'competitor_name': comp_name,
                         'booking_link': '',
                     }
                 )
@@ -0,0 +1,124 @@
+"""
+Django management command to refresh the comp_prices_mv materialized view
+
+Runs REFRESH MATERIALIZED VIEW CONCURRENTLY under a PostgreSQL advisory lock
+(overlapping runs are skipped, readers never block) and records each run with
+its duration and row count. The last successful run is reported to clients of
+the competitor price endpoints in the X-Data-Refreshed-At header.
+
+This command can be run:
+1. Manually: python manage.py refresh_comp_prices_mv
+2. Via cron job: after each scrape import, e.g.
+   */30 * * * * cd /path/to/project && python manage.py refresh_comp_prices_mv --refresh-aggregates
+3. As a long-running worker: python manage.py refresh_comp_prices_mv --every 1800
+
+Usage:
+    python manage.py refresh_comp_prices_mv
+    python manage.py refresh_comp_prices_mv --refresh-aggregates
+    python manage.py refresh_comp_prices_mv --every 1800
+    python manage.py refresh_comp_prices_mv --status
+"""
+
+import time
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from dynamic_pricing.models import DpMaterializedViewRefresh
+from dynamic_pricing.mv_refresh import COMP_PRICES_MV, refresh_materialized_view, get_last_refreshed_at
+from vivere_stays.logging_utils import get_logger, log_operation, LogLevel, LoggerNames
+
+logger = get_logger(LoggerNames.DYNAMIC_PRICING)
+
+
+class Command(BaseCommand):
+    help = 'Refresh comp_prices_mv concurrently under an advisory lock and record the run'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-concurrently',
+            action='store_true',
+            help='Use a blocking REFRESH (only if the view has no unique index yet)',
+        )
+        parser.add_argument(
+            '--refresh-aggregates',
+            action='store_true',
+            help='Run refresh_market_aggregates after a successful refresh',
+        )
+        parser.add_argument(
+            '--every',
+            type=int,
+            help='Keep running and refresh every N seconds',
+        )
+        parser.add_argument(
+            '--status',
+            action='store_true',
+            help='Show the last refresh runs and how stale the view is, then exit',
+        )
+
+    def handle(self, *args, **options):
+        if options.get('status'):
+            self.show_status()
+            return
+
+        every = options.get('every')
+        if every is not None and every < 1:
+            raise CommandError('--every must be a positive number of seconds')
+
+        while True:
+            self.refresh_once(
+                concurrently=not options.get('no_concurrently', False),
+                refresh_aggregates=options.get('refresh_aggregates', False),
+            )
+            if every is None:
+                return
+            time.sleep(every)
+
+    def refresh_once(self, concurrently, refresh_aggregates):
+        log_operation(
+            logger, LogLevel.INFO,
+            f"Starting {COMP_PRICES_MV} refresh",
+            "comp_prices_mv_refresh_start",
+            None, None,
+            concurrently=concurrently
+        )
+        run = refresh_materialized_view(COMP_PRICES_MV, concurrently=concurrently)
+        log_operation(
+            logger, LogLevel.INFO if run.status != 'failed' else LogLevel.ERROR,
+            f"{COMP_PRICES_MV} refresh {run.status}",
+            f"comp_prices_mv_refresh_{run.status}",
+            None, None,
+            row_count=run.row_count,
+            duration_seconds=run.duration_seconds,
+            error=run.error
+        )
+
+        if run.status == 'success':
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"✓ Refreshed {COMP_PRICES_MV}: {run.row_count} row(s) in {run.duration_seconds:.2f}s"
+                )
+            )
+            if refresh_aggregates:
+                call_command('refresh_market_aggregates', stdout=self.stdout)
+        elif run.status == 'skipped':
+            self.stdout.write(self.style.WARNING(f"Skipped {COMP_PRICES_MV} refresh: {run.error}"))
+        else:
+            self.stdout.write(self.style.ERROR(f"Failed to refresh {COMP_PRICES_MV}: {run.error}"))
+
+    def show_status(self):
+        last_refreshed_at = get_last_refreshed_at(COMP_PRICES_MV)
+        if last_refreshed_at is None:
+            self.stdout.write(self.style.WARNING(f"{COMP_PRICES_MV} has never been refreshed by this project"))
+        else:
+            staleness = timezone.now() - last_refreshed_at
+            self.stdout.write(
+                f"{COMP_PRICES_MV} last refreshed at {last_refreshed_at.isoformat()} "
+                f"({int(staleness.total_seconds())}s ago)"
+            )
+
+        runs = DpMaterializedViewRefresh.objects.filter(view_name=COMP_PRICES_MV).order_by('-finished_at')[:10]
+        for run in runs:
+            self.stdout.write(
+                f"  {run.finished_at.isoformat()}  {run.status:<8} rows={run.row_count} "
+                f"duration={run.duration_seconds}s{f'  {run.error}' if run.error else ''}"
+            )
@@ -0,0 +1,104 @@
+"""
+Django management command to refresh the daily market aggregates
+
+Recomputes DpDailyMarketAggregate (min/max/avg/median competitor price and
+priced/sold-out competitor counts per property and checkin_date) from
+comp_prices_mv. Runs incrementally: only checkin_dates with scrape rows whose
+update_tz is newer than each property's watermark are recomputed.
+
+This command can be run:
+1. Manually: python manage.py refresh_market_aggregates
+2. Via cron job: right after each comp_prices_mv refresh
+
+Usage:
+    python manage.py refresh_market_aggregates
+    python manage.py refresh_market_aggregates --property-id abc-123
+    python manage.py refresh_market_aggregates --full
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from dynamic_pricing.models import Property, DpPropertyCompetitor
+from dynamic_pricing.market import refresh_market_aggregates
+from vivere_stays.logging_utils import get_logger, log_operation, LogLevel, LoggerNames
+
+logger = get_logger(LoggerNames.DYNAMIC_PRICING)
+
+
+class Command(BaseCommand):
+    help = 'Refresh the daily competitor market aggregates per property from comp_prices_mv'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--property-id',
+            type=str,
+            help='Refresh a specific property ID only',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Rebuild every date instead of dates with new scrape rows only (use after competitor changes)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Checkin dates recomputed per batch (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        property_id = options.get('property_id')
+        full = options.get('full', False)
+        batch_size = options['batch_size']
+
+        if property_id:
+            if not Property.objects.filter(id=property_id).exists():
+                self.stdout.write(self.style.ERROR(f"Property {property_id} not found"))
+                return
+            property_ids = [property_id]
+        else:
+            property_ids = list(
+                DpPropertyCompetitor.objects
+                .filter(deleted_at__isnull=True)
+                .order_by()
+                .values_list('property_id', flat=True)
+                .distinct()
+            )
+
+        log_operation(
+            logger, LogLevel.INFO,
+            f"Starting market aggregate refresh for {len(property_ids)} property(ies)",
+            "market_aggregate_refresh_start",
+            None, None,
+            property_count=len(property_ids),
+            full=full
+        )
+
+        started = time.monotonic()
+        total_rows = 0
+        for pid in property_ids:
+            try:
+                rows = refresh_market_aggregates(pid, full=full, batch_size=batch_size)
+                total_rows += rows
+                if rows:
+                    self.stdout.write(f"  {pid}: {rows} date(s) refreshed")
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"  Error refreshing property {pid}: {str(e)}"))
+                logger.error(f"Error refreshing market aggregates for property {pid}: {str(e)}", exc_info=True)
+
+        duration = time.monotonic() - started
+        log_operation(
+            logger, LogLevel.INFO,
+            f"Market aggregate refresh completed",
+            "market_aggregate_refresh_success",
+            None, None,
+            property_count=len(property_ids),
+            rows_refreshed=total_rows,
+            duration_seconds=round(duration, 3)
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Refreshed {total_rows} market aggregate date(s) across {len(property_ids)} property(ies) "
+                f"in {duration:.2f}s"
+            )
+        )
@@ -0,0 +1,102 @@
+"""
+Django management command to refresh the current price calendar projection
+
+Copies the latest price_change_history snapshot per (property, checkin_date) into
+DpCurrentPriceCalendar. Runs incrementally: only snapshots with as_of newer than
+the projection watermark of each property are read.
+
+This command can be run:
+1. Manually: python manage.py refresh_price_calendar
+2. Via cron job: right after each pricing run
+
+Usage:
+    python manage.py refresh_price_calendar
+    python manage.py refresh_price_calendar --property-id abc-123
+    python manage.py refresh_price_calendar --full
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from dynamic_pricing.models import Property, DpPriceChangeHistory
+from dynamic_pricing.price_calendar import refresh_current_price_calendar
+from vivere_stays.logging_utils import get_logger, log_operation, LogLevel, LoggerNames
+
+logger = get_logger(LoggerNames.DYNAMIC_PRICING)
+
+
+class Command(BaseCommand):
+    help = 'Refresh the current price calendar (latest snapshot per checkin_date) from price_change_history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--property-id',
+            type=str,
+            help='Refresh a specific property ID only',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Rebuild the projection from the whole history instead of new snapshots only',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per upsert batch (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        property_id = options.get('property_id')
+        full = options.get('full', False)
+        batch_size = options['batch_size']
+
+        if property_id:
+            if not Property.objects.filter(id=property_id).exists():
+                self.stdout.write(self.style.ERROR(f"Property {property_id} not found"))
+                return
+            property_ids = [property_id]
+        else:
+            property_ids = list(
+                DpPriceChangeHistory.objects
+                .order_by()
+                .values_list('property_id', flat=True)
+                .distinct()
+            )
+
+        log_operation(
+            logger, LogLevel.INFO,
+            f"Starting price calendar refresh for {len(property_ids)} property(ies)",
+            "price_calendar_refresh_start",
+            None, None,
+            property_count=len(property_ids),
+            full=full
+        )
+
+        started = time.monotonic()
+        total_rows = 0
+        for pid in property_ids:
+            try:
+                rows = refresh_current_price_calendar(pid, full=full, batch_size=batch_size)
+                total_rows += rows
+                if rows:
+                    self.stdout.write(f"  {pid}: {rows} date(s) refreshed")
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"  Error refreshing property {pid}: {str(e)}"))
+                logger.error(f"Error refreshing price calendar for property {pid}: {str(e)}", exc_info=True)
+
+        duration = time.monotonic() - started
+        log_operation(
+            logger, LogLevel.INFO,
+            f"Price calendar refresh completed",
+            "price_calendar_refresh_success",
+            None, None,
+            property_count=len(property_ids),
+            rows_refreshed=total_rows,
+            duration_seconds=round(duration, 3)
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Refreshed {total_rows} calendar date(s) across {len(property_ids)} property(ies) "
+                f"in {duration:.2f}s"
+            )
+        )
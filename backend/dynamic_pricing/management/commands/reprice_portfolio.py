@@ -0,0 +1,159 @@
+"""
+Django management command to reprice the whole portfolio
+
+Computes the recommended prices of every active property with the vectorized
+pricing engine and appends them to price_change_history as one pricing run.
+Rule tables are loaded for all properties in bulk; properties are then split in
+chunks across a pool of worker processes, each loading its inputs and writing
+its rows (COPY on PostgreSQL) in large batches. Reports throughput in
+property-days per second.
+
+This command can be run:
+1. Manually: python manage.py reprice_portfolio
+2. Via cron job: after the market aggregates and occupancy are refreshed
+
+Usage:
+    python manage.py reprice_portfolio
+    python manage.py reprice_portfolio --workers 8 --chunk-size 25
+    python manage.py reprice_portfolio --property-id abc-123 --property-id def-456 --days 90
+    python manage.py reprice_portfolio --dry-run
+"""
+
+import multiprocessing
+import os
+import time
+from datetime import datetime
+from functools import partial
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from dynamic_pricing.batch_pricing import chunk_jobs, get_portfolio_jobs, merge_stats, reprice_chunk
+from vivere_stays.logging_utils import get_logger, log_operation, LogLevel, LoggerNames
+
+logger = get_logger(LoggerNames.DYNAMIC_PRICING)
+
+
+class Command(BaseCommand):
+    help = 'Reprice all active properties in parallel and append the prices to price_change_history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--property-id',
+            action='append',
+            help='Reprice this property ID only (repeatable)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes; 1 prices in this process (default: number of CPUs)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=20,
+            help='Properties per worker task (default: 20)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help="Dates to price per property (default: each property's future days to price)",
+        )
+        parser.add_argument(
+            '--start-date',
+            type=str,
+            help='First date to price (YYYY-MM-DD, default: today)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Rows written per COPY / bulk insert (default: 10000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compute prices without writing them',
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        chunk_size = options['chunk_size']
+        batch_size = options['batch_size']
+        days = options.get('days')
+        dry_run = options.get('dry_run', False)
+
+        if workers < 1 or chunk_size < 1 or batch_size < 1 or (days is not None and days < 1):
+            raise CommandError('--workers, --chunk-size, --batch-size and --days must be positive')
+        start_date = timezone.now().date()
+        if options.get('start_date'):
+            try:
+                start_date = datetime.strptime(options['start_date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Invalid --start-date, expected YYYY-MM-DD')
+
+        started = time.monotonic()
+        jobs = get_portfolio_jobs(options.get('property_id'))
+        if not jobs:
+            self.stdout.write(self.style.WARNING("No active properties to reprice"))
+            return
+        chunks = chunk_jobs(jobs, chunk_size)
+        workers = min(workers, len(chunks))
+
+        log_operation(
+            logger, LogLevel.INFO,
+            f"Starting portfolio repricing for {len(jobs)} property(ies)",
+            "portfolio_repricing_start",
+            None, None,
+            property_count=len(jobs),
+            workers=workers,
+            start_date=str(start_date),
+            dry_run=dry_run
+        )
+        if dry_run:
+            self.stdout.write(self.style.WARNING("DRY RUN: no prices will be written"))
+
+        # One as_of for the whole run, so it reads as a single pricing snapshot; lead
+        # times always count from today, whatever the first priced date
+        task = partial(
+            reprice_chunk, start_date=start_date, as_of=timezone.now(), days=days,
+            batch_size=batch_size, dry_run=dry_run, today=timezone.now().date()
+        )
+        totals = {'properties': 0, 'property_days': 0, 'rows': 0, 'errors': []}
+        if workers == 1:
+            for chunk in chunks:
+                merge_stats(totals, task(chunk))
+        else:
+            # Forked workers must open their own database connections
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(workers) as pool:
+                for stats in pool.imap_unordered(task, chunks):
+                    merge_stats(totals, stats)
+
+        for property_id, error in totals['errors']:
+            self.stdout.write(self.style.ERROR(f"  Error repricing property {property_id}: {error}"))
+
+        duration = time.monotonic() - started
+        throughput = totals['property_days'] / duration if duration else 0
+        log_operation(
+            logger, LogLevel.INFO,
+            f"Portfolio repricing completed",
+            "portfolio_repricing_success",
+            None, None,
+            property_count=totals['properties'],
+            property_days=totals['property_days'],
+            rows_written=0 if dry_run else totals['rows'],
+            failed_properties=len(totals['errors']),
+            workers=workers,
+            duration_seconds=round(duration, 3),
+            property_days_per_second=round(throughput, 1),
+            dry_run=dry_run
+        )
+        verb = 'Would write' if dry_run else 'Wrote'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Repriced {totals['properties']} property(ies), {totals['property_days']} property-days "
+                f"in {duration:.2f}s with {workers} worker(s) ({throughput:,.0f} property-days/s); "
+                f"{verb} {totals['rows']} price_change_history row(s)"
+            )
+        )
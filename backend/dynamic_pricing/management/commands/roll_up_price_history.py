@@ -0,0 +1,126 @@
+"""
+Django management command to roll up old price_change_history snapshots
+
+Snapshots older than the retention window are reduced to the last as_of per day
+per checkin_date; superseded raw rows are moved to the price change history
+archive table in bounded batches. Keeps the hot table and its
+(property_id, checkin_date, as_of DESC) index small.
+
+This command can be run:
+1. Manually: python manage.py roll_up_price_history
+2. Via cron job: nightly, after the last pricing run
+
+Usage:
+    python manage.py roll_up_price_history
+    python manage.py roll_up_price_history --days 60
+    python manage.py roll_up_price_history --property-id abc-123 --dry-run
+"""
+
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from dynamic_pricing.models import Property, DpPriceChangeHistory
+from dynamic_pricing.price_retention import roll_up_price_history
+from vivere_stays.logging_utils import get_logger, log_operation, LogLevel, LoggerNames
+
+logger = get_logger(LoggerNames.DYNAMIC_PRICING)
+
+
+class Command(BaseCommand):
+    help = 'Roll up price_change_history snapshots older than N days to the last as_of per day and archive the rest'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=90,
+            help='Retention window: snapshots with as_of older than this many days are rolled up (default: 90)',
+        )
+        parser.add_argument(
+            '--property-id',
+            type=str,
+            help='Roll up a specific property ID only',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows moved to the archive per transaction (default: 5000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report rows that would be reclaimed without moving them',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        property_id = options.get('property_id')
+        batch_size = options['batch_size']
+        dry_run = options.get('dry_run', False)
+
+        if days < 1 or batch_size < 1:
+            raise CommandError('--days and --batch-size must be positive')
+
+        cutoff = timezone.now() - timedelta(days=days)
+
+        if property_id:
+            if not Property.objects.filter(id=property_id).exists():
+                self.stdout.write(self.style.ERROR(f"Property {property_id} not found"))
+                return
+            property_ids = [property_id]
+        else:
+            property_ids = list(
+                DpPriceChangeHistory.objects
+                .filter(as_of__lt=cutoff)
+                .order_by()
+                .values_list('property_id', flat=True)
+                .distinct()
+            )
+
+        log_operation(
+            logger, LogLevel.INFO,
+            f"Starting price history roll-up for {len(property_ids)} property(ies)",
+            "price_history_rollup_start",
+            None, None,
+            property_count=len(property_ids),
+            cutoff=cutoff.isoformat(),
+            dry_run=dry_run
+        )
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING("DRY RUN: no rows will be moved"))
+
+        started = time.monotonic()
+        totals = {'scanned': 0, 'kept': 0, 'archived': 0}
+        for pid in property_ids:
+            try:
+                stats = roll_up_price_history(pid, cutoff, batch_size=batch_size, dry_run=dry_run)
+                for key in totals:
+                    totals[key] += stats[key]
+                if stats['archived']:
+                    self.stdout.write(f"  {pid}: {stats['archived']} archived, {stats['kept']} kept")
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"  Error rolling up property {pid}: {str(e)}"))
+                logger.error(f"Error rolling up price history for property {pid}: {str(e)}", exc_info=True)
+
+        duration = time.monotonic() - started
+        log_operation(
+            logger, LogLevel.INFO,
+            f"Price history roll-up completed",
+            "price_history_rollup_success",
+            None, None,
+            property_count=len(property_ids),
+            rows_archived=totals['archived'],
+            rows_kept=totals['kept'],
+            duration_seconds=round(duration, 3),
+            dry_run=dry_run
+        )
+        verb = 'Would reclaim' if dry_run else 'Reclaimed'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ {verb} {totals['archived']} of {totals['scanned']} snapshot(s) older than {days} day(s) "
+                f"across {len(property_ids)} property(ies) in {duration:.2f}s"
+            )
+        )
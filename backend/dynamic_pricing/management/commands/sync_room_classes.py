@@ -0,0 +1,62 @@
+"""
+Django management command to sync the room class mappings
+
+Classifies the raw room_name strings of comp_prices_mv and
+historical_competitor_prices that have no DpRoomClassMapping yet into canonical
+room classes (single, double, twin, triple, family, suite, apartment, dormitory,
+other), so competitor price endpoints can filter by room class in SQL.
+
+This command can be run:
+1. Manually: python manage.py sync_room_classes
+2. Via cron job: after each comp_prices_mv refresh (new scrapes bring new room names)
+
+Usage:
+    python manage.py sync_room_classes
+    python manage.py sync_room_classes --reclassify
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from dynamic_pricing.room_classes import sync_room_class_mappings
+from vivere_stays.logging_utils import get_logger, log_operation, LogLevel, LoggerNames
+
+logger = get_logger(LoggerNames.DYNAMIC_PRICING)
+
+
+class Command(BaseCommand):
+    help = 'Map new competitor room names to canonical room classes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reclassify',
+            action='store_true',
+            help='Also re-run the rules on existing mappings (manual corrections are kept)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Mappings written per query (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stats = sync_room_class_mappings(
+            reclassify=options['reclassify'], batch_size=options['batch_size']
+        )
+        duration = time.monotonic() - started
+
+        log_operation(
+            logger, LogLevel.INFO,
+            f"Room class mapping sync completed",
+            "room_class_sync_success",
+            None, None,
+            mappings_created=stats['created'],
+            mappings_reclassified=stats['updated'],
+            duration_seconds=round(duration, 3)
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Mapped {stats['created']} new room name(s), reclassified {stats['updated']} in {duration:.2f}s"
+            )
+        )
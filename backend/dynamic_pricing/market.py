@@ -0,0 +1,380 @@
+"""
+Market Aggregate Helpers
+
+Daily competitor market aggregates per (property, checkin_date), maintained in
+DpDailyMarketAggregate from comp_prices_mv so calendar and chart views read one
+row per date instead of aggregating raw scrape rows.
+
+Each pricing competitor (active link, not only_follow) contributes its lowest
+positive price of the day; a competitor whose only rows are zero-priced with a
+sold-out message counts as sold out. The compression index is the share of
+followed competitors (every active link, only_follow included) that are sold out
+or not taking reservations, among those scraped for the date. Prices are
+normalized to the property currency (see fx) before they are compared. Refreshes
+are incremental: only checkin_dates with scrape rows whose update_tz is newer
+than the property's watermark (the newest source_update_tz already aggregated)
+are recomputed.
+"""
+
+import logging
+import statistics
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, Min, Q, Value, When
+
+from .fx import get_price_converter, get_property_currency
+from .models import CompetitorPriceMV, DpDailyMarketAggregate, DpPropertyCompetitor
+
+logger = logging.getLogger(__name__)
+
+# Aggregate columns written by the refresh
+AGGREGATE_FIELDS = [
+    'min_price',
+    'max_price',
+    'avg_price',
+    'median_price',
+    'priced_competitors',
+    'sold_out_competitors',
+    'available_competitors',
+    'unavailable_competitors',
+    'compression_index',
+    'source_update_tz',
+]
+
+# comp_price_calculation values and the aggregate column they select
+COMP_PRICE_CALCULATION_FIELDS = {
+    'min': 'min_price',
+    'max': 'max_price',
+    'avg': 'avg_price',
+    'median': 'median_price',
+}
+
+CENT = Decimal('0.01')
+
+
+def get_market_competitor_ids(property_id):
+    """
+    Return the ids of the competitors that drive pricing for a property
+    (active links, excluding only_follow competitors).
+    """
+    return list(
+        DpPropertyCompetitor.objects
+        .filter(property_id=property_id, deleted_at__isnull=True, only_follow=False)
+        .values_list('competitor_id', flat=True)
+    )
+
+
+def get_followed_competitor_ids(property_id):
+    """
+    Return the ids of every competitor a property follows (active links, only_follow included).
+    """
+    return list(
+        DpPropertyCompetitor.objects
+        .filter(property_id=property_id, deleted_at__isnull=True)
+        .values_list('competitor_id', flat=True)
+    )
+
+
+def get_market_watermark(property_id):
+    """
+    Return the newest scrape update_tz already aggregated for a property, or None.
+    """
+    return (
+        DpDailyMarketAggregate.objects
+        .filter(property_id=property_id)
+        .aggregate(watermark=Max('source_update_tz'))['watermark']
+    )
+
+
+def _quantize(value):
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _flag(condition):
+    """1 if any grouped row matches condition, else 0."""
+    return Max(Case(When(condition, then=Value(1)), default=Value(0), output_field=IntegerField()))
+
+
+def get_competitor_day_rows(scrape_rows):
+    """
+    Group scrape rows to one row per (checkin_date, competitor, currency) in the database.
+
+    Returns:
+        QuerySet: values with checkin_date, competitor_id, currency, best_price (lowest
+        positive price), sold_out (1 if a zero-priced row has a sold-out message),
+        available (1 if a positive price is bookable), not_taking (1 if a row is not
+        taking reservations) and update_tz (newest scrape)
+    """
+    return (
+        scrape_rows
+        .values('checkin_date', 'competitor_id', 'currency')
+        .annotate(
+            best_price=Min('price', filter=Q(price__gt=0)),
+            sold_out=_flag(Q(price=0, sold_out_message__isnull=False) & ~Q(sold_out_message='')),
+            available=_flag(Q(price__gt=0) & ~Q(taking_reservations=False)),
+            not_taking=_flag(Q(taking_reservations=False)),
+            latest_update_tz=Max('update_tz'),
+        )
+        .order_by()
+    )
+
+
+def merge_currency_rows(rows, convert):
+    """
+    Convert grouped competitor rows to one currency and merge them to one row per
+    (checkin_date, competitor), keeping the lowest converted price.
+
+    Args:
+        rows: Iterable of get_competitor_day_rows dicts
+        convert: fx.get_price_converter callable
+
+    Returns:
+        dict: {checkin_date: [merged row per competitor]}
+    """
+    merged = {}
+    for row in rows:
+        price = convert(row['best_price'], row['currency'])
+        key = (row['checkin_date'], row['competitor_id'])
+        current = merged.get(key)
+        if current is None:
+            merged[key] = {**row, 'best_price': price}
+            continue
+        if price is not None and (current['best_price'] is None or price < current['best_price']):
+            current['best_price'] = price
+        for flag in ('sold_out', 'available', 'not_taking'):
+            current[flag] = max(current[flag], row[flag])
+        current['latest_update_tz'] = max(current['latest_update_tz'], row['latest_update_tz'])
+
+    rows_by_date = {}
+    for (checkin_date, _), row in merged.items():
+        rows_by_date.setdefault(checkin_date, []).append(row)
+    return rows_by_date
+
+
+def summarize_market_day(rows, pricing_competitor_ids=None):
+    """
+    Aggregate one checkin_date of grouped competitor rows into market statistics.
+
+    Price statistics and sold-out counts only use the pricing competitors; the
+    availability counts and the compression index use every row, i.e. every
+    followed competitor scraped for the date. Followed competitors without a scrape
+    for the date are left out of the denominator rather than counted as available,
+    so a missing scrape never lowers the index.
+
+    Args:
+        rows: Iterable of get_competitor_day_rows dicts of one checkin_date
+        pricing_competitor_ids: Competitor ids behind the price statistics (default: all rows)
+
+    Returns:
+        dict: AGGREGATE_FIELDS values
+    """
+    prices = []
+    sold_out = available = unavailable = 0
+    source_update_tz = None
+    for row in rows:
+        if source_update_tz is None or row['latest_update_tz'] > source_update_tz:
+            source_update_tz = row['latest_update_tz']
+        if row['available']:
+            available += 1
+        elif row['sold_out'] or row['not_taking']:
+            unavailable += 1
+        if pricing_competitor_ids is not None and row['competitor_id'] not in pricing_competitor_ids:
+            continue
+        if row['best_price'] is not None:
+            prices.append(Decimal(row['best_price']))
+        elif row['sold_out']:
+            # A competitor with any priced room that day is not sold out
+            sold_out += 1
+
+    prices.sort()
+    known = available + unavailable
+    return {
+        'min_price': prices[0] if prices else None,
+        'max_price': prices[-1] if prices else None,
+        'avg_price': _quantize(sum(prices) / len(prices)) if prices else None,
+        'median_price': _quantize(statistics.median(prices)) if prices else None,
+        'priced_competitors': len(prices),
+        'sold_out_competitors': sold_out,
+        'available_competitors': available,
+        'unavailable_competitors': unavailable,
+        'compression_index': round(unavailable / known, 4) if known else None,
+        'source_update_tz': source_update_tz,
+    }
+
+
+def refresh_market_aggregates(property_id, full=False, batch_size=500):
+    """
+    Refresh the daily market aggregates of one property.
+
+    Finds the checkin_dates with scrape rows newer than the watermark and recomputes
+    those dates from all of their scrape rows, grouped per competitor by a single
+    query per batch of dates (the whole horizon fits in one default batch). With
+    full=True every date is rebuilt (use after the property's competitor set changes).
+
+    Returns:
+        int: Number of aggregate rows inserted or updated
+    """
+    pricing_competitor_ids = set(get_market_competitor_ids(property_id))
+    scrape_rows = CompetitorPriceMV.objects.filter(competitor_id__in=get_followed_competitor_ids(property_id))
+    convert = get_price_converter(get_property_currency(property_id))
+
+    watermark = None if full else get_market_watermark(property_id)
+    changed = scrape_rows
+    if watermark is not None:
+        changed = changed.filter(update_tz__gt=watermark)
+    dates = sorted(changed.order_by().values_list('checkin_date', flat=True).distinct())
+
+    refreshed = 0
+    with transaction.atomic():
+        if full:
+            DpDailyMarketAggregate.objects.filter(property_id=property_id).delete()
+
+        for i in range(0, len(dates), batch_size):
+            batch_dates = dates[i:i + batch_size]
+            rows_by_date = merge_currency_rows(
+                get_competitor_day_rows(
+                    scrape_rows.filter(checkin_date__gte=batch_dates[0], checkin_date__lte=batch_dates[-1])
+                ),
+                convert,
+            )
+
+            aggregates = [
+                DpDailyMarketAggregate(
+                    property_id_id=property_id,
+                    checkin_date=checkin_date,
+                    **summarize_market_day(rows_by_date[checkin_date], pricing_competitor_ids)
+                )
+                for checkin_date in batch_dates
+                if checkin_date in rows_by_date
+            ]
+            DpDailyMarketAggregate.objects.bulk_create(
+                aggregates,
+                update_conflicts=True,
+                unique_fields=['property_id', 'checkin_date'],
+                update_fields=AGGREGATE_FIELDS + ['refreshed_at'],
+            )
+            refreshed += len(aggregates)
+
+    logger.info(
+        f"Refreshed market aggregates for property {property_id}: "
+        f"{refreshed} dates (watermark={watermark}, full={full})"
+    )
+    return refreshed
+
+
+def get_market_aggregates(property_id, start_date, end_date):
+    """
+    Get the daily market aggregates of a property for a date range.
+
+    Returns:
+        dict: {checkin_date: DpDailyMarketAggregate}
+    """
+    return {
+        row.checkin_date: row
+        for row in DpDailyMarketAggregate.objects.filter(
+            property_id=property_id,
+            checkin_date__gte=start_date,
+            checkin_date__lte=end_date,
+        )
+    }
+
+
+def get_compression_indexes(property_id, start_date, end_date):
+    """
+    Get the stored compression index per date for a date range.
+
+    Returns:
+        dict: {checkin_date: compression_index (0-1) or None}
+    """
+    return dict(
+        DpDailyMarketAggregate.objects
+        .filter(property_id=property_id, checkin_date__gte=start_date, checkin_date__lte=end_date)
+        .values_list('checkin_date', 'compression_index')
+    )
+
+
+def select_market_price(aggregate, comp_price_calculation='min', min_competitors=2):
+    """
+    Return the market price that drives pricing for one aggregate row.
+
+    Applies DpGeneralSettings.comp_price_calculation (min/max/avg/median) and
+    returns None when fewer than min_competitors competitors are priced.
+    """
+    if aggregate is None or aggregate.priced_competitors < min_competitors:
+        return None
+    field = COMP_PRICE_CALCULATION_FIELDS.get(comp_price_calculation, 'min_price')
+    return getattr(aggregate, field)
+
+
+def reduce_best_prices(rows, convert=None):
+    """
+    Reduce scrape rows to the best price and sold-out flag per competitor and date in one pass.
+
+    A row with price 0 and a sold-out message marks the day sold out; otherwise the
+    lowest positive price of the day is kept.
+
+    Args:
+        rows: Iterable of dicts with competitor_id, checkin_date, price and sold_out_message
+        convert: Optional fx.get_price_converter callable; rows then also need currency
+            and prices are compared (and returned) in the converter's currency
+
+    Returns:
+        dict: {competitor_id: {checkin_date: {'best_price': price or None, 'sold_out': bool}}}
+    """
+    price_map = {}
+    for row in rows:
+        competitor_key = row['competitor_id']
+        try:
+            competitor_key = int(competitor_key)
+        except (TypeError, ValueError):
+            pass
+        price = row['price']
+        if convert is not None and price:
+            price = convert(price, row.get('currency'))
+            if price is None:
+                # No FX rate: the price cannot be compared with the others
+                continue
+
+        comp_map = price_map.setdefault(competitor_key, {})
+        day_entry = comp_map.setdefault(row['checkin_date'], {'best_price': None, 'sold_out': False})
+
+        try:
+            price_value = float(price) if price is not None else None
+        except (TypeError, ValueError):
+            # Ignore rows with non-numeric price
+            continue
+
+        if price_value == 0.0 and row.get('sold_out_message'):
+            day_entry['sold_out'] = True
+        elif price_value is not None and price_value > 0.0:
+            if day_entry['best_price'] is None or price_value < float(day_entry['best_price']):
+                day_entry['best_price'] = price
+    return price_map
+
+
+def build_price_matrix(competitors, dates, price_map):
+    """
+    Build one row of best prices and sold-out flags per competitor over the given dates.
+
+    Sold-out days have a null price; a day counts as sold out only if no room was priced.
+
+    Returns:
+        list: [{'id', 'name', 'prices': [...], 'sold_out': [...]}] in competitors order
+    """
+    matrix = []
+    for comp in competitors:
+        comp_map = price_map.get(comp.id, {})
+        prices = []
+        sold_out = []
+        for d in dates:
+            entry = comp_map.get(d)
+            best_price = entry['best_price'] if entry else None
+            prices.append(best_price)
+            sold_out.append(bool(entry and best_price is None and entry['sold_out']))
+        matrix.append({
+            'id': comp.id,
+            'name': comp.competitor_name,
+            'prices': prices,
+            'sold_out': sold_out,
+        })
+    return matrix
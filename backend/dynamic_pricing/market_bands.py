@@ -0,0 +1,180 @@
+"""
+Market Positioning Bands
+
+p25/p50/p75 competitor price bands per checkin_date and where the property's
+recom_price sits within them. comp_prices_mv is read once for the whole horizon,
+grouped by the database to each competitor's lowest price of the day (per
+currency, converted to the property currency with fx), into a date x competitor
+matrix; percentiles, counts and positions are then computed
+with NumPy over the whole matrix instead of per-date Python loops.
+"""
+
+from datetime import date
+from operator import itemgetter
+import numpy as np
+from django.db.models import Min
+
+from .fx import get_price_converter, get_property_currency
+from .market import get_market_competitor_ids
+from .models import CompetitorPriceMV, DpGeneralSettings
+from .price_calendar import get_latest_price_values
+
+# Percentiles of the market bands
+BAND_PERCENTILES = (25, 50, 75)
+
+# Band labels, index = number of band edges (p25, p50, p75) below our price
+BAND_LABELS = ['below_p25', 'p25_p50', 'p50_p75', 'above_p75']
+
+
+def build_competitor_price_matrix(competitor_ids, start_date, days, rows):
+    """
+    Build a date x competitor matrix of the lowest positive price per day.
+
+    Args:
+        competitor_ids: Competitor ids, one matrix column each
+        start_date: Date of the first matrix row
+        days: Number of matrix rows
+        rows: Sequence of (competitor_id, checkin_date, price) tuples
+
+    Returns:
+        numpy.ndarray: shape (days, len(competitor_ids)), NaN where a competitor has no price
+    """
+    matrix = np.full((days, len(competitor_ids)), np.inf)
+    rows = list(rows)
+    if rows and competitor_ids:
+        count = len(rows)
+        competitors = np.fromiter(map(itemgetter(0), rows), dtype=np.int64, count=count)
+        offsets = np.fromiter(map(date.toordinal, map(itemgetter(1), rows)), dtype=np.intp, count=count)
+        offsets -= start_date.toordinal()
+        prices = np.fromiter(map(itemgetter(2), rows), dtype=float, count=count)
+
+        column_ids = np.asarray(competitor_ids)
+        order = np.argsort(column_ids)
+        columns = order[np.searchsorted(column_ids, competitors, sorter=order)]
+        valid = prices > 0
+        # Lowest room price of each competitor and day in one unbuffered pass
+        np.minimum.at(matrix, (offsets[valid], columns[valid]), prices[valid])
+    matrix[np.isinf(matrix)] = np.nan
+    return matrix
+
+
+def compute_price_bands(matrix, min_competitors=1, percentiles=BAND_PERCENTILES):
+    """
+    Compute percentile bands per matrix row (linear interpolation, like numpy.percentile).
+
+    Each row is sorted once with NaNs last and the percentiles are interpolated for all
+    rows at once; rows with fewer than min_competitors priced competitors get NaN bands.
+
+    Returns:
+        tuple: (bands array of shape (len(percentiles), days), priced competitor counts per day)
+    """
+    days = matrix.shape[0]
+    counts = np.count_nonzero(~np.isnan(matrix), axis=1)
+    bands = np.full((len(percentiles), days), np.nan)
+    if matrix.shape[1] == 0:
+        return bands, counts
+
+    ordered = np.sort(matrix, axis=1)
+    last = np.maximum(counts, 1) - 1
+    ranks = last[np.newaxis, :] * (np.asarray(percentiles, dtype=float)[:, np.newaxis] / 100)
+    lower = np.floor(ranks).astype(np.intp)
+    upper = np.minimum(lower + 1, last[np.newaxis, :])
+    day_index = np.arange(days)[np.newaxis, :]
+    low_values = ordered[day_index, lower]
+    high_values = ordered[day_index, upper]
+
+    enough = counts >= max(min_competitors, 1)
+    bands[:, enough] = (low_values + (high_values - low_values) * (ranks - lower))[:, enough]
+    return bands, counts
+
+
+def compute_positions(matrix, prices, bands, counts):
+    """
+    Locate our price in the market of each day.
+
+    Returns:
+        tuple: (percentile rank of our price among competitors per day, NaN without
+        price or market; band index into BAND_LABELS per day, -1 when unknown)
+    """
+    ours = prices[:, np.newaxis]
+    below = np.count_nonzero(matrix < ours, axis=1)
+    equal = np.count_nonzero(matrix == ours, axis=1)
+    known = ~np.isnan(prices) & ~np.isnan(bands[0])
+    position = np.full(prices.shape, np.nan)
+    np.divide((below + 0.5 * equal) * 100, counts, out=position, where=known & (counts > 0))
+
+    band = np.count_nonzero(bands <= prices, axis=0)
+    band[~known] = -1
+    return position, band
+
+
+def _value(number):
+    return None if np.isnan(number) else round(float(number), 2)
+
+
+def get_market_bands(property_id, start_date, end_date, min_competitors=None):
+    """
+    Get the market positioning bands of a property for a date range.
+
+    Uses the property's pricing competitors (only_follow excluded) and
+    DpGeneralSettings.min_competitors unless min_competitors is given.
+
+    Returns:
+        list: One dict per date with checkin_date, p25, p50, p75, competitors,
+        recom_price, position_pct and band
+    """
+    if min_competitors is None:
+        min_competitors = (
+            DpGeneralSettings.objects
+            .filter(property_id=property_id)
+            .values_list('min_competitors', flat=True)
+            .first()
+        ) or 1
+
+    days = (end_date - start_date).days + 1
+    competitor_ids = sorted(get_market_competitor_ids(property_id))
+    # The database reduces room rows to one lowest price per competitor, date and currency;
+    # the matrix keeps the lowest converted price of each competitor and date
+    convert = get_price_converter(get_property_currency(property_id))
+    grouped = (
+        CompetitorPriceMV.objects
+        .filter(
+            competitor_id__in=competitor_ids,
+            checkin_date__gte=start_date,
+            checkin_date__lte=end_date,
+            price__gt=0,
+        )
+        .values('competitor_id', 'checkin_date', 'currency')
+        .annotate(best_price=Min('price'))
+        .order_by()
+        .values_list('competitor_id', 'checkin_date', 'best_price', 'currency')
+    )
+    rows = []
+    for competitor_id, checkin_date, best_price, currency in grouped:
+        price = convert(best_price, currency)
+        if price is not None:
+            rows.append((competitor_id, checkin_date, price))
+    matrix = build_competitor_price_matrix(competitor_ids, start_date, days, rows)
+    bands, counts = compute_price_bands(matrix, min_competitors)
+
+    recom_prices = get_latest_price_values(property_id, start_date, end_date, ['recom_price'])
+    prices = np.full(days, np.nan)
+    for checkin_date, recom_price in recom_prices.values():
+        if recom_price is not None:
+            prices[(checkin_date - start_date).days] = recom_price
+    position, band = compute_positions(matrix, prices, bands, counts)
+
+    dates = np.arange(np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D') + 1)
+    return [
+        {
+            'checkin_date': str(dates[i]),
+            'p25': _value(bands[0, i]),
+            'p50': _value(bands[1, i]),
+            'p75': _value(bands[2, i]),
+            'competitors': int(counts[i]),
+            'recom_price': _value(prices[i]),
+            'position_pct': _value(position[i]),
+            'band': BAND_LABELS[band[i]] if band[i] >= 0 else None,
+        }
+        for i in range(days)
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0 on 2026-10-16 22:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dynamic_pricing', '0005_rename_property_id_overwritepricehistory_property_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DpCurrentPriceCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checkin_date', models.DateField()),
+                ('as_of', models.DateTimeField()),
+                ('occupancy', models.FloatField(blank=True, null=True)),
+                ('pms_hotel_id', models.CharField(max_length=255)),
+                ('msp', models.IntegerField()),
+                ('recom_price', models.IntegerField()),
+                ('recom_los', models.IntegerField()),
+                ('overwrite_los', models.IntegerField(blank=True, null=True)),
+                ('base_price', models.IntegerField()),
+                ('base_price_choice', models.CharField(max_length=255)),
+                ('competitor_average', models.FloatField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+                ('property_id', models.ForeignKey(db_column='property_id', on_delete=django.db.models.deletion.CASCADE, to='dynamic_pricing.property')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='current_price_calendar', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Current Price Calendar',
+                'verbose_name_plural': 'Current Price Calendar',
+                'db_table': 'dynamic_pricing_dpcurrentpricecalendar',
+                'indexes': [models.Index(fields=['property_id', 'as_of'], name='idx_current_calendar_asof')],
+                'unique_together': {('property_id', 'checkin_date')},
+            },
+        ),
+    ]
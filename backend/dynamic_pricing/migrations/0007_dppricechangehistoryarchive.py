@@ -0,0 +1,42 @@
+# Generated by Django 5.0 on 2026-10-16 22:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dynamic_pricing', '0006_dpcurrentpricecalendar'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DpPriceChangeHistoryArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('checkin_date', models.DateField()),
+                ('as_of', models.DateTimeField()),
+                ('occupancy', models.FloatField(blank=True, null=True)),
+                ('pms_hotel_id', models.CharField(max_length=255)),
+                ('msp', models.IntegerField()),
+                ('recom_price', models.IntegerField()),
+                ('recom_los', models.IntegerField()),
+                ('overwrite_los', models.IntegerField(blank=True, null=True)),
+                ('base_price', models.IntegerField()),
+                ('base_price_choice', models.CharField(max_length=255)),
+                ('competitor_average', models.FloatField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('property_id', models.ForeignKey(db_column='property_id', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='dynamic_pricing.property')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Price Change History Archive',
+                'verbose_name_plural': 'Price Change History Archive',
+                'db_table': 'dynamic_pricing_dppricechangehistoryarchive',
+                'indexes': [models.Index(fields=['property_id', 'checkin_date', 'as_of'], name='idx_price_archive_lookup')],
+            },
+        ),
+    ]
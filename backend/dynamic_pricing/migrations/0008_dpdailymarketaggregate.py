@@ -0,0 +1,37 @@
+# Generated by Django 5.0 on 2026-10-16 22:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dynamic_pricing', '0007_dppricechangehistoryarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DpDailyMarketAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checkin_date', models.DateField()),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('avg_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('median_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('priced_competitors', models.IntegerField(default=0)),
+                ('sold_out_competitors', models.IntegerField(default=0)),
+                ('source_update_tz', models.DateTimeField()),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+                ('property_id', models.ForeignKey(db_column='property_id', on_delete=django.db.models.deletion.CASCADE, to='dynamic_pricing.property')),
+            ],
+            options={
+                'verbose_name': 'Daily Market Aggregate',
+                'verbose_name_plural': 'Daily Market Aggregates',
+                'db_table': 'dynamic_pricing_dpdailymarketaggregate',
+                'indexes': [models.Index(fields=['property_id', 'source_update_tz'], name='idx_market_agg_watermark')],
+                'unique_together': {('property_id', 'checkin_date')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-16 22:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dynamic_pricing', '0008_dpdailymarketaggregate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DpMaterializedViewRefresh',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view_name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('success', 'Success'), ('failed', 'Failed'), ('skipped', 'Skipped')], max_length=20)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField()),
+                ('duration_seconds', models.FloatField(blank=True, null=True)),
+                ('row_count', models.BigIntegerField(blank=True, null=True)),
+                ('concurrently', models.BooleanField(default=True)),
+                ('error', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Materialized View Refresh',
+                'verbose_name_plural': 'Materialized View Refreshes',
+                'db_table': 'dynamic_pricing_dpmaterializedviewrefresh',
+                'indexes': [models.Index(fields=['view_name', 'status', 'finished_at'], name='idx_mv_refresh_last')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0 on 2026-10-16 22:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dynamic_pricing', '0009_dpmaterializedviewrefresh'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DpCompetitorPriceState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checkin_date', models.DateField()),
+                ('best_price', models.FloatField(blank=True, help_text='Lowest positive price of the latest scrape, null if none', null=True)),
+                ('sold_out', models.BooleanField(default=False)),
+                ('scrape_date', models.DateField()),
+                ('source_update_tz', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('competitor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_states', to='dynamic_pricing.competitor')),
+            ],
+            options={
+                'verbose_name': 'Competitor Price State',
+                'verbose_name_plural': 'Competitor Price States',
+                'db_table': 'dynamic_pricing_dpcompetitorpricestate',
+                'indexes': [models.Index(fields=['source_update_tz'], name='idx_comp_price_state_wm')],
+                'unique_together': {('competitor', 'checkin_date')},
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0 on 2026-10-16 22:57
+
+from django.db import migrations, models
+
+
+def normalize_name(name):
+    # Frozen copy of Competitor.normalize_name
+    return ' '.join(name.split()).casefold()
+
+
+def backfill_normalized_name(apps, schema_editor):
+    """
+    Key existing competitors; the oldest competitor of each name keeps the key and
+    legacy duplicates stay NULL so the unique index can be built.
+    """
+    Competitor = apps.get_model('dynamic_pricing', 'Competitor')
+    seen = set()
+    batch = []
+    for competitor in Competitor.objects.order_by('id').only('id', 'competitor_name').iterator(chunk_size=2000):
+        key = normalize_name(competitor.competitor_name or '')
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        competitor.normalized_name = key
+        batch.append(competitor)
+        if len(batch) >= 1000:
+            Competitor.objects.bulk_update(batch, ['normalized_name'])
+            batch = []
+    if batch:
+        Competitor.objects.bulk_update(batch, ['normalized_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dynamic_pricing', '0010_dpcompetitorpricestate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='competitor',
+            name='normalized_name',
+            field=models.CharField(blank=True, editable=False, help_text='Case- and whitespace-insensitive name key, filled on save', max_length=255, null=True),
+        ),
+        migrations.RunPython(backfill_normalized_name, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='competitor',
+            name='normalized_name',
+            field=models.CharField(blank=True, editable=False, help_text='Case- and whitespace-insensitive name key, filled on save', max_length=255, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0 on 2026-10-16 23:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dynamic_pricing', '0011_competitor_normalized_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dpdailymarketaggregate',
+            name='available_competitors',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dpdailymarketaggregate',
+            name='compression_index',
+            field=models.FloatField(blank=True, help_text='Share (0-1) of competitors with known availability that are sold out or not taking reservations', null=True),
+        ),
+        migrations.AddField(
+            model_name='dpdailymarketaggregate',
+            name='unavailable_competitors',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0 on 2026-10-16 23:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dynamic_pricing', '0012_dpdailymarketaggregate_compression'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DpRoomClassMapping',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('room_name', models.CharField(max_length=255, unique=True)),
+                ('room_class', models.CharField(choices=[('single', 'Single'), ('double', 'Double'), ('twin', 'Twin'), ('triple', 'Triple'), ('family', 'Family / Quadruple'), ('suite', 'Suite'), ('apartment', 'Apartment / Studio'), ('dormitory', 'Dormitory / Shared'), ('other', 'Other')], max_length=20)),
+                ('is_manual', models.BooleanField(default=False, help_text='Set by hand; never reclassified by the sync')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Room Class Mapping',
+                'verbose_name_plural': 'Room Class Mappings',
+                'db_table': 'dynamic_pricing_dproomclassmapping',
+                'indexes': [models.Index(fields=['room_class', 'room_name'], name='idx_room_class_lookup')],
+            },
+        ),
+    ]
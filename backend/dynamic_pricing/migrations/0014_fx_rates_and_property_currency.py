@@ -0,0 +1,36 @@
+# Generated by Django 5.0 on 2026-10-16 23:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dynamic_pricing', '0013_dproomclassmapping'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='currency',
+            field=models.CharField(default='EUR', help_text='ISO 4217 code competitor prices are normalized to (e.g. EUR)', max_length=3),
+        ),
+        migrations.CreateModel(
+            name='DpFxRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rate_date', models.DateField()),
+                ('currency', models.CharField(help_text='ISO 4217 code (e.g. USD)', max_length=3)),
+                ('rate', models.DecimalField(decimal_places=8, help_text='Units of currency per 1 EUR', max_digits=18)),
+                ('source', models.CharField(blank=True, help_text='File the rate was loaded from', max_length=255, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'FX Rate',
+                'verbose_name_plural': 'FX Rates',
+                'db_table': 'dynamic_pricing_dpfxrate',
+                'unique_together': {('rate_date', 'currency')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-16 23:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dynamic_pricing', '0014_fx_rates_and_property_currency'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dpdailymarketaggregate',
+            name='compression_index',
+            field=models.FloatField(blank=True, help_text='Share (0-1) of followed competitors scraped for the date that are sold out or not taking reservations', null=True),
+        ),
+    ]
@@ -11,6 +11,10 @@ class Competitor(models.Model):
     """
     competitor_name = models.CharField(max_length=255)
     booking_link = models.URLField(null=True, blank=True)    
+    normalized_name = models.CharField(
+        max_length=255, unique=True, null=True, blank=True, editable=False,
+        help_text="Case- and whitespace-insensitive name key, filled on save"
+    )
     
     class Meta:
         db_table = 'dynamic_pricing_competitor'
@@ -20,6 +24,23 @@ class Competitor(models.Model):
     def __str__(self):
         return f"{self.competitor_name} (ID: {self.id})"
 
+    @staticmethod
+    def normalize_name(name):
+        """Return the normalized_name key of a competitor name."""
+        return ' '.join(name.split()).casefold()
+
+    def save(self, *args, **kwargs):
+        # Recomputed on every save so renames move the key with the name
+        key = self.normalize_name(self.competitor_name) if self.competitor_name else None
+        if (
+            key and self.normalized_name is None and not self._state.adding
+            and Competitor.objects.filter(normalized_name=key).exclude(pk=self.pk).exists()
+        ):
+            # Legacy duplicate left unkeyed by the backfill; it stays unkeyed while its key is taken
+            key = None
+        self.normalized_name = key
+        super().save(*args, **kwargs)
+
 
 class PropertyManagementSystem(models.Model):
     """
@@ -72,6 +93,7 @@ class Property(models.Model):
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, help_text="Latitude coordinate")
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, help_text="Longitude coordinate")
     rm_email = models.CharField(max_length=255, null=True, blank=True)
+    currency = models.CharField(max_length=3, default='EUR', help_text="ISO 4217 code competitor prices are normalized to (e.g. EUR)")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
@@ -371,6 +393,95 @@ class DpPriceChangeHistory(models.Model):
         return f"{self.property_id.name} - {self.checkin_date} at {self.as_of}"
 
 
+class DpCurrentPriceCalendar(models.Model):
+    """
+    Current price calendar - the latest DpPriceChangeHistory snapshot per (property, checkin_date).
+
+    This is a projection of the external price_change_history table maintained by the
+    refresh_price_calendar management command, so calendar views read one row per date
+    instead of every as_of snapshot. Columns mirror DpPriceChangeHistory.
+    """
+    property_id = models.ForeignKey(Property, on_delete=models.CASCADE, db_column='property_id')
+    user = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        related_name='current_price_calendar',
+        db_constraint=False,
+    )
+    checkin_date = models.DateField()
+    as_of = models.DateTimeField()  # as_of of the projected snapshot
+    occupancy = models.FloatField(null=True, blank=True)
+    pms_hotel_id = models.CharField(max_length=255)
+    msp = models.IntegerField()
+    recom_price = models.IntegerField()
+    recom_los = models.IntegerField()
+    overwrite_los = models.IntegerField(null=True, blank=True)
+    base_price = models.IntegerField()
+    base_price_choice = models.CharField(max_length=255)
+    competitor_average = models.FloatField(null=True, blank=True)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'dynamic_pricing_dpcurrentpricecalendar'
+        unique_together = ('property_id', 'checkin_date')
+        indexes = [
+            models.Index(fields=['property_id', 'as_of'], name='idx_current_calendar_asof'),
+        ]
+        verbose_name = 'Current Price Calendar'
+        verbose_name_plural = 'Current Price Calendar'
+
+    def __str__(self):
+        return f"{self.property_id_id} - {self.checkin_date} (as of {self.as_of})"
+
+
+class DpPriceChangeHistoryArchive(models.Model):
+    """
+    Archive of superseded price_change_history snapshots.
+
+    The roll_up_price_history management command keeps only the last as_of per day
+    per checkin_date for snapshots older than the retention window and moves the
+    other raw rows here, keeping their original id as primary key.
+    Columns mirror DpPriceChangeHistory.
+    """
+    id = models.BigIntegerField(primary_key=True)  # id of the original price_change_history row
+    property_id = models.ForeignKey(
+        Property,
+        on_delete=models.DO_NOTHING,
+        db_column='property_id',
+        db_constraint=False,
+        related_name='+',
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+    )
+    checkin_date = models.DateField()
+    as_of = models.DateTimeField()
+    occupancy = models.FloatField(null=True, blank=True)
+    pms_hotel_id = models.CharField(max_length=255)
+    msp = models.IntegerField()
+    recom_price = models.IntegerField()
+    recom_los = models.IntegerField()
+    overwrite_los = models.IntegerField(null=True, blank=True)
+    base_price = models.IntegerField()
+    base_price_choice = models.CharField(max_length=255)
+    competitor_average = models.FloatField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'dynamic_pricing_dppricechangehistoryarchive'
+        indexes = [
+            models.Index(fields=['property_id', 'checkin_date', 'as_of'], name='idx_price_archive_lookup'),
+        ]
+        verbose_name = 'Price Change History Archive'
+        verbose_name_plural = 'Price Change History Archive'
+
+    def __str__(self):
+        return f"{self.property_id_id} - {self.checkin_date} at {self.as_of} (archived)"
+
+
 class DpHistoricalCompetitorPrice(models.Model):
     """
     Historical competitor prices (imported from booking.historical_competitor_prices)
@@ -453,6 +564,178 @@ class CompetitorPriceMV(models.Model):
         return f"{self.hotel_name} ({self.competitor_id}) {self.checkin_date}: {self.price}"
 
 
+class DpRoomClassMapping(models.Model):
+    """
+    Mapping of raw scraped room_name strings to canonical room classes.
+
+    Filled by the sync_room_classes management command from the room names in
+    comp_prices_mv and historical_competitor_prices (rule-based), and correctable
+    by hand (is_manual rows are never overwritten). Competitor price queries filter
+    by room class with a subquery on this table.
+    """
+    ROOM_CLASS_CHOICES = [
+        ('single', 'Single'),
+        ('double', 'Double'),
+        ('twin', 'Twin'),
+        ('triple', 'Triple'),
+        ('family', 'Family / Quadruple'),
+        ('suite', 'Suite'),
+        ('apartment', 'Apartment / Studio'),
+        ('dormitory', 'Dormitory / Shared'),
+        ('other', 'Other'),
+    ]
+
+    room_name = models.CharField(max_length=255, unique=True)
+    room_class = models.CharField(max_length=20, choices=ROOM_CLASS_CHOICES)
+    is_manual = models.BooleanField(default=False, help_text="Set by hand; never reclassified by the sync")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'dynamic_pricing_dproomclassmapping'
+        indexes = [
+            models.Index(fields=['room_class', 'room_name'], name='idx_room_class_lookup'),
+        ]
+        verbose_name = 'Room Class Mapping'
+        verbose_name_plural = 'Room Class Mappings'
+
+    def __str__(self):
+        return f"{self.room_name} -> {self.room_class}"
+
+
+class DpFxRate(models.Model):
+    """
+    Daily foreign exchange reference rates, loaded from a file by the load_fx_rates
+    management command (no network access needed).
+
+    rate is the number of currency units per 1 unit of FX_BASE_CURRENCY (EUR), as
+    in the ECB reference rates. Competitor prices are converted to the property
+    currency with the latest rate on or before the conversion date.
+    """
+    rate_date = models.DateField()
+    currency = models.CharField(max_length=3, help_text="ISO 4217 code (e.g. USD)")
+    rate = models.DecimalField(max_digits=18, decimal_places=8, help_text="Units of currency per 1 EUR")
+    source = models.CharField(max_length=255, null=True, blank=True, help_text="File the rate was loaded from")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'dynamic_pricing_dpfxrate'
+        unique_together = ('rate_date', 'currency')
+        verbose_name = 'FX Rate'
+        verbose_name_plural = 'FX Rates'
+
+    def __str__(self):
+        return f"{self.rate_date} EUR/{self.currency} {self.rate}"
+
+
+class DpDailyMarketAggregate(models.Model):
+    """
+    Daily competitor market aggregate per (property, checkin_date).
+
+    Maintained from comp_prices_mv by the refresh_market_aggregates management
+    command: each competitor contributes its lowest positive price of the day, and
+    the row stores min/max/avg/median over the priced competitors plus the number
+    of priced and sold-out competitors (pricing competitors only). The compression
+    index is the share of followed competitors, only_follow included, that are sold
+    out or not taking reservations among those scraped for the date.
+    source_update_tz is the newest update_tz of the scrape rows behind the
+    aggregate (the refresh watermark).
+    """
+    property_id = models.ForeignKey(Property, on_delete=models.CASCADE, db_column='property_id')
+    checkin_date = models.DateField()
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    avg_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    median_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    priced_competitors = models.IntegerField(default=0)
+    sold_out_competitors = models.IntegerField(default=0)
+    available_competitors = models.IntegerField(default=0)
+    unavailable_competitors = models.IntegerField(default=0)
+    compression_index = models.FloatField(
+        null=True, blank=True,
+        help_text="Share (0-1) of followed competitors scraped for the date that are sold out or not taking reservations"
+    )
+    source_update_tz = models.DateTimeField()
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'dynamic_pricing_dpdailymarketaggregate'
+        unique_together = ('property_id', 'checkin_date')
+        indexes = [
+            models.Index(fields=['property_id', 'source_update_tz'], name='idx_market_agg_watermark'),
+        ]
+        verbose_name = 'Daily Market Aggregate'
+        verbose_name_plural = 'Daily Market Aggregates'
+
+    def __str__(self):
+        return f"{self.property_id_id} - {self.checkin_date}: {self.priced_competitors} priced"
+
+
+class DpCompetitorPriceState(models.Model):
+    """
+    Last known best price per (competitor, checkin_date).
+
+    Maintained by the detect_competitor_price_changes management command from
+    historical_competitor_prices: each run reads only scrape rows with update_tz past
+    the newest source_update_tz stored here (the watermark), compares their best price
+    with the stored one and raises competitor notifications for material changes.
+    """
+    competitor = models.ForeignKey(Competitor, on_delete=models.CASCADE, related_name='price_states')
+    checkin_date = models.DateField()
+    best_price = models.FloatField(null=True, blank=True, help_text="Lowest positive price of the latest scrape, null if none")
+    sold_out = models.BooleanField(default=False)
+    scrape_date = models.DateField()
+    source_update_tz = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'dynamic_pricing_dpcompetitorpricestate'
+        unique_together = ('competitor', 'checkin_date')
+        indexes = [
+            models.Index(fields=['source_update_tz'], name='idx_comp_price_state_wm'),
+        ]
+        verbose_name = 'Competitor Price State'
+        verbose_name_plural = 'Competitor Price States'
+
+    def __str__(self):
+        return f"{self.competitor_id} - {self.checkin_date}: {self.best_price}"
+
+
+class DpMaterializedViewRefresh(models.Model):
+    """
+    Log of materialized view refreshes (e.g. comp_prices_mv).
+
+    Written by the refresh_comp_prices_mv management command; the latest successful
+    run per view is the last-refreshed timestamp exposed to the competitor endpoints.
+    """
+    STATUS_CHOICES = [
+        ('success', 'Success'),
+        ('failed', 'Failed'),
+        ('skipped', 'Skipped'),
+    ]
+
+    view_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+    duration_seconds = models.FloatField(null=True, blank=True)
+    row_count = models.BigIntegerField(null=True, blank=True)
+    concurrently = models.BooleanField(default=True)
+    error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'dynamic_pricing_dpmaterializedviewrefresh'
+        indexes = [
+            models.Index(fields=['view_name', 'status', 'finished_at'], name='idx_mv_refresh_last'),
+        ]
+        verbose_name = 'Materialized View Refresh'
+        verbose_name_plural = 'Materialized View Refreshes'
+
+    def __str__(self):
+        return f"{self.view_name} {self.status} at {self.finished_at}"
+
+
 class CompetitorCandidate(models.Model):
     """
     Competitor candidates for properties - stores suggested competitors before they become active
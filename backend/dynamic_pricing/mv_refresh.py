@@ -0,0 +1,167 @@
+"""
+Materialized View Refresh Helpers
+
+Refresh subsystem for comp_prices_mv (CompetitorPriceMV). Refreshes run as
+REFRESH MATERIALIZED VIEW CONCURRENTLY, so readers keep reading the previous
+contents and never block, under a PostgreSQL advisory lock so overlapping jobs
+skip instead of queueing. Every run is logged in DpMaterializedViewRefresh with
+its duration and row count; the latest successful run is the last-refreshed
+timestamp exposed to the competitor endpoints.
+"""
+
+import logging
+import time
+import zlib
+from django.core.cache import cache
+from django.db import connections, router
+from django.utils import timezone
+
+from .models import CompetitorPriceMV, DpMaterializedViewRefresh
+
+logger = logging.getLogger(__name__)
+
+COMP_PRICES_MV = CompetitorPriceMV._meta.db_table
+
+# Seconds the last successful refresh is cached for readers
+LAST_REFRESH_CACHE_TIMEOUT = 60
+
+
+def get_advisory_lock_key(view_name):
+    """
+    Return a stable advisory lock key for a materialized view name.
+    """
+    return zlib.crc32(f"mv_refresh:{view_name}".encode('utf-8'))
+
+
+def _last_refresh_cache_key(view_name):
+    return f"mv_refresh:last:{view_name}"
+
+
+def _has_unique_index(cursor, view_name):
+    """
+    REFRESH ... CONCURRENTLY requires a unique index on the materialized view.
+    """
+    cursor.execute(
+        """
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indrelid
+        WHERE c.oid = to_regclass(%s) AND i.indisunique
+        LIMIT 1
+        """,
+        [view_name],
+    )
+    return cursor.fetchone() is not None
+
+
+def _run_refresh(connection, view_name, concurrently):
+    """
+    Refresh a materialized view under its advisory lock.
+
+    Returns:
+        int or None: Row count after the refresh, or None if another refresh holds the lock
+    """
+    quoted = connection.ops.quote_name(view_name)
+    lock_key = get_advisory_lock_key(view_name)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [lock_key])
+        if not cursor.fetchone()[0]:
+            return None
+        try:
+            if concurrently and not _has_unique_index(cursor, view_name):
+                raise RuntimeError(
+                    f"{view_name} has no unique index; REFRESH CONCURRENTLY is not possible "
+                    f"(add one, or pass --no-concurrently to refresh with a blocking lock)"
+                )
+            keyword = 'CONCURRENTLY ' if concurrently else ''
+            cursor.execute(f"REFRESH MATERIALIZED VIEW {keyword}{quoted}")
+            cursor.execute(f"SELECT COUNT(*) FROM {quoted}")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [lock_key])
+
+
+def refresh_materialized_view(view_name=COMP_PRICES_MV, concurrently=True):
+    """
+    Refresh a materialized view and record the run.
+
+    Returns:
+        DpMaterializedViewRefresh: The recorded run (status success, skipped or failed)
+    """
+    connection = connections[router.db_for_write(CompetitorPriceMV)]
+    started_at = timezone.now()
+    started = time.monotonic()
+    status, row_count, error = 'success', None, None
+
+    if connection.vendor != 'postgresql':
+        status, error = 'skipped', f"Materialized views require PostgreSQL (database is {connection.vendor})"
+    else:
+        try:
+            row_count = _run_refresh(connection, view_name, concurrently)
+            if row_count is None:
+                status, error = 'skipped', 'Another refresh is already running'
+        except Exception as e:
+            status, error = 'failed', str(e)
+            logger.error(f"Error refreshing materialized view {view_name}: {str(e)}", exc_info=True)
+
+    run = DpMaterializedViewRefresh.objects.create(
+        view_name=view_name,
+        status=status,
+        started_at=started_at,
+        finished_at=timezone.now(),
+        duration_seconds=round(time.monotonic() - started, 3),
+        row_count=row_count,
+        concurrently=concurrently,
+        error=error,
+    )
+    if status == 'success':
+        cache.delete(_last_refresh_cache_key(view_name))
+    logger.info(
+        f"Materialized view {view_name} refresh {status}: rows={row_count}, "
+        f"duration={run.duration_seconds}s"
+    )
+    return run
+
+
+def get_last_refreshed_at(view_name=COMP_PRICES_MV):
+    """
+    Return when a materialized view was last refreshed successfully, or None.
+
+    Cached briefly so competitor endpoints can report it on every request.
+    """
+    key = _last_refresh_cache_key(view_name)
+    try:
+        cached = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Materialized view refresh cache unavailable: {str(e)}")
+        cached = None
+    if cached is not None:
+        return cached or None
+
+    last_refreshed_at = (
+        DpMaterializedViewRefresh.objects
+        .filter(view_name=view_name, status='success')
+        .order_by('-finished_at')
+        .values_list('finished_at', flat=True)
+        .first()
+    )
+    try:
+        # '' marks "never refreshed" so the miss is cached too
+        cache.set(key, last_refreshed_at or '', LAST_REFRESH_CACHE_TIMEOUT)
+    except Exception:
+        pass
+    return last_refreshed_at
+
+
+def with_refresh_headers(response, view_name=COMP_PRICES_MV):
+    """
+    Attach the data freshness of a materialized view to a response.
+
+    Sets X-Data-Refreshed-At (ISO timestamp of the last successful refresh) and
+    X-Data-Staleness-Seconds; both are omitted if the view was never refreshed.
+    """
+    last_refreshed_at = get_last_refreshed_at(view_name)
+    if last_refreshed_at is not None:
+        response['X-Data-Refreshed-At'] = last_refreshed_at.isoformat()
+        response['X-Data-Staleness-Seconds'] = str(int((timezone.now() - last_refreshed_at).total_seconds()))
+    return response
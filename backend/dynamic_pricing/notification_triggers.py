@@ -21,7 +21,7 @@ logger = logging.getLogger(__name__)
 
 def check_msp_for_date_range(property_obj, start_date, end_date):
     """
-    Check if MSP is configured for a date range
+    Check if MSP is configured for a date range (one query for any range length)
     
     Args:
         property_obj: Property object
@@ -33,23 +33,9 @@ def check_msp_for_date_range(property_obj, start_date, end_date):
             - has_msp: Boolean indicating if MSP exists for entire range
             - missing_dates: List of dates without MSP coverage
     """
-    from .models import DpMinimumSellingPrice
-    
-    missing_dates = []
-    current_date = start_date
+    from .intervals import load_msp_index
     
-    while current_date <= end_date:
-        # Check if there's an MSP entry covering this date
-        msp_exists = DpMinimumSellingPrice.objects.filter(
-            property_id=property_obj,
-            valid_from__lte=current_date,
-            valid_until__gte=current_date
-        ).exists()
-        
-        if not msp_exists:
-            missing_dates.append(current_date)
-        
-        current_date += timedelta(days=1)
+    missing_dates = load_msp_index(property_obj).uncovered(start_date, end_date)
     
     has_msp = len(missing_dates) == 0
     return has_msp, missing_dates
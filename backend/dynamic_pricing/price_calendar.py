@@ -0,0 +1,690 @@
+"""
+Price Calendar Helpers
+
+Read and maintenance helpers for the current price calendar, i.e. the latest
+DpPriceChangeHistory snapshot per (property, checkin_date).
+
+The pricing job writes many as_of snapshots per day into price_change_history.
+DpCurrentPriceCalendar keeps only the newest one per date and is refreshed
+incrementally from as_of rows newer than the projection watermark (the newest
+as_of already projected for the property).
+"""
+
+import base64
+import heapq
+import logging
+import uuid
+from datetime import date, datetime, timedelta
+from operator import attrgetter
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Max, Q
+
+from .models import DpPriceChangeHistory, DpPriceChangeHistoryArchive, DpCurrentPriceCalendar, OverwritePriceHistory
+
+logger = logging.getLogger(__name__)
+
+# Columns copied from price_change_history into the projection
+PROJECTED_FIELDS = [
+    'user_id',
+    'as_of',
+    'occupancy',
+    'pms_hotel_id',
+    'msp',
+    'recom_price',
+    'recom_los',
+    'overwrite_los',
+    'base_price',
+    'base_price_choice',
+    'competitor_average',
+]
+
+
+def reduce_to_latest(queryset):
+    """
+    Reduce a DpPriceChangeHistory queryset to the newest snapshot per (property, checkin_date).
+
+    On PostgreSQL this is a single DISTINCT ON query that walks the
+    idx_dp_price_change_history_latest index; other backends fall back to an
+    ordered scan reduced in Python.
+
+    Returns:
+        list: Latest rows ordered by (property_id, checkin_date)
+    """
+    ordered = queryset.order_by('property_id', 'checkin_date', '-as_of')
+    if connections[queryset.db].features.can_distinct_on_fields:
+        return list(ordered.distinct('property_id', 'checkin_date'))
+
+    latest = {}
+    for row in ordered:
+        latest.setdefault((row.property_id_id, row.checkin_date), row)
+    return list(latest.values())
+
+
+def get_projection_watermark(property_id):
+    """
+    Return the newest as_of already projected for a property, or None if never refreshed.
+    """
+    return (
+        DpCurrentPriceCalendar.objects
+        .filter(property_id=property_id)
+        .aggregate(watermark=Max('as_of'))['watermark']
+    )
+
+
+def get_latest_price_rows(property_id, start_date, end_date):
+    """
+    Get the latest price snapshot per checkin_date for a property and date range.
+
+    Reads the projection (one row per date) and overlays any snapshots that landed
+    after the projection watermark, so results are current even if the refresh
+    command has not run yet.
+
+    Returns:
+        dict: {checkin_date: row} where row is a DpCurrentPriceCalendar or
+        DpPriceChangeHistory instance exposing the same fields
+    """
+    latest_by_date = {
+        row.checkin_date: row
+        for row in DpCurrentPriceCalendar.objects.filter(
+            property_id=property_id,
+            checkin_date__gte=start_date,
+            checkin_date__lte=end_date,
+        )
+    }
+
+    pending = DpPriceChangeHistory.objects.filter(
+        property_id=property_id,
+        checkin_date__gte=start_date,
+        checkin_date__lte=end_date,
+    )
+    watermark = get_projection_watermark(property_id)
+    if watermark is not None:
+        pending = pending.filter(as_of__gt=watermark)
+
+    for row in reduce_to_latest(pending):
+        latest_by_date[row.checkin_date] = row
+
+    return latest_by_date
+
+
+def get_latest_price_values(property_id, start_date, end_date, fields):
+    """
+    values_list counterpart of get_latest_price_rows for hot serialization paths.
+
+    Same projection + pending overlay, but rows come back as plain tuples so no model
+    instances are built.
+
+    Args:
+        fields: Column names to select (checkin_date is always prepended)
+
+    Returns:
+        dict: {checkin_date: (checkin_date, *fields)}
+    """
+    columns = ['checkin_date', *fields]
+    latest_by_date = {
+        row[0]: row
+        for row in DpCurrentPriceCalendar.objects.filter(
+            property_id=property_id,
+            checkin_date__gte=start_date,
+            checkin_date__lte=end_date,
+        ).values_list(*columns)
+    }
+
+    pending = (
+        DpPriceChangeHistory.objects
+        .filter(
+            property_id=property_id,
+            checkin_date__gte=start_date,
+            checkin_date__lte=end_date,
+        )
+        .order_by('checkin_date', '-as_of')
+    )
+    watermark = get_projection_watermark(property_id)
+    if watermark is not None:
+        pending = pending.filter(as_of__gt=watermark)
+    if connections[pending.db].features.can_distinct_on_fields:
+        pending = pending.distinct('checkin_date')
+
+    seen = set()
+    for row in pending.values_list(*columns):
+        if row[0] not in seen:
+            seen.add(row[0])
+            latest_by_date[row[0]] = row
+
+    return latest_by_date
+
+
+def _latest_rows_as_of(model, property_id, start_date, end_date, as_of):
+    """
+    Return {checkin_date: row} of the latest model row with as_of <= the timestamp per date.
+
+    model is DpPriceChangeHistory or DpPriceChangeHistoryArchive (same columns).
+    """
+    snapshots = model.objects.filter(
+        property_id=property_id,
+        checkin_date__gte=start_date,
+        checkin_date__lte=end_date,
+        as_of__lte=as_of,
+    )
+    connection = connections[snapshots.db]
+    if connection.vendor != 'postgresql':
+        return {row.checkin_date: row for row in reduce_to_latest(snapshots)}
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    rows = model.objects.raw(
+        f"""
+        SELECT h.*
+        FROM generate_series(%s::date, %s::date, interval '1 day') AS d(day)
+        CROSS JOIN LATERAL (
+            SELECT *
+            FROM {table}
+            WHERE property_id = %s
+              AND checkin_date = d.day::date
+              AND as_of <= %s
+            ORDER BY as_of DESC
+            LIMIT 1
+        ) AS h
+        """,
+        [start_date, end_date, property_id, as_of],
+    )
+    return {row.checkin_date: row for row in rows}
+
+
+def get_price_rows_as_of(property_id, start_date, end_date, as_of):
+    """
+    Reconstruct the price calendar as it was at a past timestamp.
+
+    For each checkin_date in the range, returns the latest snapshot with
+    as_of <= the given timestamp. On PostgreSQL this is one LATERAL lookup per
+    date (ORDER BY as_of DESC LIMIT 1 on the (property_id, checkin_date, as_of)
+    index), so the cost grows with the number of dates and not with the number
+    of snapshots per date. Other backends fall back to reduce_to_latest.
+
+    Snapshots rolled up by roll_up_price_history live in
+    DpPriceChangeHistoryArchive, so the same lookup runs on the archive and the
+    newer of the two rows wins per date; timestamps older than the retention
+    window resolve to the archived snapshot instead of the day's last one.
+
+    Returns:
+        dict: {checkin_date: DpPriceChangeHistory or DpPriceChangeHistoryArchive}
+    """
+    latest_by_date = _latest_rows_as_of(DpPriceChangeHistory, property_id, start_date, end_date, as_of)
+    for checkin_date, row in _latest_rows_as_of(
+        DpPriceChangeHistoryArchive, property_id, start_date, end_date, as_of
+    ).items():
+        current = latest_by_date.get(checkin_date)
+        if current is None or row.as_of > current.as_of:
+            latest_by_date[checkin_date] = row
+    return latest_by_date
+
+
+def refresh_current_price_calendar(property_id, full=False, batch_size=1000):
+    """
+    Refresh the current price calendar projection for one property.
+
+    Only snapshots newer than the projection watermark are read; with full=True the
+    projection for the property is rebuilt from the whole history (use this to pick
+    up late-arriving snapshots older than the watermark).
+
+    Returns:
+        int: Number of projection rows inserted or updated
+    """
+    source = DpPriceChangeHistory.objects.filter(property_id=property_id)
+    watermark = None if full else get_projection_watermark(property_id)
+    if watermark is not None:
+        source = source.filter(as_of__gt=watermark)
+
+    latest_rows = reduce_to_latest(source)
+    projections = [
+        DpCurrentPriceCalendar(
+            property_id_id=row.property_id_id,
+            checkin_date=row.checkin_date,
+            **{field: getattr(row, field) for field in PROJECTED_FIELDS}
+        )
+        for row in latest_rows
+    ]
+
+    with transaction.atomic():
+        if full:
+            DpCurrentPriceCalendar.objects.filter(property_id=property_id).delete()
+        if projections:
+            DpCurrentPriceCalendar.objects.bulk_create(
+                projections,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['property_id', 'checkin_date'],
+                update_fields=PROJECTED_FIELDS + ['refreshed_at'],
+            )
+
+    if projections or full:
+        invalidate_price_calendar_cache(property_id)
+
+    logger.info(
+        f"Refreshed current price calendar for property {property_id}: "
+        f"{len(projections)} rows (watermark={watermark}, full={full})"
+    )
+    return len(projections)
+
+
+def get_month_bounds(year, month):
+    """
+    Return (first_day, last_day) of a calendar month.
+    """
+    start_date = date(year, month, 1)
+    if month == 12:
+        end_date = date(year + 1, 1, 1) - timedelta(days=1)
+    else:
+        end_date = date(year, month + 1, 1) - timedelta(days=1)
+    return start_date, end_date
+
+
+def get_overwrite_prices(property_id, start_date, end_date, as_of=None):
+    """
+    Prefetch RM overwrite prices for a date range in one query.
+
+    Args:
+        as_of: Optional timestamp; only overwrites last updated at or before it are
+            returned (overwrites keep no history, so later edits are not reconstructed)
+
+    Returns:
+        dict: {checkin_date: overwrite_price} (dates without a price are omitted)
+    """
+    overwrites = OverwritePriceHistory.objects.filter(
+        property_id=property_id,
+        checkin_date__gte=start_date,
+        checkin_date__lte=end_date,
+        overwrite_price__isnull=False,
+    )
+    if as_of is not None:
+        overwrites = overwrites.filter(updated_at__lte=as_of)
+    return dict(overwrites.values_list('checkin_date', 'overwrite_price'))
+
+
+def normalize_occupancy(occupancy):
+    """
+    Express occupancy on a 0-100 scale (the pricing job writes either 0-1 or 0-100).
+    """
+    if occupancy is None:
+        return None
+    return occupancy * 100 if occupancy <= 1 else occupancy
+
+
+def get_occupancy_level(occupancy):
+    """
+    Return occupancy level as string (low, medium, high) - same logic as PriceHistorySerializer
+    """
+    occupancy_value = normalize_occupancy(occupancy)
+    if occupancy_value is None:
+        return "medium"
+    if occupancy_value <= 35:
+        return "low"
+    elif occupancy_value <= 69:
+        return "medium"
+    else:
+        return "high"
+
+
+# Columns read by encode_price_history_rows, after checkin_date
+PRICE_HISTORY_VALUE_FIELDS = ['recom_price', 'occupancy']
+
+
+def encode_price_history_rows(rows, overwrites):
+    """
+    Fast encoder for PriceHistorySerializer output.
+
+    Produces exactly the dicts PriceHistorySerializer(row, context={'overwrites': ...}).data
+    would, but from (checkin_date, recom_price, occupancy) tuples and without per-row
+    serializer instances or the (checkin_date, str(property_id)) key rebuilds.
+
+    Args:
+        rows: Iterable of (checkin_date, recom_price, occupancy) tuples
+        overwrites: {checkin_date: overwrite_price} with null prices omitted
+            (see get_overwrite_prices)
+
+    Returns:
+        list: Serialized entries in the order of rows
+    """
+    entries = []
+    append = entries.append
+    get_overwrite = overwrites.get
+    for checkin_date, recom_price, occupancy in rows:
+        overwrite_price = get_overwrite(checkin_date)
+        if occupancy is not None and occupancy <= 1:
+            occupancy = occupancy * 100
+        if occupancy is None:
+            occupancy_level = "medium"
+        elif occupancy <= 35:
+            occupancy_level = "low"
+        elif occupancy <= 69:
+            occupancy_level = "medium"
+        else:
+            occupancy_level = "high"
+        append({
+            'checkin_date': checkin_date.isoformat(),
+            'price': recom_price if overwrite_price is None else overwrite_price,
+            'occupancy_level': occupancy_level,
+            'overwrite': overwrite_price is not None,
+            'occupancy': None if occupancy is None else round(occupancy, 2),
+        })
+    return entries
+
+
+def build_calendar_entry(row, overwrite_price=None):
+    """
+    Build one unified calendar entry (price, MSP, competitor average, occupancy and
+    overwrite) from a latest price row and its overwrite price, if any.
+    """
+    occupancy = normalize_occupancy(row.occupancy)
+    return {
+        'checkin_date': row.checkin_date.strftime('%Y-%m-%d'),
+        'price': overwrite_price if overwrite_price is not None else row.recom_price,
+        'recom_price': row.recom_price,
+        'overwrite': overwrite_price is not None,
+        'overwrite_price': overwrite_price,
+        'msp': row.msp,
+        'competitor_average': row.competitor_average,
+        'occupancy': None if occupancy is None else round(occupancy, 2),
+        'occupancy_level': get_occupancy_level(row.occupancy),
+    }
+
+
+# Column order of unified calendar entries (used by exports)
+CALENDAR_ENTRY_FIELDS = [
+    'checkin_date',
+    'price',
+    'recom_price',
+    'overwrite',
+    'overwrite_price',
+    'msp',
+    'competitor_average',
+    'occupancy',
+    'occupancy_level',
+]
+
+
+def build_calendar_entries(latest_by_date, overwrites):
+    """
+    Build unified calendar entries from one set of latest rows and one overwrite prefetch.
+
+    Returns:
+        list: One dict per checkin_date, sorted by date
+    """
+    return [
+        build_calendar_entry(latest_by_date[checkin_date], overwrites.get(checkin_date))
+        for checkin_date in sorted(latest_by_date)
+    ]
+
+
+def _iter_first_per_date(rows):
+    """
+    Yield the first row of each checkin_date from rows ordered by checkin_date.
+    """
+    last_date = None
+    for row in rows:
+        if row.checkin_date != last_date:
+            last_date = row.checkin_date
+            yield row
+
+
+def iter_latest_price_rows(property_id, start_date, end_date, chunk_size=2000):
+    """
+    Stream the latest price snapshot per checkin_date, ordered by date.
+
+    Streaming counterpart of get_latest_price_rows for long ranges: the projection
+    and the snapshots past its watermark are read through server-side cursors
+    (queryset.iterator) and merged by date, so memory use does not grow with the
+    size of the range.
+
+    Yields:
+        DpCurrentPriceCalendar or DpPriceChangeHistory rows
+    """
+    watermark = get_projection_watermark(property_id)
+
+    pending = (
+        DpPriceChangeHistory.objects
+        .filter(
+            property_id=property_id,
+            checkin_date__gte=start_date,
+            checkin_date__lte=end_date,
+        )
+        .order_by('checkin_date', '-as_of')
+    )
+    if watermark is not None:
+        pending = pending.filter(as_of__gt=watermark)
+    if connections[pending.db].features.can_distinct_on_fields:
+        pending = pending.distinct('checkin_date')
+
+    projected = (
+        DpCurrentPriceCalendar.objects
+        .filter(
+            property_id=property_id,
+            checkin_date__gte=start_date,
+            checkin_date__lte=end_date,
+        )
+        .order_by('checkin_date')
+    )
+
+    # heapq.merge is stable, so pending snapshots win over the projection on equal dates
+    merged = heapq.merge(
+        _iter_first_per_date(pending.iterator(chunk_size=chunk_size)),
+        projected.iterator(chunk_size=chunk_size),
+        key=attrgetter('checkin_date'),
+    )
+    return _iter_first_per_date(merged)
+
+
+def iter_calendar_entries(property_id, start_date, end_date, chunk_size=2000):
+    """
+    Stream unified calendar entries for a (possibly multi-month) date range.
+
+    Overwrite prices are streamed in date order alongside the price rows instead of
+    being prefetched into a dict.
+
+    Yields:
+        dict: One calendar entry per checkin_date, ordered by date
+    """
+    overwrites = (
+        OverwritePriceHistory.objects
+        .filter(
+            property_id=property_id,
+            checkin_date__gte=start_date,
+            checkin_date__lte=end_date,
+            overwrite_price__isnull=False,
+        )
+        .order_by('checkin_date')
+        .values_list('checkin_date', 'overwrite_price')
+        .iterator(chunk_size=chunk_size)
+    )
+    next_overwrite = next(overwrites, None)
+
+    for row in iter_latest_price_rows(property_id, start_date, end_date, chunk_size):
+        while next_overwrite is not None and next_overwrite[0] < row.checkin_date:
+            next_overwrite = next(overwrites, None)
+        overwrite_price = None
+        if next_overwrite is not None and next_overwrite[0] == row.checkin_date:
+            overwrite_price = next_overwrite[1]
+        yield build_calendar_entry(row, overwrite_price)
+
+
+# Values tracked by the price evolution timeline
+TIMELINE_FIELDS = ['recom_price', 'msp', 'occupancy', 'competitor_average']
+
+
+def encode_timeline_cursor(checkin_date, as_of):
+    """
+    Encode a (checkin_date, as_of) keyset position as an opaque URL-safe cursor.
+    """
+    raw = f"{checkin_date.isoformat()}|{as_of.isoformat()}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_timeline_cursor(cursor):
+    """
+    Decode a cursor produced by encode_timeline_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        checkin_date, as_of = raw.split('|')
+        return date.fromisoformat(checkin_date), datetime.fromisoformat(as_of)
+    except (UnicodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _timeline_values(row):
+    """
+    Map a (recom_price, msp, occupancy, competitor_average) tuple to timeline values.
+    """
+    recom_price, msp, occupancy, competitor_average = row
+    occupancy = normalize_occupancy(occupancy)
+    return {
+        'recom_price': recom_price,
+        'msp': msp,
+        'occupancy': None if occupancy is None else round(occupancy, 2),
+        'competitor_average': competitor_average,
+    }
+
+
+def get_price_timeline_page(property_id, start_date, end_date, limit, after=None):
+    """
+    Get one page of the as_of evolution of prices for a date range, delta-encoded.
+
+    Snapshots are read in (checkin_date, as_of DESC) order, the order of the
+    idx_dp_price_change_history_latest index, with keyset pagination: the page
+    after a cursor is a range seek on that index, never an OFFSET scan. Each
+    snapshot only carries the TIMELINE_FIELDS values that changed since the
+    previous (older) snapshot of its checkin_date, the oldest one carries every
+    value, and snapshots without changes are omitted. One extra row is read past
+    the page, so the last snapshot of a page is compared without another query.
+
+    Args:
+        property_id: Property ID
+        start_date, end_date: Check-in date range
+        limit: Maximum number of snapshots scanned for this page
+        after: Optional (checkin_date, as_of) keyset position from a previous page
+
+    Returns:
+        dict: {'timeline': [{'checkin_date', 'as_of', 'changes'}], 'next_cursor': str|None}
+    """
+    snapshots = DpPriceChangeHistory.objects.filter(
+        property_id=property_id,
+        checkin_date__gte=start_date,
+        checkin_date__lte=end_date,
+    )
+    if after is not None:
+        after_date, after_as_of = after
+        snapshots = snapshots.filter(
+            Q(checkin_date__gt=after_date) | Q(checkin_date=after_date, as_of__lt=after_as_of)
+        )
+
+    rows = list(
+        snapshots
+        .order_by('checkin_date', '-as_of')
+        .values_list('checkin_date', 'as_of', *TIMELINE_FIELDS)[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    values = [_timeline_values(row[2:]) for row in rows]
+
+    timeline = []
+    for i, (checkin_date, as_of, *_) in enumerate(rows[:limit]):
+        current = values[i]
+        if i + 1 < len(rows) and rows[i + 1][0] == checkin_date:
+            previous = values[i + 1]
+            changes = {field: value for field, value in current.items() if previous[field] != value}
+        else:
+            changes = current
+        if changes:
+            timeline.append({
+                'checkin_date': checkin_date.isoformat(),
+                'as_of': as_of.isoformat(),
+                'changes': changes,
+            })
+
+    next_cursor = encode_timeline_cursor(rows[limit - 1][0], rows[limit - 1][1]) if has_more else None
+    return {'timeline': timeline, 'next_cursor': next_cursor}
+
+
+def _cache_token_key(property_id):
+    return f"price_calendar:token:{property_id}"
+
+
+def get_latest_as_of(property_id):
+    """
+    Return the newest as_of in price_change_history for a property, or None.
+
+    One aggregate answered from the idx_dp_price_change_history_as_of index.
+    """
+    return (
+        DpPriceChangeHistory.objects
+        .filter(property_id=property_id)
+        .aggregate(latest_as_of=Max('as_of'))['latest_as_of']
+    )
+
+
+def get_calendar_cache_token(property_id):
+    """
+    Return the cache token of a property's calendar responses.
+
+    Combines the property's write version, replaced by invalidate_price_calendar_cache
+    on overwrite and MSP writes, with the newest as_of in price_change_history. New
+    snapshots change the token as soon as they land, before the projection is
+    refreshed, so cached responses never hide the pending snapshot overlay.
+    """
+    key = _cache_token_key(property_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(key, version, None)
+    latest_as_of = get_latest_as_of(property_id)
+    return f"{version}:{latest_as_of.isoformat() if latest_as_of else 'empty'}"
+
+
+def invalidate_price_calendar_cache(property_id):
+    """
+    Invalidate every cached calendar response of a property.
+
+    Called after overwrite and MSP writes and after projection refreshes. Old
+    entries are not deleted one by one; they become unreachable and expire.
+    """
+    try:
+        cache.set(_cache_token_key(property_id), uuid.uuid4().hex, None)
+    except Exception as e:
+        # Never fail a write because the cache is unavailable; drop the token instead
+        logger.warning(f"Could not invalidate price calendar cache for property {property_id}: {str(e)}")
+        try:
+            cache.delete(_cache_token_key(property_id))
+        except Exception:
+            pass
+
+
+def get_cached_calendar_data(property_id, name, start_date, end_date, build):
+    """
+    Return cached calendar data for (property, view name, date range), building it on a miss.
+
+    Args:
+        property_id: Property ID
+        name: Short name of the calendar view (part of the cache key)
+        start_date, end_date: Date range of the response
+        build: Callable returning the JSON-serializable data to cache
+
+    Cache errors are logged and fall back to build(), so Redis outages only cost latency.
+    """
+    try:
+        token = get_calendar_cache_token(property_id)
+        key = f"price_calendar:{name}:{property_id}:{start_date.isoformat()}:{end_date.isoformat()}:{token}"
+        data = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Price calendar cache unavailable: {str(e)}")
+        return build()
+
+    if data is None:
+        data = build()
+        try:
+            cache.set(key, data, settings.PRICE_CALENDAR_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Could not store price calendar cache entry {key}: {str(e)}")
+    return data
@@ -0,0 +1,131 @@
+"""
+Price History Retention
+
+Roll-up of old price_change_history snapshots. The pricing job writes one row per
+property, per future checkin_date, per pricing run; once a snapshot is older than
+the retention window only the last as_of of each day is kept per checkin_date and
+the superseded raw rows are moved to DpPriceChangeHistoryArchive in bounded
+batches. The latest snapshot of a checkin_date is always the last of its day, so
+the current price calendar is never affected.
+"""
+
+import logging
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import DpPriceChangeHistory, DpPriceChangeHistoryArchive
+
+logger = logging.getLogger(__name__)
+
+# Columns copied from price_change_history into the archive
+ARCHIVED_FIELDS = [
+    'id',
+    'property_id_id',
+    'user_id',
+    'checkin_date',
+    'as_of',
+    'occupancy',
+    'pms_hotel_id',
+    'msp',
+    'recom_price',
+    'recom_los',
+    'overwrite_los',
+    'base_price',
+    'base_price_choice',
+    'competitor_average',
+]
+
+
+def archive_price_history_rows(ids):
+    """
+    Move price_change_history rows to the archive in one transaction.
+
+    The archive keeps the original ids, so a batch interrupted after the copy is
+    safe to repeat.
+
+    Returns:
+        int: Number of rows removed from price_change_history
+    """
+    rows = DpPriceChangeHistory.objects.filter(id__in=ids).values(*ARCHIVED_FIELDS)
+    with transaction.atomic():
+        DpPriceChangeHistoryArchive.objects.bulk_create(
+            [DpPriceChangeHistoryArchive(**row) for row in rows],
+            ignore_conflicts=True,
+        )
+        deleted, _ = DpPriceChangeHistory.objects.filter(id__in=ids).delete()
+    return deleted
+
+
+def _next_snapshot_batch(snapshots, after, batch_size):
+    """
+    Return the next batch_size (id, checkin_date, as_of) rows after a keyset position.
+
+    Rows are ordered by (checkin_date, as_of DESC, id DESC); after is the
+    (checkin_date, as_of, id) of the last row of the previous batch.
+    """
+    if after is not None:
+        checkin_date, as_of, row_id = after
+        snapshots = snapshots.filter(
+            Q(checkin_date__gt=checkin_date)
+            | Q(checkin_date=checkin_date, as_of__lt=as_of)
+            | Q(checkin_date=checkin_date, as_of=as_of, id__lt=row_id)
+        )
+    return list(
+        snapshots
+        .order_by('checkin_date', '-as_of', '-id')
+        .values_list('id', 'checkin_date', 'as_of')[:batch_size]
+    )
+
+
+def roll_up_price_history(property_id, cutoff, batch_size=5000, dry_run=False):
+    """
+    Roll up snapshots of one property with as_of before cutoff to one per day per checkin_date.
+
+    Snapshots are read in keyset batches of batch_size on (checkin_date, as_of DESC, id);
+    the first one seen for each (checkin_date, as_of day) is kept and the rest of
+    each batch is archived in one transaction, so memory and transaction size stay
+    bounded however large the backlog is. Kept rows sort before the keyset position
+    and archived rows are gone, so the next batch continues where the last one ended.
+
+    Args:
+        property_id: Property ID
+        cutoff: Snapshots with as_of before this datetime are rolled up
+        batch_size: Rows read and at most moved per transaction
+        dry_run: Count the rows that would be archived without moving them
+
+    Returns:
+        dict: {'scanned': int, 'kept': int, 'archived': int}
+    """
+    snapshots = DpPriceChangeHistory.objects.filter(property_id=property_id, as_of__lt=cutoff)
+
+    stats = {'scanned': 0, 'kept': 0, 'archived': 0}
+    last_key = None
+    after = None
+    while True:
+        rows = _next_snapshot_batch(snapshots, after, batch_size)
+        if not rows:
+            break
+
+        batch = []
+        for row_id, checkin_date, as_of in rows:
+            stats['scanned'] += 1
+            key = (checkin_date, timezone.localdate(as_of))
+            if key != last_key:
+                last_key = key
+                stats['kept'] += 1
+                continue
+            batch.append(row_id)
+
+        if batch:
+            stats['archived'] += len(batch) if dry_run else archive_price_history_rows(batch)
+        if len(rows) < batch_size:
+            break
+        row_id, checkin_date, as_of = rows[-1]
+        after = (checkin_date, as_of, row_id)
+
+    logger.info(
+        f"Rolled up price history for property {property_id} before {cutoff.isoformat()}: "
+        f"{stats['archived']} archived, {stats['kept']} kept (dry_run={dry_run})"
+    )
+    return stats
@@ -0,0 +1,474 @@
+"""
+Price Recommendation Engine
+
+Computes recommended prices for a property's whole pricing horizon
+(DpGeneralSettings.future_days_to_price dates) from the rule tables of this
+project, in one vectorized NumPy pass over date arrays:
+
+    1. base price: the market price of DpDailyMarketAggregate selected by
+       comp_price_calculation (min/max/avg/median) when at least min_competitors
+       competitors are priced ('competitor'), else the MSP of the date ('manual')
+    2. dynamic increment: the DpDynamicIncrementsV2 cell of the date's occupancy
+       and lead time category, a Percentage of the base price or an Additional amount
+    3. offers: every DpOfferIncrements period covering the date whose
+       applied_from_days / applied_until_days window contains the lead time
+    4. floor: the DpMinimumSellingPrice of the date
+    5. rates: the DpRoomRates increment of every non-base rate on the recommended price
+    6. length of stay: the DpLosSetup rule of the date's weekday (DEFAULT_RECOM_LOS without one)
+
+Date-ranged rules (MSP, offers, LOS) are held in IntervalIndex objects, so
+filling a horizon only visits the segments of rules that overlap it; on
+overlapping MSP and LOS rules the latest valid_from wins, then the higher id.
+
+Occupancy categories are lower-inclusive (30% is '30-50'), as are lead time
+categories (3 days is '3-7'). Dates without occupancy get no dynamic increment.
+
+Rules are plain dicts (build_pricing_rules) so callers can overlay unsaved rules
+before computing (load_rule_rows, apply_rule_changes). Loading a property is a
+fixed handful of queries (load_pricing_rules, load_pricing_inputs), its dynamic
+increments coming from the cached IncrementMatrix (get_increment_matrix);
+compute_recommended_prices itself does no database access.
+"""
+
+import logging
+from datetime import timedelta
+from operator import itemgetter
+import numpy as np
+from django.utils import timezone
+
+from .market import COMP_PRICE_CALCULATION_FIELDS
+from .increment_matrix import (
+    INCREMENT_ADDITIONAL, INCREMENT_PERCENTAGE, LEAD_TIME_BIN_EDGES, OCCUPANCY_BIN_EDGES, IncrementMatrix,
+    get_increment_matrix, is_percentage
+)
+from .intervals import IntervalIndex, build_weekday_indexes
+from .models import (
+    DpDailyMarketAggregate, DpDynamicIncrementsV2, DpGeneralSettings, DpLosSetup, DpMinimumSellingPrice,
+    DpOfferIncrements, DpRoomRates
+)
+from .price_calendar import get_latest_price_values
+
+logger = logging.getLogger(__name__)
+
+BASE_PRICE_COMPETITOR = 'competitor'
+BASE_PRICE_MANUAL = 'manual'
+
+DEFAULT_FUTURE_DAYS_TO_PRICE = 365
+
+# Recommended length of stay of dates without a DpLosSetup rule
+DEFAULT_RECOM_LOS = 1
+
+# Columns of the rule rows read by load_rule_rows
+SETTINGS_FIELDS = ['comp_price_calculation', 'min_competitors', 'future_days_to_price']
+RULE_ROW_FIELDS = {
+    'increments': ['id', 'occupancy_category', 'lead_time_category', 'increment_type', 'increment_value'],
+    'msp_periods': ['id', 'valid_from', 'valid_until', 'msp'],
+    'offers': ['id', 'valid_from', 'valid_until', 'applied_from_days', 'applied_until_days', 'increment_type', 'increment_value'],
+    'room_rates': ['rate_id', 'is_base_rate', 'increment_type', 'increment_value'],
+    'los_setups': ['id', 'valid_from', 'valid_until', 'day_of_week', 'los_value'],
+}
+
+# Rule rows that apply_rule_changes can overlay
+EDITABLE_RULES = ['increments', 'msp_periods', 'offers']
+
+
+def build_pricing_rules(settings=None, increments=(), msp_periods=(), offers=(), room_rates=(), los_setups=()):
+    """
+    Build the rule set of one property from plain rows.
+
+    Args:
+        settings: dict with comp_price_calculation, min_competitors, future_days_to_price
+            (defaults for missing keys)
+        increments: IncrementMatrix, or (occupancy_category, lead_time_category, increment_type,
+            increment_value) rows to compile into one
+        msp_periods: (valid_from, valid_until, msp) rows; the latest valid_from wins on overlaps
+        offers: (valid_from, valid_until, applied_from_days, applied_until_days, increment_type,
+            increment_value) rows; overlapping offers add up
+        room_rates: (rate_id, is_base_rate, increment_type, increment_value) rows
+        los_setups: (valid_from, valid_until, day_of_week, los_value) rows; the latest
+            valid_from wins on overlaps of the same weekday
+
+    Returns:
+        dict: rules for compute_recommended_prices
+    """
+    settings = settings or {}
+    return {
+        'comp_price_calculation': settings.get('comp_price_calculation') or 'min',
+        'min_competitors': settings.get('min_competitors') or 1,
+        'future_days_to_price': settings.get('future_days_to_price') or DEFAULT_FUTURE_DAYS_TO_PRICE,
+        'increments': (
+            increments if isinstance(increments, IncrementMatrix) else IncrementMatrix.compile(increments)
+        ).to_planes(),
+        'msp_periods': IntervalIndex(sorted(msp_periods, key=lambda period: period[0])),
+        'offers': IntervalIndex(
+            (valid_from, valid_until, (applied_from_days, applied_until_days, is_percentage(increment_type), increment_value or 0))
+            for valid_from, valid_until, applied_from_days, applied_until_days, increment_type, increment_value in offers
+        ),
+        'room_rates': [
+            (rate_id, is_percentage(increment_type), increment_value or 0)
+            for rate_id, is_base_rate, increment_type, increment_value in room_rates
+            if not is_base_rate
+        ],
+        'los': build_weekday_indexes(sorted(los_setups, key=lambda setup: setup[0])),
+    }
+
+
+def load_portfolio_rule_rows(property_ids, names=None):
+    """
+    Load the rule rows of several properties at once (six queries in total).
+
+    Args:
+        names: RULE_ROW_FIELDS rule names to load (default: all); the others are left empty
+
+    Returns:
+        dict: {property_id: load_rule_rows result}; properties without rows get empty ones
+    """
+    property_ids = list(property_ids)
+    names = RULE_ROW_FIELDS if names is None else names
+    portfolio = {
+        property_id: {'settings': {}, **{name: [] for name in RULE_ROW_FIELDS}}
+        for property_id in property_ids
+    }
+    for row in (
+        DpGeneralSettings.objects
+        .filter(property_id__in=property_ids)
+        .values('property_id', *SETTINGS_FIELDS)
+    ):
+        portfolio[row.pop('property_id')]['settings'] = row
+
+    models = {
+        'increments': (DpDynamicIncrementsV2, 'id'),
+        'msp_periods': (DpMinimumSellingPrice, 'id'),
+        'offers': (DpOfferIncrements, 'id'),
+        'room_rates': (DpRoomRates, 'rate_id'),
+        'los_setups': (DpLosSetup, 'id'),
+    }
+    for name, (model, order) in models.items():
+        if name not in names:
+            continue
+        for row in (
+            model.objects
+            .filter(property_id__in=property_ids)
+            .order_by(order)
+            .values('property_id', *RULE_ROW_FIELDS[name])
+        ):
+            portfolio[row.pop('property_id')][name].append(row)
+    return portfolio
+
+
+def load_rule_rows(property_id, names=None):
+    """
+    Load the rule rows of one property as dicts with RULE_ROW_FIELDS (up to six queries).
+
+    Returns:
+        dict: {'settings': dict, 'increments': [...], 'msp_periods': [...], 'offers': [...],
+        'room_rates': [...], 'los_setups': [...]}
+    """
+    return load_portfolio_rule_rows([property_id], names)[property_id]
+
+
+def rules_from_rows(rows, increments=None):
+    """
+    Build the rule set of load_rule_rows (or apply_rule_changes) rows.
+
+    Args:
+        increments: IncrementMatrix to use instead of compiling rows['increments']
+    """
+    def values(name):
+        return [itemgetter(*RULE_ROW_FIELDS[name][1:])(row) for row in rows[name]]
+
+    # On MSP overlaps the latest valid_from wins, then the newest row (unsaved rows last)
+    msp_rows = sorted(rows['msp_periods'], key=lambda row: (row['valid_from'], row.get('id') is None, row.get('id') or 0))
+    return build_pricing_rules(
+        settings=rows['settings'],
+        increments=increments if increments is not None else values('increments'),
+        msp_periods=[(row['valid_from'], row['valid_until'], row['msp']) for row in msp_rows],
+        offers=values('offers'),
+        room_rates=[itemgetter(*RULE_ROW_FIELDS['room_rates'])(row) for row in rows['room_rates']],
+        los_setups=values('los_setups'),
+    )
+
+
+def load_pricing_rules(property_id):
+    """
+    Load the rule set of one property (five queries, the increments coming from get_increment_matrix).
+
+    Returns:
+        dict: build_pricing_rules result
+    """
+    names = [name for name in RULE_ROW_FIELDS if name != 'increments']
+    return rules_from_rows(load_rule_rows(property_id, names), increments=get_increment_matrix(property_id))
+
+
+def apply_rule_changes(rows, changes):
+    """
+    Overlay unsaved rule changes on load_rule_rows rows, in memory.
+
+    Args:
+        rows: load_rule_rows result (not modified)
+        changes: {'increments': [...], 'msp_periods': [...], 'offers': [...]};
+            a change with an id updates (or with delete=True removes) that stored row, one
+            without an id is a new row. A new increment replaces the stored row of its
+            (occupancy_category, lead_time_category) cell.
+
+    Returns:
+        dict: new rows
+
+    Raises:
+        ValueError: When a change refers to an unknown row id
+    """
+    result = dict(rows)
+
+    for name in EDITABLE_RULES:
+        by_id = {row['id']: row for row in result[name]}
+        for index, change in enumerate(changes.get(name) or []):
+            change = dict(change)
+            row_id = change.pop('id', None)
+            delete = change.pop('delete', False)
+            if row_id is not None:
+                if row_id not in by_id:
+                    raise ValueError(f"{name}: no row with id {row_id} for this property")
+                if delete:
+                    del by_id[row_id]
+                else:
+                    by_id[row_id] = {**by_id[row_id], **change}
+                continue
+            if name == 'increments':
+                cell = (change.get('occupancy_category'), change.get('lead_time_category'))
+                for stored_id, stored in list(by_id.items()):
+                    if (stored['occupancy_category'], stored['lead_time_category']) == cell:
+                        del by_id[stored_id]
+            by_id[('new', index)] = {field: change.get(field) for field in RULE_ROW_FIELDS[name]}
+        result[name] = list(by_id.values())
+    return result
+
+
+def fill_msp(start_date, days, msp_index):
+    """
+    Return the MSP per date (NaN without a period), from the IntervalIndex of (valid_from, valid_until, msp) periods.
+    """
+    msp = np.full(days, np.nan)
+    for first, last, periods in msp_index.segments(start_date, start_date + timedelta(days=days - 1)):
+        if periods:
+            msp[(first - start_date).days:(last - start_date).days + 1] = periods[-1]
+    return msp
+
+
+def sum_offer_increments(start_date, lead_days, offer_index):
+    """
+    Add up the offers of every date.
+
+    Returns:
+        tuple: (percentage increments, additional increments) per date
+    """
+    days = len(lead_days)
+    percentage = np.zeros(days)
+    additional = np.zeros(days)
+    end_date = start_date + timedelta(days=days - 1)
+    for first, last, offers in offer_index.segments(start_date, end_date):
+        period = slice((first - start_date).days, (last - start_date).days + 1)
+        for applied_from_days, applied_until_days, percent, value in offers:
+            if not value:
+                continue
+            window = np.ones(period.stop - period.start, dtype=bool)
+            if applied_from_days is not None:
+                window &= lead_days[period] <= applied_from_days
+            if applied_until_days is not None:
+                window &= lead_days[period] >= applied_until_days
+            target = percentage if percent else additional
+            target[period][window] += value
+    return percentage, additional
+
+
+def fill_los(start_date, days, los_index):
+    """
+    Return the recommended length of stay per date from {weekday: IntervalIndex of los values}.
+    """
+    los = np.full(days, DEFAULT_RECOM_LOS, dtype=int)
+    end_date = start_date + timedelta(days=days - 1)
+    for weekday, index in los_index.items():
+        # Positions of this weekday step by 7 from the first one
+        offset = (weekday - start_date.weekday()) % 7
+        for first, last, setups in index.segments(start_date, end_date):
+            if not setups or setups[-1] is None:
+                continue
+            first_offset = (first - start_date).days
+            aligned = first_offset + (offset - first_offset) % 7
+            los[aligned:(last - start_date).days + 1:7] = setups[-1]
+    return los
+
+
+def compute_recommended_prices(start_date, occupancy, market_price, rules, today=None):
+    """
+    Compute the recommended prices of consecutive dates in one vectorized pass.
+
+    Args:
+        start_date: Date of the first array element
+        occupancy: Occupancy per date (0-1 or 0-100 scale, NaN when unknown)
+        market_price: Selected market price per date (NaN without enough priced competitors)
+        rules: build_pricing_rules result
+        today: Date the lead times count from (default: today)
+
+    Returns:
+        dict of arrays: lead_days, occupancy (0-100), market_price, base_price,
+        base_is_competitor, dynamic_increment, offer_increment, msp, recom_price
+        (whole currency units, NaN without base price), recom_los and rate_prices
+        (one row per rules['room_rates'] entry)
+    """
+    today = today or timezone.now().date()
+    occupancy = np.asarray(occupancy, dtype=float)
+    market_price = np.asarray(market_price, dtype=float)
+    days = len(occupancy)
+    lead_days = np.arange(days) + (start_date - today).days
+
+    # Occupancy written on a 0-1 scale is expressed in percent, like normalize_occupancy
+    occupancy = np.where(occupancy <= 1, occupancy * 100, occupancy)
+
+    msp = fill_msp(start_date, days, rules['msp_periods'])
+    recom_los = fill_los(start_date, days, rules['los'])
+    base_is_competitor = ~np.isnan(market_price)
+    base_price = np.where(base_is_competitor, market_price, msp)
+
+    # Dynamic increment cell of every date: two bin searches and one fancy index
+    occupancy_bin = np.searchsorted(OCCUPANCY_BIN_EDGES, np.nan_to_num(occupancy), side='right')
+    lead_time_bin = np.searchsorted(LEAD_TIME_BIN_EDGES, np.maximum(lead_days, 0), side='right')
+    cells = rules['increments'][:, occupancy_bin, lead_time_bin]
+    known = ~np.isnan(occupancy)
+    dynamic_price = np.where(
+        known,
+        base_price * (1 + cells[INCREMENT_PERCENTAGE] / 100) + cells[INCREMENT_ADDITIONAL],
+        base_price,
+    )
+
+    offer_percentage, offer_additional = sum_offer_increments(start_date, lead_days, rules['offers'])
+    offer_price = dynamic_price * (1 + offer_percentage / 100) + offer_additional
+
+    recom_price = np.rint(np.fmax(offer_price, msp))
+
+    rate_prices = np.empty((len(rules['room_rates']), days))
+    for i, (_, percent, value) in enumerate(rules['room_rates']):
+        rate_prices[i] = np.rint(recom_price * (1 + value / 100) if percent else recom_price + value)
+
+    return {
+        'lead_days': lead_days,
+        'occupancy': occupancy,
+        'market_price': market_price,
+        'base_price': base_price,
+        'base_is_competitor': base_is_competitor,
+        'dynamic_increment': dynamic_price - base_price,
+        'offer_increment': offer_price - dynamic_price,
+        'msp': msp,
+        'recom_price': recom_price,
+        'recom_los': recom_los,
+        'rate_prices': rate_prices,
+    }
+
+
+def load_pricing_inputs(property_id, start_date, days, rules):
+    """
+    Load the occupancy and selected market price arrays of a date range (two queries
+    plus the price calendar lookups).
+
+    Returns:
+        tuple: (occupancy array, market price array), NaN where unknown
+    """
+    end_date = start_date + timedelta(days=days - 1)
+    occupancy = np.full(days, np.nan)
+    for checkin_date, value in get_latest_price_values(property_id, start_date, end_date, ['occupancy']).values():
+        if value is not None:
+            occupancy[(checkin_date - start_date).days] = value
+
+    market_price = np.full(days, np.nan)
+    field = COMP_PRICE_CALCULATION_FIELDS.get(rules['comp_price_calculation'], 'min_price')
+    for checkin_date, value, priced in (
+        DpDailyMarketAggregate.objects
+        .filter(property_id=property_id, checkin_date__gte=start_date, checkin_date__lte=end_date)
+        .values_list('checkin_date', field, 'priced_competitors')
+    ):
+        if value is not None and priced >= rules['min_competitors']:
+            market_price[(checkin_date - start_date).days] = value
+    return occupancy, market_price
+
+
+def recommend_prices(property_id, start_date=None, days=None, today=None, rules=None):
+    """
+    Compute the recommended prices of a property's pricing horizon.
+
+    Args:
+        start_date: First date (default: today)
+        days: Number of dates (default: DpGeneralSettings.future_days_to_price)
+        rules: Rule set to use instead of the stored one (e.g. with unsaved changes)
+
+    Returns:
+        tuple: (start_date, compute_recommended_prices result)
+    """
+    today = today or timezone.now().date()
+    start_date = start_date or today
+    rules = rules if rules is not None else load_pricing_rules(property_id)
+    days = days or rules['future_days_to_price']
+    occupancy, market_price = load_pricing_inputs(property_id, start_date, days, rules)
+    return start_date, compute_recommended_prices(start_date, occupancy, market_price, rules, today=today)
+
+
+def simulate_rule_changes(property_id, changes, start_date=None, days=DEFAULT_FUTURE_DAYS_TO_PRICE, today=None):
+    """
+    Price a horizon with the stored rules and with unsaved rule changes overlaid.
+
+    Nothing is written; the rules and inputs are loaded once (a fixed number of
+    queries for any horizon) and both rule sets are computed in memory.
+
+    Args:
+        changes: apply_rule_changes changes
+
+    Returns:
+        tuple: (start_date, stored rules result, changed rules result)
+
+    Raises:
+        ValueError: When a change refers to an unknown row id
+    """
+    today = today or timezone.now().date()
+    start_date = start_date or today
+    rows = load_rule_rows(property_id)
+    rules = rules_from_rows(rows)
+    new_rules = rules_from_rows(apply_rule_changes(rows, changes))
+    occupancy, market_price = load_pricing_inputs(property_id, start_date, days, rules)
+    return (
+        start_date,
+        compute_recommended_prices(start_date, occupancy, market_price, rules, today=today),
+        compute_recommended_prices(start_date, occupancy, market_price, new_rules, today=today),
+    )
+
+
+def _number(value):
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def _integer(value):
+    return None if np.isnan(value) else int(value)
+
+
+def build_recommendation_rows(start_date, result, rules):
+    """
+    Convert a compute_recommended_prices result into one JSON-ready dict per date.
+    """
+    rate_ids = [rate_id for rate_id, _, _ in rules['room_rates']]
+    rows = []
+    for i in range(len(result['recom_price'])):
+        rows.append({
+            'checkin_date': (start_date + timedelta(days=i)).isoformat(),
+            'lead_days': int(result['lead_days'][i]),
+            'occupancy': _number(result['occupancy'][i]),
+            'market_price': _number(result['market_price'][i]),
+            'base_price': _number(result['base_price'][i]),
+            'base_price_choice': BASE_PRICE_COMPETITOR if result['base_is_competitor'][i] else BASE_PRICE_MANUAL,
+            'dynamic_increment': _number(result['dynamic_increment'][i]),
+            'offer_increment': _number(result['offer_increment'][i]),
+            'msp': _integer(result['msp'][i]),
+            'recom_price': _integer(result['recom_price'][i]),
+            'recom_los': int(result['recom_los'][i]),
+            'rates': {
+                rate_id: _integer(result['rate_prices'][j, i])
+                for j, rate_id in enumerate(rate_ids)
+            },
+        })
+    return rows
@@ -0,0 +1,199 @@
+"""
+Room Class Normalization
+
+Maps raw competitor room_name strings (e.g. "Habitación Doble Superior",
+"Deluxe King Room") to a small set of canonical room classes so competitor
+prices can be compared like for like.
+
+The mapping is stored in DpRoomClassMapping: sync_room_class_mappings classifies
+the room names of comp_prices_mv / historical_competitor_prices that are not
+mapped yet, and queries filter by room class in SQL with filter_by_room_class.
+Per-row lookups in Python go through an in-process LRU cache (get_room_class)
+keyed by a version token in the shared cache, which sync_room_class_mappings and
+the admin replace after changing mappings, so corrections reach every worker.
+"""
+
+import logging
+import re
+import uuid
+from collections import OrderedDict
+from django.core.cache import cache
+from django.db.models import Subquery
+from django.utils import timezone
+
+from .models import CompetitorPriceMV, DpHistoricalCompetitorPrice, DpRoomClassMapping
+
+logger = logging.getLogger(__name__)
+
+ROOM_CLASSES = [choice for choice, _ in DpRoomClassMapping.ROOM_CLASS_CHOICES]
+
+DEFAULT_ROOM_CLASS = 'other'
+
+# Room names kept in the in-process lookup cache
+ROOM_CLASS_CACHE_SIZE = 4096
+
+ROOM_CLASSES_VERSION_KEY = 'room_classes:version'
+
+# {(room_name, version): room class}, least recently used first
+_room_class_cache = OrderedDict()
+
+# (room class, keyword pattern) checked in order; the first match wins, so the
+# more specific classes come first ("Family Suite" is a suite, "Twin/Double" a twin).
+# Dormitory only matches dorm phrases: "Double Room with Shared Bathroom" is a double
+ROOM_CLASS_RULES = [
+    ('dormitory', r'shared dorm|dorm|dormitorio|bed in|cama en|hostel|litera|bunk'),
+    ('suite', r'suite'),
+    ('apartment', r'apartment|apartamento|apartament|studio|estudio|flat|loft|villa|bungalow'),
+    ('family', r'family|familiar|quadruple|cu[aá]druple|quad|4 (?:adults|personas|people|guests)'),
+    ('triple', r'triple|3 (?:adults|personas|people|guests)'),
+    ('twin', r'twin|dos camas|2 camas|two beds|2 single beds'),
+    ('single', r'single|individual|sencilla|1 (?:adult|persona|person|guest)\b'),
+    ('double', r'double|doble|matrimonio|matrimonial|queen|king|2 (?:adults|personas|people|guests)'),
+]
+
+_COMPILED_RULES = [(room_class, re.compile(rf'\b(?:{pattern})', re.IGNORECASE)) for room_class, pattern in ROOM_CLASS_RULES]
+
+
+def classify_room_name(room_name):
+    """
+    Classify a raw room name with ROOM_CLASS_RULES.
+
+    Returns:
+        str: One of ROOM_CLASSES ('other' when no rule matches)
+    """
+    if not room_name:
+        return DEFAULT_ROOM_CLASS
+    for room_class, pattern in _COMPILED_RULES:
+        if pattern.search(room_name):
+            return room_class
+    return DEFAULT_ROOM_CLASS
+
+
+def get_room_classes_version():
+    """
+    Return the shared room class mapping version token, or None if the cache is unavailable.
+    """
+    try:
+        version = cache.get(ROOM_CLASSES_VERSION_KEY)
+        if version is None:
+            version = uuid.uuid4().hex
+            cache.set(ROOM_CLASSES_VERSION_KEY, version, None)
+        return version
+    except Exception as e:
+        logger.warning(f"Room class cache unavailable: {str(e)}")
+        return None
+
+
+def get_room_class(room_name):
+    """
+    Return the room class of a raw room name.
+
+    Uses the stored mapping (including manual corrections) and falls back to the
+    rules for names not synced yet. Stored mappings are cached per process under
+    the shared version token (invalidate_room_classes); the fallback is not
+    cached, so the mapping is picked up once it is created.
+    """
+    if not room_name:
+        return DEFAULT_ROOM_CLASS
+    version = get_room_classes_version()
+    key = (room_name, version)
+    room_class = _room_class_cache.get(key) if version is not None else None
+    if room_class is not None:
+        _room_class_cache.move_to_end(key)
+        return room_class
+
+    room_class = (
+        DpRoomClassMapping.objects
+        .filter(room_name=room_name)
+        .values_list('room_class', flat=True)
+        .first()
+    )
+    if room_class is None:
+        return classify_room_name(room_name)
+    if version is not None:
+        _room_class_cache[key] = room_class
+        if len(_room_class_cache) > ROOM_CLASS_CACHE_SIZE:
+            _room_class_cache.popitem(last=False)
+    return room_class
+
+
+def clear_room_class_cache():
+    """
+    Drop the room class lookups cached in this process.
+    """
+    _room_class_cache.clear()
+
+
+def invalidate_room_classes():
+    """
+    Invalidate the cached room class lookups of every process by replacing the version token.
+    """
+    try:
+        cache.set(ROOM_CLASSES_VERSION_KEY, uuid.uuid4().hex, None)
+    except Exception as e:
+        logger.warning(f"Could not invalidate room class cache: {str(e)}")
+    clear_room_class_cache()
+
+
+def room_class_names(room_class):
+    """
+    Return a subquery of the raw room names of one room class, for room_name__in filters.
+    """
+    return Subquery(DpRoomClassMapping.objects.filter(room_class=room_class).values('room_name'))
+
+
+def filter_by_room_class(queryset, room_class):
+    """
+    Restrict a comp_prices_mv / historical_competitor_prices queryset to one room class in SQL.
+
+    Returns:
+        QuerySet: queryset filtered with room_name IN (SELECT room_name FROM the mapping)
+    """
+    return queryset.filter(room_name__in=room_class_names(room_class))
+
+
+def sync_room_class_mappings(reclassify=False, batch_size=1000):
+    """
+    Map the room names of the competitor price tables that are not mapped yet.
+
+    Args:
+        reclassify: Also re-run the rules on existing, non-manual mappings
+        batch_size: Mappings written per query
+
+    Returns:
+        dict: {'created': int, 'updated': int}
+    """
+    room_names = set()
+    for model in (CompetitorPriceMV, DpHistoricalCompetitorPrice):
+        room_names.update(
+            model.objects
+            .exclude(room_name__isnull=True)
+            .exclude(room_name='')
+            .order_by()
+            .values_list('room_name', flat=True)
+            .distinct()
+        )
+
+    existing = set(DpRoomClassMapping.objects.values_list('room_name', flat=True))
+    new_mappings = [
+        DpRoomClassMapping(room_name=room_name, room_class=classify_room_name(room_name))
+        for room_name in sorted(room_names)
+        if room_name not in existing
+    ]
+    DpRoomClassMapping.objects.bulk_create(new_mappings, batch_size=batch_size, ignore_conflicts=True)
+
+    updated = 0
+    if reclassify:
+        changed = []
+        for mapping in DpRoomClassMapping.objects.filter(is_manual=False).iterator(chunk_size=batch_size):
+            room_class = classify_room_name(mapping.room_name)
+            if room_class != mapping.room_class:
+                mapping.room_class = room_class
+                mapping.updated_at = timezone.now()
+                changed.append(mapping)
+        DpRoomClassMapping.objects.bulk_update(changed, ['room_class', 'updated_at'], batch_size=batch_size)
+        updated = len(changed)
+
+    invalidate_room_classes()
+    logger.info(f"Synced room class mappings: {len(new_mappings)} created, {updated} reclassified")
+    return {'created': len(new_mappings), 'updated': updated}
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.db import IntegrityError, transaction
 from .models import (
     Property, 
     PropertyManagementSystem, 
@@ -1499,9 +1500,11 @@ class BulkCompetitorCreateSerializer(serializers.Serializer):
     def create(self, validated_data):
         """
         Create multiple Competitor instances
+        
+        Competitors are matched on their normalized name with one SELECT, then new
+        competitors and property relationships are inserted with bulk upserts.
         """
         import logging
-        import hashlib
         
         logger = logging.getLogger(__name__)
         competitor_names = validated_data['competitor_names']
@@ -1579,46 +1582,61 @@ class BulkCompetitorCreateSerializer(serializers.Serializer):
                 code=ErrorCode.PROPERTY_NOT_FOUND
             )
         
+        # One competitor per normalized name, first spelling wins
+        names_by_key = {}
         for competitor_name in competitor_names:
-            try:
-                # Generate a unique competitor name
-                import re
-                
-                # Clean the name
-                clean_name = re.sub(r'[^a-zA-Z0-9]', '', competitor_name.lower())
-                
-                # Check if competitor already exists by name
-                if Competitor.objects.filter(competitor_name=competitor_name.strip()).exists():
-                    # Update existing competitor
-                    competitor = Competitor.objects.get(competitor_name=competitor_name.strip())
-                    competitor.booking_link = validated_data.get('booking_link', '')
-                    competitor.save()
-                    logger.info(f"Updated existing competitor: {competitor_name.strip()}")
-                else:
-                    # Create new competitor
-                    competitor = Competitor.objects.create(
-                        competitor_name=competitor_name.strip(),
-                        booking_link=validated_data.get('booking_link', '')
-                    )
-                    logger.info(f"Created new competitor: {competitor_name.strip()}")
+            names_by_key.setdefault(Competitor.normalize_name(competitor_name), competitor_name.strip())
+        booking_link = validated_data.get('booking_link', '')
+        
+        try:
+            with transaction.atomic():
+                # Single lookup of the competitors that already exist
+                competitors_by_key = {
+                    competitor.normalized_name: competitor
+                    for competitor in Competitor.objects.filter(normalized_name__in=names_by_key.keys())
+                }
+                existing_ids = [
+                    competitor.id for competitor in competitors_by_key.values()
+                    if competitor.booking_link != booking_link
+                ]
+                if existing_ids:
+                    Competitor.objects.filter(id__in=existing_ids).update(booking_link=booking_link)
+                for competitor in competitors_by_key.values():
+                    competitor.booking_link = booking_link
                 
-                # Create or update the property-competitor relationship
-                dp_property_competitor, created = DpPropertyCompetitor.objects.get_or_create(
-                    property_id=property_instance,
-                    competitor=competitor
+                # Upsert the new ones; a concurrent insert of the same name becomes an update
+                new_competitors = Competitor.objects.bulk_create(
+                    [
+                        Competitor(competitor_name=name, normalized_name=key, booking_link=booking_link)
+                        for key, name in names_by_key.items()
+                        if key not in competitors_by_key
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['normalized_name'],
+                    update_fields=['booking_link'],
+                )
+                competitors_by_key.update((competitor.normalized_name, competitor) for competitor in new_competitors)
+                logger.info(
+                    f"Upserted {len(names_by_key)} competitors for property {property_instance.id}: "
+                    f"{len(new_competitors)} new, {len(names_by_key) - len(new_competitors)} existing"
                 )
                 
-                if created:
-                    logger.info(f"Created property-competitor relationship: {property_instance.id} - {competitor.competitor_name}")
-                
-                created_competitors.append(competitor)
-                
-            except Exception as e:
-                logger.error(f"Error creating competitor for name {competitor_name}: {str(e)}")
-                errors.append({
-                    'name': competitor_name,
-                    'error': str(e)
-                })
+                # Link them to the property; existing relationships are left untouched
+                DpPropertyCompetitor.objects.bulk_create(
+                    [
+                        DpPropertyCompetitor(user=request.user, property_id=property_instance, competitor=competitor)
+                        for competitor in competitors_by_key.values()
+                    ],
+                    ignore_conflicts=True,
+                )
+            
+            created_competitors = [
+                competitors_by_key[Competitor.normalize_name(competitor_name)]
+                for competitor_name in competitor_names
+            ]
+        except Exception as e:
+            logger.error(f"Error creating competitors for property {property_instance.id}: {str(e)}")
+            errors = [{'name': competitor_name, 'error': str(e)} for competitor_name in competitor_names]
         
         if errors and not created_competitors:
             # If all competitors failed to create, raise an error
@@ -1723,8 +1741,19 @@ class CompetitorCreateSerializer(serializers.ModelSerializer):
         validated_data['competitor_name'] = competitor_name
         validated_data['booking_link'] = booking_link
         
-        # Create the competitor
-        competitor = super().create(validated_data)
+        # Reuse the competitor already stored under this name (normalized_name is unique)
+        key = Competitor.normalize_name(competitor_name)
+        competitor = Competitor.objects.filter(normalized_name=key).first()
+        if competitor is not None:
+            self.logger.info(f"Reusing competitor {competitor.competitor_name} for property {property_id}")
+            return competitor
+        
+        # Create the competitor; a concurrent create of the same name wins the unique key
+        try:
+            with transaction.atomic():
+                competitor = super().create(validated_data)
+        except IntegrityError:
+            return Competitor.objects.get(normalized_name=key)
         
         self.logger.info(f"Created competitor {competitor.competitor_name} for property {property_id} with URL {booking_link}")
         
@@ -1742,6 +1771,20 @@ class CompetitorDetailSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id']
 
+    def validate_competitor_name(self, value):
+        """
+        Validate that no other competitor has the same normalized name
+        """
+        others = Competitor.objects.filter(normalized_name=Competitor.normalize_name(value))
+        if self.instance is not None:
+            others = others.exclude(pk=self.instance.pk)
+        if others.exists():
+            raise serializers.ValidationError(
+                "A competitor with this name already exists.",
+                code=ErrorCode.COMPETITOR_ALREADY_EXISTS
+            )
+        return value
+
 
 class CompetitorListSerializer(serializers.ModelSerializer):
     """
@@ -1771,4 +1814,94 @@ class OverwritePriceHistorySerializer(serializers.ModelSerializer):
         """
         if value is not None and value < 0:
             raise serializers.ValidationError("Overwrite price must be a positive integer")
-        return value
\ No newline at end of file
+        return value
+
+
+SIMULATED_INCREMENT_TYPES = ['Percentage', 'Additional']
+
+
+class SimulatedRuleSerializer(serializers.Serializer):
+    """
+    Base serializer for one unsaved rule change of a pricing simulation.
+
+    A change with an id updates (or, with delete, removes) the stored rule and only
+    needs the fields that change; a change without an id is a new rule and needs
+    all of required_fields.
+    """
+    required_fields = []
+
+    id = serializers.IntegerField(required=False)
+    delete = serializers.BooleanField(required=False)
+
+    def validate(self, data):
+        if data.get('delete') and 'id' not in data:
+            raise serializers.ValidationError(
+                "id is required to delete a rule",
+                code=ErrorCode.FIELD_REQUIRED
+            )
+        if 'id' not in data:
+            missing = [field for field in self.required_fields if data.get(field) is None]
+            if missing:
+                raise serializers.ValidationError(
+                    f"New rules require: {', '.join(missing)}",
+                    code=ErrorCode.FIELD_REQUIRED
+                )
+            # Same default as DpDynamicIncrementsV2 / DpOfferIncrements
+            if 'increment_type' in self.fields:
+                data.setdefault('increment_type', 'Additional')
+        valid_from = data.get('valid_from')
+        valid_until = data.get('valid_until')
+        if valid_from and valid_until and valid_from > valid_until:
+            raise serializers.ValidationError(
+                "valid_until must be on or after valid_from",
+                code=ErrorCode.DATE_RANGE_INVALID
+            )
+        return data
+
+
+class SimulatedIncrementSerializer(SimulatedRuleSerializer):
+    """
+    Unsaved DpDynamicIncrementsV2 change
+    """
+    required_fields = ['occupancy_category', 'lead_time_category', 'increment_value']
+
+    occupancy_category = serializers.ChoiceField(choices=DpDynamicIncrementsV2.OCCUPANCY_CATEGORIES, required=False)
+    lead_time_category = serializers.ChoiceField(choices=DpDynamicIncrementsV2.LEAD_TIME_CATEGORIES, required=False)
+    increment_type = serializers.ChoiceField(choices=SIMULATED_INCREMENT_TYPES, required=False)
+    increment_value = serializers.FloatField(required=False)
+
+
+class SimulatedMSPSerializer(SimulatedRuleSerializer):
+    """
+    Unsaved DpMinimumSellingPrice change
+    """
+    required_fields = ['valid_from', 'valid_until', 'msp']
+
+    valid_from = serializers.DateField(required=False)
+    valid_until = serializers.DateField(required=False)
+    msp = serializers.IntegerField(min_value=0, required=False)
+
+
+class SimulatedOfferSerializer(SimulatedRuleSerializer):
+    """
+    Unsaved DpOfferIncrements change
+    """
+    required_fields = ['valid_from', 'valid_until', 'increment_value']
+
+    valid_from = serializers.DateField(required=False)
+    valid_until = serializers.DateField(required=False)
+    applied_from_days = serializers.IntegerField(required=False, allow_null=True)
+    applied_until_days = serializers.IntegerField(required=False, allow_null=True)
+    increment_type = serializers.ChoiceField(choices=SIMULATED_INCREMENT_TYPES, required=False)
+    increment_value = serializers.IntegerField(required=False)
+
+
+class PricingSimulationSerializer(serializers.Serializer):
+    """
+    Serializer for a what-if pricing simulation: unsaved rule changes and the horizon to price
+    """
+    increments = SimulatedIncrementSerializer(many=True, required=False)
+    msp_periods = SimulatedMSPSerializer(many=True, required=False)
+    offers = SimulatedOfferSerializer(many=True, required=False)
+    start_date = serializers.DateField(required=False)
+    days = serializers.IntegerField(min_value=1, max_value=731, default=365)
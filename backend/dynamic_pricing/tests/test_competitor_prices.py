@@ -0,0 +1,692 @@
+import os
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from dynamic_pricing.mv_refresh import COMP_PRICES_MV, refresh_materialized_view, get_last_refreshed_at
+from dynamic_pricing.competitor_changes import process_competitor_price_changes
+from dynamic_pricing.market import refresh_market_aggregates, get_market_aggregates, select_market_price
+from dynamic_pricing.fx import (
+    FX_RATES_VERSION_KEY, clear_fx_rate_cache, get_price_converter, load_fx_rates, parse_fx_rate_file
+)
+from dynamic_pricing.serializers import CompetitorCreateSerializer
+from dynamic_pricing.admin import DpRoomClassMappingAdmin
+from dynamic_pricing.room_classes import (
+    classify_room_name, get_room_class, get_room_classes_version, clear_room_class_cache, sync_room_class_mappings
+)
+from dynamic_pricing.models import (
+    DpHistoricalCompetitorPrice, DpDailyMarketAggregate, DpMaterializedViewRefresh, CompetitorPriceMV,
+    DpCompetitorPriceState, Competitor, DpPropertyCompetitor, DpRoomClassMapping, DpFxRate
+)
+from profiles.models import Notification
+from test_utils import (
+    create_test_user, create_test_property, create_test_competitor, create_test_property_competitor,
+    create_test_competitor_price, UnmanagedTablesMixin
+)
+
+
+def create_historical_price(competitor, checkin_date, raw_price, **kwargs):
+    """Create a historical_competitor_prices row for tests."""
+    defaults = {
+        'scraped_hotel_id': f'hotel-{competitor.id}',
+        'hotel_name': competitor.competitor_name,
+        'room_name': 'Double Room',
+        'checkout_date': checkin_date + timedelta(days=1),
+        'currency': 'EUR',
+        'max_persons': 2,
+        'scrape_date': checkin_date - timedelta(days=7),
+        'price': raw_price,
+        'update_tz': timezone.now(),
+    }
+    defaults.update(kwargs)
+    return DpHistoricalCompetitorPrice.objects.create(
+        competitor_id=competitor, checkin_date=checkin_date, raw_price=raw_price, **defaults
+    )
+
+
+class LowestCompetitorPricesAPITests(APITestCase):
+    """Test cases for the scoped, keyset-paginated lowest competitor prices endpoint."""
+
+    def setUp(self):
+        self.user = create_test_user()
+        self.client.force_authenticate(user=self.user)
+        self.property = create_test_property(user=self.user)
+        self.url = reverse('dynamic_pricing:lowest-competitor-prices')
+        self.competitors = [create_test_competitor('Hotel A'), create_test_competitor('Hotel B')]
+        for competitor in self.competitors:
+            create_test_property_competitor(self.property, user=self.user, competitor=competitor)
+            for offset in range(3):
+                checkin_date = date(2025, 7, 1) + timedelta(days=offset)
+                create_historical_price(competitor, checkin_date, 120 + offset, room_name='Suite')
+                create_historical_price(competitor, checkin_date, 90 + offset)
+                # Excluded rows: single-person rooms and unparsable hotels
+                create_historical_price(competitor, checkin_date, 10, max_persons=1)
+                create_historical_price(competitor, checkin_date, 5, hotel_name='NOT PARSABLE')
+        # Competitor of another property and a date outside the range
+        outsider = create_test_competitor('Hotel C')
+        create_historical_price(outsider, date(2025, 7, 1), 1)
+        create_historical_price(self.competitors[0], date(2025, 8, 1), 1)
+        self.params = {'property_id': self.property.id, 'start_date': '2025-07-01', 'end_date': '2025-07-31'}
+
+    def test_scoped_lowest_prices(self):
+        """Only the property's competitors and the date range are returned, lowest price per date."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, self.params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 6)
+        self.assertIsNone(response.data['next_cursor'])
+        first = response.data['results'][0]
+        self.assertEqual(first['competitor_name'], 'Hotel A')
+        self.assertEqual(first['raw_price'], 90)
+        self.assertEqual(first['room_name'], 'Double Room')
+        self.assertEqual({row['competitor_id'] for row in response.data['results']}, {c.id for c in self.competitors})
+        window_queries = [q for q in queries.captured_queries if 'ROW_NUMBER' in q['sql']]
+        self.assertEqual(len(window_queries), 1)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in queries.captured_queries))
+
+    def test_keyset_pagination(self):
+        """Pages continue after the cursor without gaps or duplicates."""
+        seen = []
+        params = {**self.params, 'limit': 4}
+        while True:
+            response = self.client.get(self.url, params)
+            seen.extend((row['competitor_id'], row['checkin_date']) for row in response.data['results'])
+            if not response.data['next_cursor']:
+                break
+            params['cursor'] = response.data['next_cursor']
+
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(seen, sorted(set(seen)))
+
+    def test_scope_required(self):
+        """property_id and the date range are required; other users' properties are denied."""
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+
+        other_property = create_test_property(name='Other Hotel', user=create_test_user(username='other'))
+        response = self.client.get(self.url, {**self.params, 'property_id': other_property.id})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class MarketAggregateRefreshTests(UnmanagedTablesMixin, TestCase):
+    """Test cases for the daily market aggregate table."""
+    unmanaged_models = [CompetitorPriceMV]
+
+    def setUp(self):
+        self.user = create_test_user()
+        self.property = create_test_property(user=self.user)
+        self.checkin_date = date(2025, 9, 1)
+        self.earlier = timezone.now() - timedelta(hours=2)
+        self.competitors = [create_test_competitor(f'Hotel {name}') for name in 'ABCD']
+        for competitor in self.competitors:
+            create_test_property_competitor(self.property, user=self.user, competitor=competitor)
+        a, b, c, d = self.competitors
+        create_test_competitor_price(a, self.checkin_date, '100.00', update_tz=self.earlier)
+        create_test_competitor_price(a, self.checkin_date, '80.00', update_tz=self.earlier)
+        create_test_competitor_price(b, self.checkin_date, '120.00', update_tz=self.earlier)
+        create_test_competitor_price(c, self.checkin_date, '150.50', update_tz=self.earlier)
+        create_test_competitor_price(d, self.checkin_date, '0', sold_out_message='Sold out', update_tz=self.earlier)
+        # Only-follow competitors do not drive pricing
+        followed = create_test_competitor('Hotel Followed')
+        create_test_property_competitor(self.property, user=self.user, competitor=followed, only_follow=True)
+        create_test_competitor_price(followed, self.checkin_date, '10.00', update_tz=self.earlier)
+
+    def test_full_aggregate(self):
+        """min/max/avg/median use each competitor's lowest price; sold-out competitors are counted."""
+        self.assertEqual(refresh_market_aggregates(self.property.id), 1)
+
+        aggregate = get_market_aggregates(self.property.id, self.checkin_date, self.checkin_date)[self.checkin_date]
+        self.assertEqual(aggregate.min_price, Decimal('80.00'))
+        self.assertEqual(aggregate.max_price, Decimal('150.50'))
+        self.assertEqual(aggregate.avg_price, Decimal('116.83'))
+        self.assertEqual(aggregate.median_price, Decimal('120.00'))
+        self.assertEqual(aggregate.priced_competitors, 3)
+        self.assertEqual(aggregate.sold_out_competitors, 1)
+
+        self.assertEqual(select_market_price(aggregate, 'median', 2), Decimal('120.00'))
+        self.assertIsNone(select_market_price(aggregate, 'min', 4))
+
+    def test_incremental_refresh_uses_watermark(self):
+        """Only dates with scrape rows newer than the watermark are recomputed."""
+        refresh_market_aggregates(self.property.id)
+        self.assertEqual(refresh_market_aggregates(self.property.id), 0)
+
+        other_date = self.checkin_date + timedelta(days=1)
+        create_test_competitor_price(self.competitors[0], other_date, '90.00')
+        create_test_competitor_price(self.competitors[1], self.checkin_date, '70.00')
+
+        self.assertEqual(refresh_market_aggregates(self.property.id), 2)
+        aggregate = DpDailyMarketAggregate.objects.get(property_id=self.property, checkin_date=self.checkin_date)
+        self.assertEqual(aggregate.min_price, Decimal('70.00'))
+
+    def test_compression_index(self):
+        """Sold-out and not-taking-reservations competitors compress the market; the endpoint reads the stored index."""
+        not_taking = create_test_competitor('Hotel Closed')
+        create_test_property_competitor(self.property, user=self.user, competitor=not_taking)
+        create_test_competitor_price(not_taking, self.checkin_date, '90.00', taking_reservations=False)
+
+        with CaptureQueriesContext(connection) as queries:
+            refresh_market_aggregates(self.property.id)
+        scrape_queries = [q for q in queries.captured_queries if 'comp_prices_mv' in q['sql'] and 'GROUP BY' in q['sql']]
+        self.assertEqual(len(scrape_queries), 1)
+
+        aggregate = DpDailyMarketAggregate.objects.get(property_id=self.property, checkin_date=self.checkin_date)
+        # Every followed competitor counts, the only_follow one included: A, B, C and Followed
+        # are available, D is sold out and Closed is not taking reservations
+        self.assertEqual(aggregate.available_competitors, 4)
+        self.assertEqual(aggregate.unavailable_competitors, 2)
+        self.assertEqual(aggregate.compression_index, 0.3333)
+        # Prices still only come from the pricing competitors (not Followed's 10.00)
+        self.assertEqual(aggregate.priced_competitors, 4)
+        self.assertEqual(aggregate.min_price, Decimal('80.00'))
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        url = reverse('dynamic_pricing:market-compression', kwargs={'property_id': self.property.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, {'start_date': '2025-09-01', 'end_date': '2025-09-30'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['compression'], [{
+            'checkin_date': '2025-09-01', 'compression_index': 0.3333,
+            'unavailable_competitors': 2, 'available_competitors': 4,
+        }])
+        self.assertFalse([q for q in queries.captured_queries if 'FROM "comp_prices_mv"' in q['sql']])
+
+    def test_refresh_command(self):
+        """The management command refreshes every property with competitors."""
+        out = StringIO()
+        call_command('refresh_market_aggregates', stdout=out)
+
+        self.assertIn('Refreshed 1 market aggregate date(s)', out.getvalue())
+
+
+class CompPricesRefreshTests(UnmanagedTablesMixin, APITestCase):
+    """Test cases for comp_prices_mv refresh tracking and staleness headers."""
+    unmanaged_models = [CompetitorPriceMV]
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_test_user()
+        self.client.force_authenticate(user=self.user)
+        self.property = create_test_property(user=self.user)
+        self.competitor = create_test_competitor('Hotel X')
+        create_test_property_competitor(self.property, user=self.user, competitor=self.competitor)
+        create_test_competitor_price(self.competitor, date(2025, 5, 1), 80)
+
+    def test_refresh_is_recorded(self):
+        """Every run is logged; non-PostgreSQL databases are skipped, not failed."""
+        run = refresh_materialized_view()
+
+        self.assertEqual(run.status, 'skipped')
+        self.assertIn('PostgreSQL', run.error)
+        self.assertEqual(DpMaterializedViewRefresh.objects.filter(view_name=COMP_PRICES_MV).count(), 1)
+        self.assertIsNone(get_last_refreshed_at())
+
+    def test_competitor_endpoints_report_staleness(self):
+        """Competitor endpoints expose the last successful refresh, also on 304 responses."""
+        url = reverse('dynamic_pricing:competitor-prices-for-date', kwargs={'property_id': self.property.id})
+        response = self.client.get(url, {'date': '2025-05-01'})
+        self.assertNotIn('X-Data-Refreshed-At', response)
+
+        refreshed_at = timezone.now() - timedelta(minutes=5)
+        DpMaterializedViewRefresh.objects.create(
+            view_name=COMP_PRICES_MV, status='success', started_at=refreshed_at,
+            finished_at=refreshed_at, duration_seconds=1.5, row_count=1
+        )
+        cache.clear()
+
+        response = self.client.get(url, {'date': '2025-05-01'})
+        self.assertEqual(response['X-Data-Refreshed-At'], refreshed_at.isoformat())
+        self.assertGreaterEqual(int(response['X-Data-Staleness-Seconds']), 300)
+
+        chart_url = reverse('dynamic_pricing:competitor-prices-weekly-chart', kwargs={'property_id': self.property.id})
+        etag = self.client.get(chart_url, {'start_date': '2025-05-01'})['ETag']
+        response = self.client.get(chart_url, {'start_date': '2025-05-01'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['X-Data-Refreshed-At'], refreshed_at.isoformat())
+
+    def test_status_command(self):
+        """--status reports staleness and recent runs."""
+        refresh_materialized_view()
+        out = StringIO()
+        call_command('refresh_comp_prices_mv', status=True, stdout=out)
+
+        self.assertIn('never been refreshed', out.getvalue())
+        self.assertIn('skipped', out.getvalue())
+
+
+class CompetitorHeatmapAPITests(UnmanagedTablesMixin, APITestCase):
+    """Test cases for the competitor x date heatmap."""
+    unmanaged_models = [CompetitorPriceMV]
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_test_user()
+        self.client.force_authenticate(user=self.user)
+        self.property = create_test_property(user=self.user)
+        self.hotel_a = create_test_competitor('Hotel A')
+        self.hotel_b = create_test_competitor('Hotel B')
+        for competitor in (self.hotel_a, self.hotel_b):
+            create_test_property_competitor(self.property, user=self.user, competitor=competitor)
+        self.start_date = date(2025, 6, 1)
+        self.end_date = self.start_date + timedelta(days=89)
+        create_test_competitor_price(self.hotel_a, self.start_date, '100.00')
+        create_test_competitor_price(self.hotel_a, self.start_date, '90.00')
+        create_test_competitor_price(self.hotel_a, self.end_date, '0', sold_out_message='Sold out')
+        create_test_competitor_price(self.hotel_b, self.start_date + timedelta(days=45), '0', sold_out_message='Sold out')
+        create_test_competitor_price(self.hotel_b, self.start_date + timedelta(days=45), '120.00')
+        # Outside the window
+        create_test_competitor_price(self.hotel_b, self.end_date + timedelta(days=1), '50.00')
+        self.url = reverse('dynamic_pricing:competitor-prices-heatmap', kwargs={'property_id': self.property.id})
+        self.params = {'start_date': self.start_date.isoformat(), 'end_date': self.end_date.isoformat()}
+
+    def test_heatmap_matrix(self):
+        """A 90-day window is loaded with a single price query and returned as a matrix."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        price_queries = [q for q in queries.captured_queries if 'comp_prices_mv' in q['sql'] and 'sold_out_message' in q['sql']]
+        self.assertEqual(len(price_queries), 1)
+
+        data = response.data
+        self.assertEqual(data['days'], 90)
+        self.assertEqual([comp['name'] for comp in data['competitors']], ['Hotel A', 'Hotel B'])
+        prices_a, prices_b = data['prices']
+        sold_out_a, sold_out_b = data['sold_out']
+        self.assertEqual(len(prices_a), 90)
+        self.assertEqual(Decimal(str(prices_a[0])), Decimal('90.00'))
+        self.assertIsNone(prices_a[89])
+        self.assertEqual(sold_out_a[89], 1)
+        # A day with any priced room is not sold out
+        self.assertEqual(Decimal(str(prices_b[45])), Decimal('120.00'))
+        self.assertEqual(sold_out_b[45], 0)
+        self.assertEqual(sum(sold_out_b), 0)
+
+        etag = response['ETag']
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_invalid_range(self):
+        """Missing, reversed and oversized windows are rejected."""
+        self.assertEqual(self.client.get(self.url, {'start_date': '2025-06-01'}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'start_date': '2025-06-10', 'end_date': '2025-06-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'start_date': '2025-01-01', 'end_date': '2026-06-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_users_property(self):
+        """Properties of other users are not found."""
+        other_property = create_test_property(user=create_test_user(username='otheruser', email='other@example.com'), name='Other Hotel')
+        url = reverse('dynamic_pricing:competitor-prices-heatmap', kwargs={'property_id': other_property.id})
+        self.assertEqual(self.client.get(url, self.params).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RoomClassTests(UnmanagedTablesMixin, APITestCase):
+    """Test cases for room class normalization and the ?room_class= competitor price filter."""
+    unmanaged_models = [CompetitorPriceMV]
+
+    def setUp(self):
+        cache.clear()
+        clear_room_class_cache()
+        self.user = create_test_user()
+        self.client.force_authenticate(user=self.user)
+        self.property = create_test_property(user=self.user)
+        self.competitor = create_test_competitor('Hotel A')
+        create_test_property_competitor(self.property, user=self.user, competitor=self.competitor)
+        self.checkin_date = date(2025, 6, 1)
+        create_test_competitor_price(self.competitor, self.checkin_date, '60.00', room_name='Bed in 6-Bed Dormitory')
+        create_test_competitor_price(self.competitor, self.checkin_date, '95.00', room_name='Habitación Doble Superior')
+        create_test_competitor_price(self.competitor, self.checkin_date, '180.00', room_name='Junior Suite')
+        self.url = reverse('dynamic_pricing:competitor-prices-for-date', kwargs={'property_id': self.property.id})
+
+    def test_classify_room_name(self):
+        """Raw room names map to canonical classes; the more specific class wins."""
+        self.assertEqual(classify_room_name('Habitación Doble Superior'), 'double')
+        self.assertEqual(classify_room_name('Deluxe King Room'), 'double')
+        self.assertEqual(classify_room_name('Twin Room'), 'twin')
+        self.assertEqual(classify_room_name('Family Suite'), 'suite')
+        self.assertEqual(classify_room_name('Bed in Dormitory'), 'dormitory')
+        self.assertEqual(classify_room_name('Apartamento con terraza'), 'apartment')
+        self.assertEqual(classify_room_name('Room'), 'other')
+        self.assertEqual(classify_room_name(None), 'other')
+
+    def test_classify_shared_bathroom_and_casa(self):
+        """Private rooms with a shared bathroom are not dorms; a casa rural room is not an apartment."""
+        self.assertEqual(classify_room_name('Double Room with Shared Bathroom'), 'double')
+        self.assertEqual(classify_room_name('Twin Room - Shared Bathroom'), 'twin')
+        self.assertEqual(classify_room_name('Habitación Doble con baño compartido'), 'double')
+        self.assertEqual(classify_room_name('Casa rural doble'), 'double')
+        self.assertEqual(classify_room_name('Bed in 6-Bed Shared Dorm'), 'dormitory')
+        self.assertEqual(classify_room_name('Cama en dormitorio compartido'), 'dormitory')
+
+    def test_get_room_class_follows_mapping_changes(self):
+        """Unmapped names are not cached; admin corrections replace the shared version token."""
+        self.assertEqual(get_room_class('Junior Suite'), 'suite')
+        mapping = DpRoomClassMapping.objects.create(room_name='Junior Suite', room_class='double')
+        self.assertEqual(get_room_class('Junior Suite'), 'double')
+        with self.assertNumQueries(0):
+            get_room_class('Junior Suite')
+
+        version = get_room_classes_version()
+        mapping.room_class = 'suite'
+        DpRoomClassMappingAdmin(DpRoomClassMapping, admin.site).save_model(None, mapping, None, True)
+        self.assertNotEqual(get_room_classes_version(), version)
+        self.assertEqual(get_room_class('Junior Suite'), 'suite')
+
+        version = get_room_classes_version()
+        DpRoomClassMappingAdmin(DpRoomClassMapping, admin.site).delete_model(None, mapping)
+        self.assertNotEqual(get_room_classes_version(), version)
+
+    def test_sync_keeps_manual_mappings(self):
+        """New room names are mapped; manual corrections survive a reclassification."""
+        DpRoomClassMapping.objects.create(room_name='Junior Suite', room_class='double', is_manual=True)
+
+        self.assertEqual(sync_room_class_mappings(reclassify=True), {'created': 2, 'updated': 0})
+        self.assertEqual(sync_room_class_mappings(), {'created': 0, 'updated': 0})
+        self.assertEqual(get_room_class('Habitación Doble Superior'), 'double')
+        self.assertEqual(get_room_class('Junior Suite'), 'double')
+
+        out = StringIO()
+        call_command('sync_room_classes', stdout=out)
+        self.assertIn('Mapped 0 new room name(s)', out.getvalue())
+
+    def test_room_class_filter(self):
+        """?room_class= compares like-for-like rooms in SQL and the response reports the class."""
+        sync_room_class_mappings()
+
+        response = self.client.get(self.url, {'date': '2025-06-01', 'room_class': 'dormitory'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Decimal(str(response.data[0]['price'])), Decimal('60.00'))
+        self.assertEqual(response.data[0]['room_class'], 'dormitory')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'date': '2025-06-01', 'room_class': 'double'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Decimal(str(response.data[0]['price'])), Decimal('95.00'))
+        self.assertEqual(response.data[0]['room_class'], 'double')
+        self.assertTrue(any('dynamic_pricing_dproomclassmapping' in q['sql'] for q in queries.captured_queries))
+
+        heatmap_url = reverse('dynamic_pricing:competitor-prices-heatmap', kwargs={'property_id': self.property.id})
+        response = self.client.get(heatmap_url, {'start_date': '2025-06-01', 'end_date': '2025-06-01', 'room_class': 'suite'})
+        self.assertEqual(Decimal(str(response.data['prices'][0][0])), Decimal('180.00'))
+
+    def test_invalid_room_class(self):
+        """Unknown room classes are rejected."""
+        response = self.client.get(self.url, {'date': '2025-06-01', 'room_class': 'penthouse'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CurrencyNormalizationTests(UnmanagedTablesMixin, APITestCase):
+    """Test cases for the FX rate table and competitor price currency normalization."""
+    unmanaged_models = [CompetitorPriceMV]
+
+    def setUp(self):
+        cache.clear()
+        clear_fx_rate_cache()
+        self.user = create_test_user()
+        self.client.force_authenticate(user=self.user)
+        self.property = create_test_property(user=self.user)
+        self.today = timezone.now().date()
+        self.checkin_date = self.today + timedelta(days=30)
+        self.eur_hotel = create_test_competitor('Hotel EUR')
+        self.usd_hotel = create_test_competitor('Hotel USD')
+        for competitor in (self.eur_hotel, self.usd_hotel):
+            create_test_property_competitor(self.property, user=self.user, competitor=competitor)
+        create_test_competitor_price(self.eur_hotel, self.checkin_date, '100.00')
+        create_test_competitor_price(self.usd_hotel, self.checkin_date, '110.00', currency='USD')
+        create_test_competitor_price(self.usd_hotel, self.checkin_date, '88.00', currency='GBP')
+        load_fx_rates([
+            (self.today - timedelta(days=2), 'USD', Decimal('1.10')),
+            (self.today - timedelta(days=20), 'GBP', Decimal('0.80')),
+        ])
+
+    def write_file(self, content):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_converter(self):
+        """The latest recent rate converts prices; rates of a day are read once per process."""
+        with CaptureQueriesContext(connection) as queries:
+            convert = get_price_converter('EUR')
+            self.assertEqual(convert(Decimal('110.00'), 'usd'), Decimal('100.00'))
+            self.assertEqual(convert(Decimal('55.00'), 'USD'), Decimal('50.00'))
+            self.assertEqual(convert(Decimal('70.00'), 'EUR'), Decimal('70.00'))
+            self.assertEqual(convert(Decimal('70.00'), None), Decimal('70.00'))
+            # The only GBP rate is too old to be used
+            self.assertIsNone(convert(Decimal('88.00'), 'GBP'))
+            self.assertEqual(get_price_converter('USD')(Decimal('100.00'), 'EUR'), Decimal('110.00'))
+        self.assertEqual(len(queries.captured_queries), 1)
+
+    def test_rate_cache_follows_shared_version(self):
+        """Empty days are not cached and a version bump from another process drops cached rates."""
+        next_week = self.today + timedelta(days=10)
+        self.assertIsNone(get_price_converter('EUR', next_week)(Decimal('110.00'), 'USD'))
+        DpFxRate.objects.create(rate_date=next_week, currency='USD', rate=Decimal('1.25'))
+        self.assertEqual(get_price_converter('EUR', next_week)(Decimal('125.00'), 'USD'), Decimal('100.00'))
+
+        # Rates written by another process: the cached day stays until the version changes
+        DpFxRate.objects.filter(rate_date=next_week).update(rate=Decimal('1.00'))
+        self.assertEqual(get_price_converter('EUR', next_week)(Decimal('125.00'), 'USD'), Decimal('100.00'))
+        cache.set(FX_RATES_VERSION_KEY, 'reloaded', None)
+        self.assertEqual(get_price_converter('EUR', next_week)(Decimal('125.00'), 'USD'), Decimal('125.00'))
+
+    def test_market_aggregates_use_property_currency(self):
+        """Aggregates compare converted prices and skip prices without a rate."""
+        refresh_market_aggregates(self.property.id)
+
+        aggregate = get_market_aggregates(self.property.id, self.checkin_date, self.checkin_date)[self.checkin_date]
+        self.assertEqual(aggregate.min_price, Decimal('100.00'))
+        self.assertEqual(aggregate.max_price, Decimal('100.00'))
+        self.assertEqual(aggregate.priced_competitors, 2)
+
+    def test_heatmap_prices_are_converted(self):
+        """Chart endpoints report the property currency and converted prices."""
+        self.property.currency = 'USD'
+        self.property.save()
+        url = reverse('dynamic_pricing:competitor-prices-heatmap', kwargs={'property_id': self.property.id})
+        params = {'start_date': self.checkin_date.isoformat(), 'end_date': self.checkin_date.isoformat()}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['currency'], 'USD')
+        names = [comp['name'] for comp in response.data['competitors']]
+        prices = dict(zip(names, response.data['prices']))
+        self.assertEqual(Decimal(str(prices['Hotel EUR'][0])), Decimal('110.00'))
+        self.assertEqual(Decimal(str(prices['Hotel USD'][0])), Decimal('110.00'))
+        fx_queries = [q for q in queries.captured_queries if 'dynamic_pricing_dpfxrate' in q['sql']]
+        self.assertEqual(len(fx_queries), 1)
+
+    def test_load_command(self):
+        """Long and ECB wide files are loaded and re-loading updates the rates."""
+        long_path = self.write_file('date,currency,rate\n2025-01-02,USD,1.0350\n2025-01-02,EUR,1\n')
+        wide_path = self.write_file('Date, USD, JPY, CYP,\n2025-01-02, 1.0321, 163.06, N/A,\n2025-01-03, 1.0299, 162.12, N/A,\n')
+
+        self.assertEqual(parse_fx_rate_file(long_path)[0], (date(2025, 1, 2), 'USD', Decimal('1.0350')))
+        self.assertEqual(len(parse_fx_rate_file(wide_path)), 4)
+
+        out = StringIO()
+        call_command('load_fx_rates', long_path, stdout=out)
+        call_command('load_fx_rates', wide_path, since='2025-01-02', stdout=out)
+        self.assertIn('Loaded 4 FX rate(s)', out.getvalue())
+        rate = DpFxRate.objects.get(rate_date=date(2025, 1, 2), currency='USD')
+        self.assertEqual(rate.rate, Decimal('1.0321'))
+        self.assertEqual(rate.source, os.path.basename(wide_path))
+
+    def test_invalid_file(self):
+        """Malformed files are rejected with the offending line."""
+        path = self.write_file('date,currency,rate\n2025-01-02,USD,abc\n')
+        with self.assertRaisesMessage(CommandError, ':2: invalid rate'):
+            call_command('load_fx_rates', path, stdout=StringIO())
+
+
+class CompetitorPriceChangeTests(TestCase):
+    """Test cases for the incremental competitor price change detector."""
+
+    def setUp(self):
+        self.user = create_test_user()
+        self.property = create_test_property(user=self.user)
+        self.competitor = create_test_competitor('Hotel X')
+        create_test_property_competitor(self.property, user=self.user, competitor=self.competitor)
+        self.today = timezone.now().date()
+        self.moved_date = self.today + timedelta(days=10)
+        self.stable_date = self.today + timedelta(days=11)
+        self.first_scrape = timezone.now() - timedelta(hours=6)
+        for checkin_date in (self.moved_date, self.stable_date):
+            self.scrape(checkin_date, 100, self.first_scrape)
+            self.scrape(checkin_date, 130, self.first_scrape)
+        # Past dates are ignored
+        self.scrape(self.today - timedelta(days=1), 100, self.first_scrape)
+
+    def scrape(self, checkin_date, price, update_tz, **kwargs):
+        return create_historical_price(
+            self.competitor, checkin_date, price,
+            scrape_date=timezone.localdate(update_tz), update_tz=update_tz, **kwargs
+        )
+
+    def test_first_run_builds_baseline(self):
+        """The first pass stores the best price per date without notifying."""
+        stats = process_competitor_price_changes()
+
+        self.assertEqual(stats['rows'], 4)
+        self.assertEqual(stats['changes'], 0)
+        state = DpCompetitorPriceState.objects.get(competitor=self.competitor, checkin_date=self.moved_date)
+        self.assertEqual(state.best_price, 100)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_material_change_is_notified(self):
+        """Only rows past the watermark are read, and only changes above the threshold notify."""
+        process_competitor_price_changes()
+        next_scrape = timezone.now() + timedelta(days=1)
+        self.scrape(self.moved_date, 125, next_scrape)
+        self.scrape(self.stable_date, 104, next_scrape)
+
+        stats = process_competitor_price_changes(threshold=10)
+
+        self.assertEqual(stats['rows'], 2)
+        self.assertEqual(stats['changes'], 1)
+        notification = Notification.objects.get(user=self.user)
+        self.assertEqual(notification.category, 'competitor')
+        self.assertEqual(notification.priority, 'high')
+        self.assertEqual(notification.metadata['changes'], [{
+            'competitor_id': self.competitor.id,
+            'checkin_date': self.moved_date.isoformat(),
+            'previous_price': 100.0,
+            'price': 125.0,
+            'change_pct': 25.0,
+        }])
+        self.assertEqual(DpCompetitorPriceState.objects.get(checkin_date=self.stable_date).best_price, 104)
+
+        # Nothing new: nothing read
+        self.assertEqual(process_competitor_price_changes()['rows'], 0)
+
+    def test_sold_out_is_not_a_price_change(self):
+        """A sold-out scrape updates the state but does not notify."""
+        process_competitor_price_changes()
+        self.scrape(self.moved_date, 0, timezone.now() + timedelta(days=1), sold_out_message='Sold out')
+
+        self.assertEqual(process_competitor_price_changes()['changes'], 0)
+        state = DpCompetitorPriceState.objects.get(checkin_date=self.moved_date)
+        self.assertIsNone(state.best_price)
+        self.assertTrue(state.sold_out)
+
+    def test_command(self):
+        """The management command reports the pass."""
+        out = StringIO()
+        call_command('detect_competitor_price_changes', '--no-notify', stdout=out)
+
+        self.assertIn('Processed 4 new scrape row(s) into 2 price state(s)', out.getvalue())
+
+
+class BulkCompetitorCreateTests(APITestCase):
+    """Test cases for the bulk competitor upsert."""
+
+    def setUp(self):
+        self.user = create_test_user()
+        self.client.force_authenticate(user=self.user)
+        self.property = create_test_property(user=self.user)
+        self.existing = create_test_competitor('Hotel  Sol')
+        self.url = '/api/booking/competitors/bulk-create/'
+
+    def test_existing_names_are_matched_normalized(self):
+        """Names match existing competitors regardless of case and spacing, in a fixed number of queries."""
+        payload = {'property_id': self.property.id, 'competitor_names': ['hotel sol', 'Hotel Luna', 'HOTEL LUNA ', 'Casa Mar']}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        competitor_queries = [q for q in queries.captured_queries if 'dynamic_pricing_competitor"' in q['sql']]
+        # SELECT existing, UPDATE their booking_link, INSERT ... ON CONFLICT the new ones
+        self.assertEqual(len(competitor_queries), 3)
+        self.assertEqual(Competitor.objects.count(), 3)
+        self.assertEqual(Competitor.objects.get(normalized_name='hotel sol').id, self.existing.id)
+        self.assertEqual(
+            DpPropertyCompetitor.objects.filter(property_id=self.property, user=self.user).count(), 3
+        )
+
+        # Repeating the request links nothing new
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Competitor.objects.count(), 3)
+        self.assertEqual(DpPropertyCompetitor.objects.filter(property_id=self.property).count(), 3)
+
+    def test_rename_moves_normalized_name(self):
+        """Renaming a competitor recomputes its key, so later bulk creates match the new name."""
+        link = create_test_property_competitor(self.property, user=self.user, competitor=self.existing)
+        url = reverse(
+            'dynamic_pricing:property-competitor-update',
+            kwargs={'property_id': self.property.id, 'competitor_id': link.id}
+        )
+        response = self.client.patch(url, {'competitor_name': 'Hotel Sol Playa'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.normalized_name, 'hotel sol playa')
+
+        self.client.post(self.url, {'property_id': self.property.id, 'competitor_names': ['hotel sol']}, format='json')
+        self.assertNotEqual(Competitor.objects.get(normalized_name='hotel sol').id, self.existing.id)
+
+    def test_rename_collision_is_rejected(self):
+        """Renaming to another competitor's name (any case or spacing) is a 400."""
+        other = create_test_competitor('Casa Mar')
+        link = create_test_property_competitor(self.property, user=self.user, competitor=other)
+        url = reverse(
+            'dynamic_pricing:property-competitor-update',
+            kwargs={'property_id': self.property.id, 'competitor_id': link.id}
+        )
+        response = self.client.patch(url, {'competitor_name': 'HOTEL SOL'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        detail_url = reverse('dynamic_pricing:competitor-detail', kwargs={'competitor_id': other.id})
+        response = self.client.put(detail_url, {'competitor_name': 'hotel   sol'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        other.refresh_from_db()
+        self.assertEqual(other.competitor_name, 'Casa Mar')
+
+    def test_create_reuses_existing_name(self):
+        """Creating a competitor whose name already exists returns the existing one."""
+        link = 'https://www.booking.com/hotel/es/casa-mar.html'
+        first = CompetitorCreateSerializer(data={'property_id': self.property.id, 'booking_link': link})
+        self.assertTrue(first.is_valid())
+        second = CompetitorCreateSerializer(data={'property_id': self.property.id, 'booking_link': link + '?aid=1'})
+        self.assertTrue(second.is_valid())
+
+        competitor = first.save()
+        self.assertEqual(second.save().id, competitor.id)
+        self.assertEqual(Competitor.objects.filter(normalized_name='es/casa-mar').count(), 1)
@@ -0,0 +1,160 @@
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from dynamic_pricing.intervals import IntervalIndex, build_weekday_indexes, parse_weekday
+from dynamic_pricing.models import DpLosSetup, DpMinimumSellingPrice
+from dynamic_pricing.notification_triggers import check_msp_for_date_range
+from dynamic_pricing.pricing_engine import build_pricing_rules, compute_recommended_prices, load_pricing_rules
+from test_utils import create_test_user, create_test_property
+
+
+class IntervalIndexTests(SimpleTestCase):
+    """Test cases for point and range lookups over date ranges."""
+
+    def setUp(self):
+        # Priority order: later entries win on overlaps
+        self.index = IntervalIndex([
+            (date(2025, 7, 1), date(2025, 7, 31), 'july'),
+            (date(2025, 7, 10), date(2025, 7, 12), 'event'),
+            (date(2025, 7, 10), date(2025, 7, 10), 'opening'),
+            (date(2025, 8, 5), date(2025, 8, 6), 'august'),
+            (date(2025, 9, 2), date(2025, 9, 1), 'invalid'),
+        ])
+
+    def test_at(self):
+        self.assertIsNone(self.index.at(date(2025, 6, 30)))
+        self.assertEqual(self.index.at(date(2025, 7, 1)), 'july')
+        # Same valid_from: the later entry wins
+        self.assertEqual(self.index.at(date(2025, 7, 10)), 'opening')
+        self.assertEqual(self.index.at(date(2025, 7, 11)), 'event')
+        # Ranges are inclusive at both ends
+        self.assertEqual(self.index.at(date(2025, 7, 12)), 'event')
+        self.assertEqual(self.index.at(date(2025, 7, 13)), 'july')
+        self.assertIsNone(self.index.at(date(2025, 8, 1)))
+        self.assertEqual(self.index.at(date(2025, 8, 6)), 'august')
+        self.assertIsNone(self.index.at(date(2025, 8, 7)))
+        self.assertEqual(len(self.index), 4)
+
+    def test_covering(self):
+        self.assertEqual(self.index.covering(date(2025, 7, 10)), ('july', 'event', 'opening'))
+        self.assertEqual(self.index.covering(date(2025, 6, 1)), ())
+
+    def test_ranges(self):
+        self.assertEqual(self.index.overlapping(date(2025, 7, 12), date(2025, 8, 5)), ['july', 'event', 'august'])
+        self.assertEqual(self.index.overlapping(date(2025, 6, 1), date(2025, 6, 30)), [])
+
+        segments = list(self.index.segments(date(2025, 7, 9), date(2025, 7, 14)))
+        self.assertEqual(segments, [
+            (date(2025, 7, 9), date(2025, 7, 9), ('july',)),
+            (date(2025, 7, 10), date(2025, 7, 10), ('july', 'event', 'opening')),
+            (date(2025, 7, 11), date(2025, 7, 12), ('july', 'event')),
+            (date(2025, 7, 13), date(2025, 7, 14), ('july',)),
+        ])
+
+        self.assertEqual(
+            self.index.uncovered(date(2025, 7, 30), date(2025, 8, 5)),
+            [date(2025, 8, day) for day in range(1, 5)]
+        )
+        self.assertEqual(IntervalIndex([]).uncovered(date(2025, 1, 1), date(2025, 1, 2)), [date(2025, 1, 1), date(2025, 1, 2)])
+
+    def test_weekday_indexes(self):
+        self.assertEqual(parse_weekday('Monday'), 0)
+        self.assertEqual(parse_weekday('sun'), 6)
+        self.assertIsNone(parse_weekday('someday'))
+
+        indexes = build_weekday_indexes([
+            (date(2025, 7, 1), date(2025, 7, 31), 'Saturday', 2),
+            (date(2025, 7, 1), date(2025, 7, 31), 'someday', 5),
+        ])
+        self.assertEqual(list(indexes), [5])
+        self.assertEqual(indexes[5].at(date(2025, 7, 5)), 2)
+
+    def test_engine_los(self):
+        """The engine resolves the LOS of every date from its weekday's rules."""
+        rules = build_pricing_rules(
+            msp_periods=[(date(2025, 7, 1), date(2025, 7, 31), 80)],
+            los_setups=[
+                (date(2025, 7, 1), date(2025, 7, 31), 'Saturday', 2),
+                # A later rule for the same weekday wins
+                (date(2025, 7, 12), date(2025, 7, 31), 'Saturday', 3),
+                (date(2025, 7, 1), date(2025, 7, 31), 'Friday', 2),
+            ],
+        )
+        start_date = date(2025, 7, 1)  # a Tuesday
+        result = compute_recommended_prices(start_date, np.full(14, np.nan), np.full(14, np.nan), rules, today=start_date)
+
+        expected = [1] * 14
+        expected[3] = expected[10] = 2   # Fridays 4 and 11
+        expected[4] = 2                  # Saturday 5
+        expected[11] = 3                 # Saturday 12
+        self.assertEqual(result['recom_los'].tolist(), expected)
+
+
+class MSPIndexLookupTests(APITestCase):
+    """Test cases for the MSP lookups built on the interval index."""
+
+    def setUp(self):
+        self.user = create_test_user()
+        self.property = create_test_property(user=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.today = date(2025, 7, 1)
+        for valid_from, valid_until, msp in [
+            (self.today, self.today + timedelta(days=9), 80),
+            (self.today + timedelta(days=5), self.today + timedelta(days=6), 120),
+            (self.today + timedelta(days=20), self.today + timedelta(days=29), 90),
+        ]:
+            DpMinimumSellingPrice.objects.create(
+                property_id=self.property, user=self.user, valid_from=valid_from, valid_until=valid_until, msp=msp
+            )
+
+    def test_msp_for_date(self):
+        url = reverse('dynamic_pricing:property-msp-date', kwargs={'property_id': self.property.id})
+
+        response = self.client.get(url, {'date': str(self.today + timedelta(days=5))})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['msp'], 120)
+
+        response = self.client.get(url, {'date': str(self.today + timedelta(days=7))})
+        self.assertEqual(response.data['msp'], 80)
+
+        response = self.client.get(url, {'date': str(self.today + timedelta(days=15))})
+        self.assertEqual(response.status_code, 404)
+
+    def test_msp_for_date_single_msp_query(self):
+        url = reverse('dynamic_pricing:property-msp-date', kwargs={'property_id': self.property.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'date': str(self.today + timedelta(days=6))})
+
+        self.assertEqual(response.data['msp'], 120)
+        table = DpMinimumSellingPrice._meta.db_table
+        self.assertEqual(len([query for query in queries.captured_queries if table in query['sql']]), 1)
+
+    def test_check_range_single_query(self):
+        with self.assertNumQueries(1):
+            has_msp, missing = check_msp_for_date_range(self.property, self.today, self.today + timedelta(days=364))
+
+        self.assertFalse(has_msp)
+        self.assertEqual(len(missing), 365 - 20)
+        self.assertEqual(missing[0], self.today + timedelta(days=10))
+        self.assertEqual(check_msp_for_date_range(self.property, self.today, self.today + timedelta(days=9)), (True, []))
+
+
+class EngineLosLoadTests(TestCase):
+    """The stored LOS setup rules are loaded with the other rule tables."""
+
+    def test_load(self):
+        user = create_test_user()
+        property_instance = create_test_property(user=user)
+        DpLosSetup.objects.create(
+            property_id=property_instance, user=user, valid_from=date(2025, 7, 1), valid_until=date(2025, 7, 31),
+            day_of_week='Saturday', los_value=3
+        )
+
+        rules = load_pricing_rules(property_instance.id)
+        self.assertEqual(rules['los'][5].at(date(2025, 7, 5)), 3)
@@ -0,0 +1,801 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from dynamic_pricing.models import (
+    DpPriceChangeHistory, DpCurrentPriceCalendar, DpPriceChangeHistoryArchive,
+    OverwritePriceHistory, CompetitorPriceMV
+)
+from dynamic_pricing.price_calendar import (
+    get_latest_price_rows,
+    get_latest_price_values,
+    encode_price_history_rows,
+    PRICE_HISTORY_VALUE_FIELDS,
+    refresh_current_price_calendar,
+)
+from dynamic_pricing.price_retention import roll_up_price_history
+from dynamic_pricing.market_bands import build_competitor_price_matrix, compute_price_bands
+from dynamic_pricing.serializers import PriceHistorySerializer
+from test_utils import (
+    create_test_user, create_test_property, create_test_competitor,
+    create_test_property_competitor, create_test_competitor_price, create_test_general_settings,
+    UnmanagedTablesMixin
+)
+
+
+def create_snapshot(property_obj, user, checkin_date, as_of, recom_price=100, **kwargs):
+    """Create a price_change_history snapshot for tests."""
+    defaults = {
+        'occupancy': 0.5,
+        'pms_hotel_id': 'TEST_PMS_ID',
+        'msp': 80,
+        'recom_los': 1,
+        'base_price': 100,
+        'base_price_choice': 'manual',
+    }
+    defaults.update(kwargs)
+    return DpPriceChangeHistory.objects.create(
+        property_id=property_obj,
+        user=user,
+        checkin_date=checkin_date,
+        as_of=as_of,
+        recom_price=recom_price,
+        **defaults
+    )
+
+
+class CurrentPriceCalendarRefreshTests(TestCase):
+    """Test cases for the current price calendar projection."""
+
+    def setUp(self):
+        self.user = create_test_user()
+        self.property = create_test_property(user=self.user)
+        self.base_date = date(2025, 1, 1)
+        self.run_1 = timezone.now() - timedelta(hours=2)
+        self.run_2 = timezone.now() - timedelta(hours=1)
+        for i in range(3):
+            checkin_date = self.base_date + timedelta(days=i)
+            create_snapshot(self.property, self.user, checkin_date, self.run_1, recom_price=100)
+            create_snapshot(self.property, self.user, checkin_date, self.run_2, recom_price=110 + i)
+
+    def test_refresh_keeps_latest_snapshot_per_date(self):
+        """Only the newest as_of per checkin_date is projected."""
+        rows = refresh_current_price_calendar(self.property.id)
+
+        self.assertEqual(rows, 3)
+        projection = DpCurrentPriceCalendar.objects.filter(property_id=self.property).order_by('checkin_date')
+        self.assertEqual([p.recom_price for p in projection], [110, 111, 112])
+        self.assertTrue(all(p.as_of == self.run_2 for p in projection))
+
+    def test_incremental_refresh_reads_only_new_snapshots(self):
+        """A second refresh only touches dates with snapshots past the watermark."""
+        refresh_current_price_calendar(self.property.id)
+        create_snapshot(self.property, self.user, self.base_date, timezone.now(), recom_price=150)
+
+        rows = refresh_current_price_calendar(self.property.id)
+
+        self.assertEqual(rows, 1)
+        self.assertEqual(
+            DpCurrentPriceCalendar.objects.get(property_id=self.property, checkin_date=self.base_date).recom_price,
+            150
+        )
+        self.assertEqual(refresh_current_price_calendar(self.property.id), 0)
+
+    def test_full_refresh_picks_up_late_snapshots(self):
+        """Snapshots older than the watermark are only seen by a full rebuild."""
+        refresh_current_price_calendar(self.property.id)
+        late_date = self.base_date + timedelta(days=10)
+        create_snapshot(self.property, self.user, late_date, self.run_1, recom_price=90)
+
+        self.assertEqual(refresh_current_price_calendar(self.property.id), 0)
+        self.assertEqual(refresh_current_price_calendar(self.property.id, full=True), 4)
+        self.assertTrue(
+            DpCurrentPriceCalendar.objects.filter(property_id=self.property, checkin_date=late_date).exists()
+        )
+
+    def test_latest_rows_overlay_snapshots_past_watermark(self):
+        """Reads combine the projection with snapshots the refresh has not seen yet."""
+        refresh_current_price_calendar(self.property.id)
+        create_snapshot(self.property, self.user, self.base_date, timezone.now(), recom_price=175)
+
+        latest = get_latest_price_rows(self.property.id, self.base_date, self.base_date + timedelta(days=2))
+
+        self.assertEqual(len(latest), 3)
+        self.assertEqual(latest[self.base_date].recom_price, 175)
+        self.assertEqual(latest[self.base_date + timedelta(days=1)].recom_price, 111)
+
+    def test_refresh_command(self):
+        """The management command refreshes every property with history."""
+        out = StringIO()
+        call_command('refresh_price_calendar', stdout=out)
+
+        self.assertIn('Refreshed 3 calendar date(s)', out.getvalue())
+        self.assertEqual(DpCurrentPriceCalendar.objects.filter(property_id=self.property).count(), 3)
+
+
+class PriceHistoryEncoderTests(TestCase):
+    """encode_price_history_rows must match PriceHistorySerializer exactly."""
+
+    def setUp(self):
+        self.user = create_test_user()
+        self.property = create_test_property()
+        self.base_date = date(2025, 6, 1)
+        now = timezone.now()
+        for offset, occupancy in enumerate([None, 0.0, 0.35, 0.5, 1.0, 35.5, 69.0, 70.25, 0.123456]):
+            create_snapshot(
+                self.property, self.user, self.base_date + timedelta(days=offset),
+                now - timedelta(hours=1), recom_price=90 + offset, occupancy=occupancy
+            )
+        # Newer snapshot for the first date, only partly projected
+        create_snapshot(self.property, self.user, self.base_date, now - timedelta(hours=2), recom_price=10)
+        refresh_current_price_calendar(self.property.id)
+        create_snapshot(self.property, self.user, self.base_date + timedelta(days=1), now, recom_price=222)
+
+        OverwritePriceHistory.objects.create(
+            property=self.property, user=self.user, checkin_date=self.base_date + timedelta(days=2), overwrite_price=150
+        )
+        OverwritePriceHistory.objects.create(
+            property=self.property, user=self.user, checkin_date=self.base_date + timedelta(days=3), overwrite_price=None
+        )
+
+    def test_matches_serializer_output(self):
+        """Prices, overwrites and occupancy normalization/levels are identical."""
+        end_date = self.base_date + timedelta(days=10)
+        rows = get_latest_price_rows(self.property.id, self.base_date, end_date)
+        serializer_overwrites = {
+            (o.checkin_date, str(o.property_id)): o.overwrite_price
+            for o in OverwritePriceHistory.objects.filter(property=self.property)
+        }
+        expected = [
+            PriceHistorySerializer(row, context={'overwrites': serializer_overwrites}).data
+            for checkin_date, row in sorted(rows.items())
+        ]
+
+        values = get_latest_price_values(self.property.id, self.base_date, end_date, PRICE_HISTORY_VALUE_FIELDS)
+        overwrites = {
+            o.checkin_date: o.overwrite_price
+            for o in OverwritePriceHistory.objects.filter(property=self.property, overwrite_price__isnull=False)
+        }
+        actual = encode_price_history_rows((values[d] for d in sorted(values)), overwrites)
+
+        self.assertEqual(len(actual), 9)
+        self.assertEqual(actual, [dict(entry) for entry in expected])
+        self.assertEqual(actual[1]['price'], 222)
+        self.assertTrue(actual[2]['overwrite'])
+        self.assertFalse(actual[3]['overwrite'])
+
+    def test_benchmark_command(self):
+        """The benchmark verifies both paths produce the same output."""
+        out = StringIO()
+        call_command('benchmark_pricing', suite=['serializer'], days=20, snapshots=2, repeat=1, stdout=out)
+
+        self.assertIn('output verified identical', out.getvalue())
+
+
+class PriceHistoryProjectionAPITests(APITestCase):
+    """Test cases for calendar views reading the current price calendar."""
+
+    def setUp(self):
+        self.user = create_test_user()
+        self.client.force_authenticate(user=self.user)
+        self.property = create_test_property(user=self.user)
+
+    def test_price_history_month_uses_latest_snapshot(self):
+        """PriceHistoryView returns one entry per date with the newest price."""
+        older = timezone.now() - timedelta(hours=3)
+        newer = timezone.now() - timedelta(hours=1)
+        for i in range(5):
+            checkin_date = date(2025, 3, 1) + timedelta(days=i)
+            create_snapshot(self.property, self.user, checkin_date, older, recom_price=100, msp=70)
+            create_snapshot(self.property, self.user, checkin_date, newer, recom_price=120, msp=75)
+        refresh_current_price_calendar(self.property.id)
+
+        url = reverse('dynamic_pricing:price-history', kwargs={'property_id': self.property.id})
+        response = self.client.get(url, {'year': 2025, 'month': 3})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 5)
+        self.assertTrue(all(entry['price'] == 120 for entry in response.data['price_history']))
+
+        msp_url = reverse('dynamic_pricing:msp-price-history', kwargs={'property_id': self.property.id})
+        msp_response = self.client.get(msp_url, {'year': 2025, 'month': 3})
+        self.assertTrue(all(entry['price'] == 75 for entry in msp_response.data['price_history']))
+
+
+class PriceCalendarAPITests(APITestCase):
+    """Test cases for the unified price calendar endpoint."""
+
+    def setUp(self):
+        self.user = create_test_user()
+        self.client.force_authenticate(user=self.user)
+        self.property = create_test_property(user=self.user)
+        self.url = reverse('dynamic_pricing:price-calendar', kwargs={'property_id': self.property.id})
+        as_of = timezone.now()
+        for i in range(10):
+            create_snapshot(
+                self.property, self.user, date(2025, 2, 1) + timedelta(days=i), as_of,
+                recom_price=100 + i, msp=80, competitor_average=95.5, occupancy=0.8
+            )
+        OverwritePriceHistory.objects.create(
+            property=self.property, user=self.user, checkin_date=date(2025, 2, 2), overwrite_price=250
+        )
+
+    def test_price_calendar_returns_all_series(self):
+        """Each date carries price, MSP, competitor average, occupancy and overwrite."""
+        response = self.client.get(self.url, {'year': 2025, 'month': 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 10)
+        first, second = response.data['calendar'][:2]
+        self.assertEqual(first['price'], 100)
+        self.assertFalse(first['overwrite'])
+        self.assertEqual(first['msp'], 80)
+        self.assertEqual(first['competitor_average'], 95.5)
+        self.assertEqual(first['occupancy'], 80.0)
+        self.assertEqual(first['occupancy_level'], 'high')
+        self.assertEqual(second['price'], 250)
+        self.assertEqual(second['recom_price'], 101)
+        self.assertTrue(second['overwrite'])
+
+    def test_price_calendar_query_count_is_constant(self):
+        """A cold calendar load uses a fixed number of queries regardless of rows."""
+        cache.clear()
+        with self.assertNumQueries(6):
+            self.client.get(self.url, {'year': 2025, 'month': 2})
+
+    def test_price_calendar_denies_foreign_property(self):
+        """Properties of other users are not found."""
+        other_property = create_test_property(user=create_test_user())
+        url = reverse('dynamic_pricing:price-calendar', kwargs={'property_id': other_property.id})
+
+        response = self.client.get(url, {'year': 2025, 'month': 2})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_price_calendar_invalid_month(self):
+        """Invalid month parameters are rejected."""
+        response = self.client.get(self.url, {'year': 2025, 'month': 13})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PriceCalendarExportAPITests(APITestCase):
+    """Test cases for the streaming price calendar export."""
+
+    def setUp(self):
+        self.user = create_test_user()
+        self.client.force_authenticate(user=self.user)
+        self.property = create_test_property(user=self.user)
+        self.url = reverse('dynamic_pricing:price-calendar-export', kwargs={'property_id': self.property.id})
+        self.start_date = date(2025, 1, 1)
+        as_of = timezone.now() - timedelta(hours=1)
+        for i in range(400):
+            create_snapshot(self.property, self.user, self.start_date + timedelta(days=i), as_of, recom_price=100)
+        refresh_current_price_calendar(self.property.id)
+        # A newer run not yet projected, plus an RM overwrite
+        create_snapshot(self.property, self.user, self.start_date + timedelta(days=200), timezone.now(), recom_price=130)
+        OverwritePriceHistory.objects.create(
+            property=self.property, user=self.user, checkin_date=self.start_date + timedelta(days=300), overwrite_price=90
+        )
+
+    def _read_lines(self, response):
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_export_jsonl_full_year(self):
+        """A year-plus range streams one JSON line per date with overlay and overwrites."""
+        import json
+        response = self.client.get(self.url, {'start_date': '2025-01-01', 'end_date': '2026-02-04'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        entries = [json.loads(line) for line in self._read_lines(response)]
+        self.assertEqual(len(entries), 400)
+        self.assertEqual(entries[0]['checkin_date'], '2025-01-01')
+        self.assertEqual(entries[200]['price'], 130)
+        self.assertEqual(entries[300]['price'], 90)
+        self.assertTrue(entries[300]['overwrite'])
+        self.assertEqual(entries[301]['price'], 100)
+
+    def test_export_csv(self):
+        """CSV exports start with a header row."""
+        response = self.client.get(self.url, {'start_date': '2025-01-01', 'end_date': '2025-01-10', 'output': 'csv'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = self._read_lines(response)
+        self.assertEqual(lines[0], 'checkin_date,price,recom_price,overwrite,overwrite_price,msp,competitor_average,occupancy,occupancy_level')
+        self.assertEqual(len(lines), 11)
+
+    def test_export_rejects_oversized_range(self):
+        """Ranges above the export limit are rejected."""
+        response = self.client.get(self.url, {'start_date': '2025-01-01', 'end_date': '2030-01-01'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_rejects_unknown_output(self):
+        """Only jsonl and csv outputs are supported."""
+        response = self.client.get(self.url, {'start_date': '2025-01-01', 'end_date': '2025-01-10', 'output': 'xml'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PriceCalendarCacheTests(APITestCase):
+    """Test cases for the price calendar response cache."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_test_user()
+        self.client.force_authenticate(user=self.user)
+        self.property = create_test_property(user=self.user)
+        self.url = reverse('dynamic_pricing:price-history', kwargs={'property_id': self.property.id})
+        for i in range(5):
+            create_snapshot(self.property, self.user, date(2025, 4, 1) + timedelta(days=i), timezone.now(), recom_price=100)
+        refresh_current_price_calendar(self.property.id)
+
+    def _prices(self):
+        response = self.client.get(self.url, {'year': 2025, 'month': 4})
+        return [entry['price'] for entry in response.data['price_history']]
+
+    def test_cache_hit_skips_price_history_rows(self):
+        """Repeat loads only read the newest as_of, not the price rows."""
+        self._prices()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self._prices(), [100] * 5)
+        history_queries = [query['sql'] for query in queries.captured_queries if 'price_change_history' in query['sql']]
+        self.assertTrue(history_queries)
+        for sql in history_queries:
+            self.assertIn('MAX', sql)
+        executed = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('dpcurrentpricecalendar', executed)
+
+    def test_new_snapshot_invalidates_cache(self):
+        """A snapshot that lands before the next refresh is visible on the next load."""
+        self._prices()
+        create_snapshot(self.property, self.user, date(2025, 4, 3), timezone.now(), recom_price=150)
+
+        self.assertEqual(self._prices()[2], 150)
+
+    def test_overwrite_invalidates_cache(self):
+        """Saving an overwrite price is visible on the next load."""
+        self._prices()
+        overwrite_url = reverse(
+            'dynamic_pricing:overwrite-price',
+            kwargs={'property_id': self.property.id, 'checkin_date': '2025-04-01'}
+        )
+        self.client.patch(overwrite_url, {'overwrite_price': 222}, format='json')
+
+        self.assertEqual(self._prices()[0], 222)
+
+    def test_refresh_invalidates_cache(self):
+        """A refresh that projects new snapshots invalidates cached responses."""
+        self._prices()
+        create_snapshot(self.property, self.user, date(2025, 4, 2), timezone.now(), recom_price=140)
+
+        refresh_current_price_calendar(self.property.id)
+
+        self.assertEqual(self._prices()[1], 140)
+
+
+class ConditionalGetTests(UnmanagedTablesMixin, APITestCase):
+    """Test cases for ETag / If-None-Match on calendar and competitor endpoints."""
+    unmanaged_models = [CompetitorPriceMV]
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_test_user()
+        self.client.force_authenticate(user=self.user)
+        self.property = create_test_property(user=self.user)
+        for i in range(7):
+            create_snapshot(self.property, self.user, date(2025, 5, 1) + timedelta(days=i), timezone.now())
+        self.competitor = create_test_competitor('Hotel X')
+        create_test_property_competitor(self.property, user=self.user, competitor=self.competitor)
+        create_test_competitor_price(self.competitor, date(2025, 5, 1), 80)
+
+    def test_price_history_range_not_modified(self):
+        """A matching If-None-Match gets an empty 304 until an overwrite is saved."""
+        url = reverse('dynamic_pricing:price-history-range', kwargs={'property_id': self.property.id})
+        params = {'start_date': '2025-05-01', 'end_date': '2025-05-07'}
+        etag = self.client.get(url, params)['ETag']
+
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        overwrite_url = reverse(
+            'dynamic_pricing:overwrite-price',
+            kwargs={'property_id': self.property.id, 'checkin_date': '2025-05-03'}
+        )
+        self.client.patch(overwrite_url, {'overwrite_price': 150}, format='json')
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_price_history_month_new_snapshot_changes_etag(self):
+        """A newly projected as_of snapshot changes the month validator."""
+        url = reverse('dynamic_pricing:price-history', kwargs={'property_id': self.property.id})
+        params = {'year': 2025, 'month': 5}
+        etag = self.client.get(url, params)['ETag']
+        self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        create_snapshot(self.property, self.user, date(2025, 5, 2), timezone.now() + timedelta(minutes=1))
+        refresh_current_price_calendar(self.property.id)
+
+        self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_price_history_direct_overwrite_changes_etag(self):
+        """Writes that bypass the views (no cache invalidation) still change the validator."""
+        url = reverse('dynamic_pricing:price-history', kwargs={'property_id': self.property.id})
+        params = {'year': 2025, 'month': 5}
+        etag = self.client.get(url, params)['ETag']
+
+        OverwritePriceHistory.objects.create(
+            property=self.property, user=self.user, checkin_date=date(2025, 5, 4), overwrite_price=175
+        )
+
+        self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_price_history_range_overwrite_of_existing_date_changes_etag(self):
+        """Overwriting a date that already has an overwrite through the range endpoint changes the validator."""
+        OverwritePriceHistory.objects.create(
+            property=self.property, user=self.user, checkin_date=date(2025, 5, 3), overwrite_price=150
+        )
+        OverwritePriceHistory.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        url = reverse('dynamic_pricing:price-history-range', kwargs={'property_id': self.property.id})
+        params = {'start_date': '2025-05-01', 'end_date': '2025-05-07'}
+        etag = self.client.get(url, params)['ETag']
+
+        response = self.client.post(
+            reverse('dynamic_pricing:overwrite-price-range', kwargs={'property_id': self.property.id}),
+            {'start_date': '2025-05-03', 'end_date': '2025-05-03', 'overwrite_price': 175}, format='json'
+        )
+        self.assertEqual(len(response.data['updated']), 1)
+
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_competitor_weekly_chart_not_modified(self):
+        """The weekly chart revalidates against the newest scrape update."""
+        url = reverse('dynamic_pricing:competitor-prices-weekly-chart', kwargs={'property_id': self.property.id})
+        params = {'start_date': '2025-05-01'}
+        etag = self.client.get(url, params)['ETag']
+        self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        create_test_competitor_price(self.competitor, date(2025, 5, 2), 85, update_tz=timezone.now() + timedelta(minutes=1))
+
+        self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_competitor_prices_for_date_not_modified(self):
+        """Competitor prices for a date answer 304 when unchanged."""
+        url = reverse('dynamic_pricing:competitor-prices-for-date', kwargs={'property_id': self.property.id})
+        params = {'date': '2025-05-01'}
+        response = self.client.get(url, params)
+        self.assertEqual(response.data[0]['price'], 80)
+
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class ColumnarFormatTests(UnmanagedTablesMixin, APITestCase):
+    """Test cases for the opt-in ?format=columnar calendar responses."""
+    unmanaged_models = [CompetitorPriceMV]
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_test_user()
+        self.client.force_authenticate(user=self.user)
+        self.property = create_test_property(user=self.user)
+        for i in range(28):
+            create_snapshot(
+                self.property, self.user, date(2025, 2, 1) + timedelta(days=i), timezone.now(),
+                recom_price=100 + i, occupancy=0.1 if i % 2 else 0.9
+            )
+        OverwritePriceHistory.objects.create(
+            property=self.property, user=self.user, checkin_date=date(2025, 2, 3), overwrite_price=150
+        )
+        self.competitor = create_test_competitor('Hotel X')
+        create_test_property_competitor(self.property, user=self.user, competitor=self.competitor)
+        create_test_competitor_price(self.competitor, date(2025, 2, 4), '89.99')
+
+    def test_price_history_month_columnar(self):
+        """Parallel arrays carry the same data as the per-day objects, in fewer bytes."""
+        url = reverse('dynamic_pricing:price-history', kwargs={'property_id': self.property.id})
+        rows = self.client.get(url, {'year': 2025, 'month': 2})
+        response = self.client.get(url, {'year': 2025, 'month': 2, 'format': 'columnar'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.data['format'], 'columnar')
+        columns = response.data['price_history']
+        self.assertEqual(columns['start_date'], '2025-02-01')
+        self.assertEqual(columns['day_offsets'], list(range(28)))
+        self.assertEqual(columns['prices'], [entry['price'] for entry in rows.data['price_history']])
+        self.assertEqual(columns['prices'][2], 150)
+        self.assertEqual(columns['overwrites'][2], 1)
+        self.assertEqual(columns['occupancy_levels'][:2], [2, 0])
+        self.assertEqual(columns['occupancy_level_codes'], ['low', 'medium', 'high'])
+        self.assertLess(len(response.content) * 2, len(rows.content))
+        self.assertNotEqual(response['ETag'], rows['ETag'])
+
+    def test_price_history_range_columnar(self):
+        """The date range endpoint keeps its summary fields in columnar mode."""
+        url = reverse('dynamic_pricing:price-history-range', kwargs={'property_id': self.property.id})
+        response = self.client.get(url, {'start_date': '2025-02-10', 'end_date': '2025-02-12', 'format': 'columnar'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['price_history']['start_date'], '2025-02-10')
+        self.assertEqual(response.data['price_history']['prices'], [109, 110, 111])
+
+    def test_competitor_weekly_chart_columnar(self):
+        """Competitor prices are sent as integer cents per competitor row."""
+        url = reverse('dynamic_pricing:competitor-prices-weekly-chart', kwargs={'property_id': self.property.id})
+        response = self.client.get(url, {'start_date': '2025-02-03', 'format': 'columnar'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['day_offsets'], list(range(7)))
+        self.assertEqual(response.data['competitor_names'], ['Hotel X'])
+        self.assertEqual(response.data['prices'], [[None, 8999, None, None, None, None, None]])
+        self.assertEqual(response.data['sold_out'], [[0] * 7])
+
+    def test_default_format_unchanged(self):
+        """Without the opt-in, responses keep the per-day object shape."""
+        url = reverse('dynamic_pricing:price-history', kwargs={'property_id': self.property.id})
+        response = self.client.get(url, {'year': 2025, 'month': 2})
+
+        self.assertNotIn('format', response.data)
+        self.assertEqual(response.data['price_history'][0]['checkin_date'], '2025-02-01')
+
+
+class PriceTimelineAPITests(APITestCase):
+    """Test cases for the delta-encoded, keyset-paginated price timeline."""
+
+    def setUp(self):
+        self.user = create_test_user()
+        self.client.force_authenticate(user=self.user)
+        self.property = create_test_property(user=self.user)
+        self.url = reverse('dynamic_pricing:price-history-timeline', kwargs={'property_id': self.property.id})
+        self.first_run = timezone.now() - timedelta(days=10)
+        # 2025-03-01: price changes on run 1, nothing changes on run 2, MSP changes on run 3
+        for run, (price, msp) in enumerate([(100, 80), (120, 80), (120, 80), (120, 90)]):
+            create_snapshot(
+                self.property, self.user, date(2025, 3, 1), self.first_run + timedelta(days=run),
+                recom_price=price, msp=msp, competitor_average=110.0
+            )
+        create_snapshot(self.property, self.user, date(2025, 3, 2), self.first_run, recom_price=130)
+
+    def test_delta_encoding(self):
+        """Snapshots come newest first; the oldest carries every field, later ones only what changed."""
+        response = self.client.get(self.url, {'start_date': '2025-03-01'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timeline = response.data['timeline']
+        self.assertEqual([entry['changes'] for entry in timeline], [
+            {'msp': 90},
+            {'recom_price': 120},
+            {'recom_price': 100, 'msp': 80, 'occupancy': 50.0, 'competitor_average': 110.0},
+        ])
+        self.assertIsNone(response.data['next_cursor'])
+
+    def test_keyset_pagination(self):
+        """Pages continue from the cursor and keep delta state across page boundaries."""
+        params = {'start_date': '2025-03-01', 'end_date': '2025-03-02', 'limit': 2}
+        first = self.client.get(self.url, params)
+        # Run 3 only emits the MSP change, run 2 (no change) is skipped
+        self.assertEqual([entry['changes'] for entry in first.data['timeline']], [{'msp': 90}])
+        self.assertIsNotNone(first.data['next_cursor'])
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(self.url, {**params, 'cursor': first.data['next_cursor']})
+        self.assertFalse(any('OFFSET' in query['sql'] for query in queries.captured_queries))
+
+        self.assertEqual(second.data['timeline'][0]['changes'], {'recom_price': 120})
+        self.assertEqual(second.data['timeline'][1]['changes']['recom_price'], 100)
+        third = self.client.get(self.url, {**params, 'cursor': second.data['next_cursor']})
+        self.assertEqual(third.data['timeline'][0]['checkin_date'], '2025-03-02')
+        self.assertEqual(third.data['timeline'][0]['changes']['recom_price'], 130)
+        self.assertIsNone(third.data['next_cursor'])
+
+    def test_invalid_cursor(self):
+        """Malformed cursors are rejected."""
+        response = self.client.get(self.url, {'start_date': '2025-03-01', 'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RollUpPriceHistoryTests(TestCase):
+    """Test cases for the price_change_history retention roll-up."""
+
+    def setUp(self):
+        self.user = create_test_user()
+        self.property = create_test_property(user=self.user)
+        self.checkin_date = date(2025, 8, 1)
+        old_day = (timezone.now() - timedelta(days=120)).replace(hour=0, minute=0, second=0, microsecond=0)
+        # Three runs on one old day, two on the next old day, two recent runs
+        self.old_runs = [old_day + timedelta(hours=h) for h in (6, 12, 18)]
+        self.old_runs += [old_day + timedelta(days=1, hours=h) for h in (6, 18)]
+        self.recent_runs = [timezone.now() - timedelta(hours=h) for h in (2, 1)]
+        for i, as_of in enumerate(self.old_runs + self.recent_runs):
+            create_snapshot(self.property, self.user, self.checkin_date, as_of, recom_price=100 + i)
+
+    def test_rolls_up_to_last_snapshot_per_day(self):
+        """Old days keep only their last as_of; superseded rows move to the archive."""
+        out = StringIO()
+        call_command('roll_up_price_history', days=90, batch_size=2, stdout=out)
+
+        remaining = list(
+            DpPriceChangeHistory.objects.filter(property_id=self.property).order_by('as_of').values_list('as_of', flat=True)
+        )
+        self.assertEqual(remaining, [self.old_runs[2], self.old_runs[4]] + self.recent_runs)
+        archived = set(DpPriceChangeHistoryArchive.objects.values_list('as_of', flat=True))
+        self.assertEqual(archived, {self.old_runs[0], self.old_runs[1], self.old_runs[3]})
+        self.assertIn('Reclaimed 3 of 5 snapshot(s)', out.getvalue())
+
+    def test_reads_in_bounded_batches(self):
+        """Snapshots are read in LIMITed keyset batches, never all at once."""
+        with CaptureQueriesContext(connection) as queries:
+            stats = roll_up_price_history(self.property.id, timezone.now() - timedelta(days=90), batch_size=2)
+
+        self.assertEqual(stats, {'scanned': 5, 'kept': 2, 'archived': 3})
+        reads = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and 'ORDER BY' in query['sql'] and 'price_change_history' in query['sql']
+        ]
+        self.assertEqual(len(reads), 3)
+        for sql in reads:
+            self.assertIn('LIMIT 2', sql)
+
+    def test_dry_run_moves_nothing(self):
+        """--dry-run only reports the rows that would be reclaimed."""
+        out = StringIO()
+        call_command('roll_up_price_history', days=90, dry_run=True, stdout=out)
+
+        self.assertEqual(DpPriceChangeHistory.objects.count(), 7)
+        self.assertFalse(DpPriceChangeHistoryArchive.objects.exists())
+        self.assertIn('Would reclaim 3 of 5 snapshot(s)', out.getvalue())
+
+
+class PriceCalendarAsOfAPITests(APITestCase):
+    """Test cases for reconstructing the calendar as of a past timestamp."""
+
+    def setUp(self):
+        self.user = create_test_user()
+        self.client.force_authenticate(user=self.user)
+        self.property = create_test_property(user=self.user)
+        self.url = reverse('dynamic_pricing:price-calendar-as-of', kwargs={'property_id': self.property.id})
+        self.runs = [timezone.now() - timedelta(days=d) for d in (3, 2, 1)]
+        for run, as_of in enumerate(self.runs):
+            create_snapshot(self.property, self.user, date(2025, 4, 1), as_of, recom_price=100 + run)
+        create_snapshot(self.property, self.user, date(2025, 4, 2), self.runs[2], recom_price=200)
+        refresh_current_price_calendar(self.property.id)
+
+    def test_calendar_as_of_past_timestamp(self):
+        """Each date uses the latest snapshot at or before as_of; later dates are absent."""
+        as_of = self.runs[1] + timedelta(hours=1)
+        response = self.client.get(self.url, {'as_of': as_of.isoformat(), 'year': 2025, 'month': 4})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        entry = response.data['calendar'][0]
+        self.assertEqual(entry['checkin_date'], '2025-04-01')
+        self.assertEqual(entry['recom_price'], 101)
+        self.assertEqual(entry['snapshot_as_of'], self.runs[1].isoformat())
+
+    def test_overwrites_after_as_of_are_ignored(self):
+        """Overwrites saved after the requested timestamp are not applied."""
+        OverwritePriceHistory.objects.create(
+            property=self.property, user=self.user, checkin_date=date(2025, 4, 1), overwrite_price=150
+        )
+        response = self.client.get(self.url, {'as_of': self.runs[2].isoformat(), 'year': 2025, 'month': 4})
+
+        self.assertEqual(response.data['count'], 2)
+        self.assertFalse(response.data['calendar'][0]['overwrite'])
+        self.assertEqual(response.data['calendar'][0]['price'], 102)
+
+    def test_calendar_as_of_rolled_up_snapshot(self):
+        """Snapshots moved to the archive by the roll-up are still reconstructed."""
+        old_day = (timezone.now() - timedelta(days=120)).replace(hour=0, minute=0, second=0, microsecond=0)
+        morning, evening = old_day + timedelta(hours=6), old_day + timedelta(hours=18)
+        create_snapshot(self.property, self.user, date(2025, 4, 3), morning, recom_price=300)
+        create_snapshot(self.property, self.user, date(2025, 4, 3), evening, recom_price=310)
+        roll_up_price_history(self.property.id, timezone.now() - timedelta(days=90))
+        self.assertTrue(DpPriceChangeHistoryArchive.objects.filter(as_of=morning).exists())
+
+        response = self.client.get(self.url, {'as_of': (morning + timedelta(hours=1)).isoformat(), 'year': 2025, 'month': 4})
+
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['calendar'][0]['recom_price'], 300)
+        self.assertEqual(response.data['calendar'][0]['snapshot_as_of'], morning.isoformat())
+
+    def test_as_of_required(self):
+        """as_of must be a valid ISO datetime."""
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'as_of': 'yesterday'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_benchmark_command(self):
+        """The as_of benchmark rolls back its synthetic rows and verifies results."""
+        out = StringIO()
+        call_command('benchmark_pricing', suite=['as_of'], days=5, snapshots=20, repeat=1, stdout=out)
+
+        self.assertIn('output verified identical', out.getvalue())
+        self.assertEqual(DpPriceChangeHistory.objects.count(), 4)
+
+
+class MarketBandsTests(UnmanagedTablesMixin, APITestCase):
+    """Test cases for the market positioning bands."""
+    unmanaged_models = [CompetitorPriceMV]
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_test_user()
+        self.client.force_authenticate(user=self.user)
+        self.property = create_test_property(user=self.user)
+        create_test_general_settings(self.property, user=self.user, min_competitors=2)
+        self.checkin_date = date(2025, 3, 1)
+        for name, price in (('A', 100), ('B', 120), ('C', 140), ('D', 160)):
+            competitor = create_test_competitor(f'Hotel {name}')
+            create_test_property_competitor(self.property, user=self.user, competitor=competitor)
+            create_test_competitor_price(competitor, self.checkin_date, price)
+            # Only the lowest room of the day counts
+            create_test_competitor_price(competitor, self.checkin_date, price + 50)
+        lonely = create_test_competitor('Hotel E')
+        create_test_property_competitor(self.property, user=self.user, competitor=lonely)
+        create_test_competitor_price(lonely, self.checkin_date + timedelta(days=1), 90)
+        create_snapshot(self.property, self.user, self.checkin_date, timezone.now(), recom_price=130)
+        self.url = reverse('dynamic_pricing:market-positioning-bands', kwargs={'property_id': self.property.id})
+
+    def test_percentiles_match_numpy(self):
+        """Bands use linear interpolation like numpy.percentile and ignore missing prices."""
+        rows = [(1, self.checkin_date, 100), (1, self.checkin_date, 90), (2, self.checkin_date, 130), (3, self.checkin_date, 0)]
+        matrix = build_competitor_price_matrix([1, 2, 3], self.checkin_date, 2, rows)
+        bands, counts = compute_price_bands(matrix)
+
+        self.assertEqual(counts.tolist(), [2, 0])
+        self.assertEqual(bands[:, 0].tolist(), [100.0, 110.0, 120.0])
+
+    def test_bands_endpoint(self):
+        """Each date reports its bands and where recom_price sits in them."""
+        response = self.client.get(self.url, {'start_date': '2025-03-01', 'end_date': '2025-03-03'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first, second, third = response.data['bands']
+        self.assertEqual(first, {
+            'checkin_date': '2025-03-01', 'p25': 115.0, 'p50': 130.0, 'p75': 145.0, 'competitors': 4,
+            'recom_price': 130.0, 'position_pct': 50.0, 'band': 'p50_p75',
+        })
+        # Fewer priced competitors than min_competitors: no band
+        self.assertEqual(second['competitors'], 1)
+        self.assertIsNone(second['p50'])
+        self.assertIsNone(third['band'])
+
+    def test_calendar_overlay(self):
+        """The price calendar includes the bands on request."""
+        url = reverse('dynamic_pricing:price-calendar', kwargs={'property_id': self.property.id})
+        response = self.client.get(url, {'year': 2025, 'month': 3})
+        self.assertNotIn('market_bands', response.data)
+
+        response = self.client.get(url, {'year': 2025, 'month': 3, 'include': 'market_bands'})
+        self.assertEqual(len(response.data['market_bands']), 31)
+        self.assertEqual(response.data['market_bands'][0]['p50'], 130.0)
+
+    def test_invalid_range(self):
+        """Reversed and oversized ranges are rejected."""
+        response = self.client.get(self.url, {'start_date': '2025-03-05', 'end_date': '2025-03-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'start_date': '2025-01-01', 'end_date': '2027-06-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_benchmark_suite(self):
+        """The bands benchmark verifies NumPy against the per-date loop."""
+        out = StringIO()
+        call_command('benchmark_pricing', suite=['bands'], days=20, competitors=5, repeat=1, stdout=out)
+
+        self.assertIn('output verified identical', out.getvalue())
@@ -0,0 +1,431 @@
+from datetime import date, timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from dynamic_pricing.models import (
+    DpCurrentPriceCalendar, DpDailyMarketAggregate, DpDynamicIncrementsV2, DpMinimumSellingPrice, DpOfferIncrements,
+    DpPriceChangeHistory, DpRoomRates
+)
+from dynamic_pricing.increment_matrix import (
+    INCREMENT_MATRIX_CACHE_TIMEOUT, IncrementMatrix, clear_increment_matrix_cache, get_increment_matrix
+)
+from dynamic_pricing.pricing_engine import (
+    INCREMENT_ADDITIONAL, INCREMENT_PERCENTAGE, apply_rule_changes, build_pricing_rules,
+    build_recommendation_rows, compute_recommended_prices, load_pricing_rules, recommend_prices,
+    rules_from_rows
+)
+from test_utils import create_test_user, create_test_property, create_test_general_settings
+
+
+class PricingEngineComputeTests(SimpleTestCase):
+    """Test cases for the vectorized price computation (no database)."""
+
+    def setUp(self):
+        self.start_date = date(2025, 7, 1)
+        self.rules = build_pricing_rules(
+            settings={'min_competitors': 2},
+            increments=[
+                ('30-50', '3-7', 'Additional', 10),
+                ('90-100', '0-1', 'Percentage', 20),
+            ],
+            msp_periods=[
+                (date(2025, 6, 1), date(2025, 7, 31), 80),
+                # A later period overrides the overlapping dates
+                (date(2025, 7, 5), date(2025, 7, 5), 120),
+            ],
+            offers=[
+                (date(2025, 7, 1), date(2025, 7, 10), 5, 3, 'Percentage', -10),
+                (date(2025, 7, 3), date(2025, 7, 3), None, None, 'Additional', -5),
+            ],
+            room_rates=[
+                ('BAR', True, 'Percentage', 0),
+                ('NRF', False, 'Percentage', -10),
+                ('BB', False, 'Additional', 15),
+            ],
+        )
+
+    def test_increment_matrix(self):
+        """Category strings are compiled once into percentage and additional cells."""
+        matrix = IncrementMatrix.compile([('30-50', '3-7', 'Additional', 10), ('100+', '60+', 'Percentage', 5)]).to_planes()
+
+        self.assertEqual(matrix.shape, (2, 7, 8))
+        self.assertEqual(matrix[INCREMENT_ADDITIONAL, 1, 2], 10)
+        self.assertEqual(matrix[INCREMENT_PERCENTAGE, 6, 7], 5)
+        self.assertEqual(np.count_nonzero(matrix), 2)
+
+    def test_pipeline(self):
+        """Base price, dynamic increment, offers, MSP floor and rate increments per date."""
+        occupancy = np.array([0.95, np.nan, 50.0, 0.3, 30.0])
+        market_price = np.array([100.0, np.nan, 100.0, 100.0, 100.0])
+
+        result = compute_recommended_prices(self.start_date, occupancy, market_price, self.rules, today=self.start_date)
+
+        # Day 0: 90-100% at lead 0 -> +20%, no offer (lead 0 < applied_until 3)
+        # Day 1: no market price -> MSP base, unknown occupancy -> no increment
+        # Day 2: 50% is '50-70' (no cell), lead 2 is '1-3'; -5 additional offer only (lead 2 < 3)
+        # Day 3: 30% is '30-50', lead 3 is '3-7' -> +10, then the -10% offer
+        # Day 4: same cell and offer, but floored at the 120 MSP
+        self.assertEqual(result['recom_price'].tolist(), [120, 80, 95, 99, 120])
+        self.assertEqual(result['base_is_competitor'].tolist(), [True, False, True, True, True])
+        self.assertEqual(result['dynamic_increment'].tolist(), [20, 0, 0, 10, 10])
+        self.assertEqual(result['offer_increment'][3], -11)
+        self.assertEqual(result['rate_prices'].tolist(), [[108, 72, 86, 89, 108], [135, 95, 110, 114, 135]])
+
+        rows = build_recommendation_rows(self.start_date, result, self.rules)
+        self.assertEqual(rows[1]['base_price_choice'], 'manual')
+        self.assertEqual(rows[1]['rates'], {'NRF': 72, 'BB': 95})
+        self.assertEqual(rows[3]['occupancy'], 30.0)
+
+    def test_no_base_price(self):
+        """Dates without market price and MSP have no recommendation."""
+        start_date = date(2025, 9, 1)
+        result = compute_recommended_prices(start_date, np.array([0.5]), np.array([np.nan]), self.rules, today=start_date)
+
+        self.assertTrue(np.isnan(result['recom_price'][0]))
+        self.assertIsNone(build_recommendation_rows(start_date, result, self.rules)[0]['recom_price'])
+
+
+def create_pricing_fixture(test):
+    """Property with one rule of each kind and market data for today, day 70 and day 71."""
+    test.user = create_test_user()
+    test.property = create_test_property(user=test.user)
+    create_test_general_settings(test.property, user=test.user, min_competitors=2, comp_price_calculation='avg', future_days_to_price=90)
+    test.today = timezone.now().date()
+    test.increment = DpDynamicIncrementsV2.objects.create(
+        property_id=test.property, user=test.user, occupancy_category='50-70', lead_time_category='60+',
+        increment_type='Percentage', increment_value=10
+    )
+    DpMinimumSellingPrice.objects.create(
+        property_id=test.property, user=test.user, valid_from=test.today, valid_until=test.today + timedelta(days=365), msp=70
+    )
+    test.offer = DpOfferIncrements.objects.create(
+        property_id=test.property, user=test.user, valid_from=test.today, valid_until=test.today, increment_value=-5
+    )
+    DpRoomRates.objects.create(property_id=test.property, user=test.user, rate_id='NRF', increment_value=-10)
+    for offset, (avg_price, priced) in {0: (100, 3), 70: (150, 2), 71: (150, 1)}.items():
+        DpDailyMarketAggregate.objects.create(
+            property_id=test.property, checkin_date=test.today + timedelta(days=offset), min_price=90,
+            avg_price=avg_price, priced_competitors=priced, source_update_tz=timezone.now()
+        )
+    DpPriceChangeHistory.objects.create(
+        property_id=test.property, user=test.user, checkin_date=test.today + timedelta(days=70),
+        as_of=timezone.now(), occupancy=0.6, pms_hotel_id='TEST_PMS_ID', msp=70, recom_price=100,
+        recom_los=1, base_price=100, base_price_choice='manual'
+    )
+
+
+class PricingEngineLoadTests(TestCase):
+    """Test cases for loading a property's rules and inputs."""
+
+    def setUp(self):
+        cache.clear()
+        clear_increment_matrix_cache()
+        create_pricing_fixture(self)
+
+    def test_recommend_prices(self):
+        """The whole horizon is priced from the stored rules with a fixed number of queries."""
+        # The increments come from the compiled matrix cache once warm
+        get_increment_matrix(self.property.id)
+        with CaptureQueriesContext(connection) as queries:
+            start_date, result = recommend_prices(self.property.id)
+        query_count = len(queries.captured_queries)
+
+        self.assertEqual(start_date, self.today)
+        self.assertEqual(len(result['recom_price']), 90)
+        # Today: avg market price with the -5 offer
+        self.assertEqual(result['recom_price'][0], 95)
+        # Day 70: 60% occupancy at 60+ days -> +10%
+        self.assertEqual(result['recom_price'][70], 165)
+        # Day 71: too few priced competitors -> MSP
+        self.assertEqual(result['recom_price'][71], 70)
+        self.assertEqual(result['rate_prices'][0, 70], 148)
+
+        with CaptureQueriesContext(connection) as queries:
+            recommend_prices(self.property.id, days=365)
+        self.assertEqual(len(queries.captured_queries), query_count)
+
+
+class RuleChangesTests(SimpleTestCase):
+    """Test cases for overlaying unsaved rule changes on stored rule rows."""
+
+    def setUp(self):
+        self.rows = {
+            'settings': {},
+            'increments': [
+                {'id': 1, 'occupancy_category': '50-70', 'lead_time_category': '60+', 'increment_type': 'Percentage', 'increment_value': 10},
+            ],
+            'msp_periods': [
+                {'id': 4, 'valid_from': date(2025, 7, 1), 'valid_until': date(2025, 7, 31), 'msp': 80},
+            ],
+            'offers': [],
+            'room_rates': [],
+            'los_setups': [],
+        }
+
+    def test_update_add_delete(self):
+        rows = apply_rule_changes(self.rows, {
+            'increments': [{'occupancy_category': '50-70', 'lead_time_category': '60+', 'increment_type': 'Additional', 'increment_value': 7}],
+            'msp_periods': [
+                {'id': 4, 'msp': 90},
+                {'valid_from': date(2025, 7, 1), 'valid_until': date(2025, 7, 2), 'msp': 100},
+            ],
+        })
+
+        # A new rule for a stored cell replaces it
+        self.assertEqual([row['increment_value'] for row in rows['increments']], [7])
+        self.assertEqual([row['msp'] for row in rows['msp_periods']], [90, 100])
+        # The stored rows are left untouched
+        self.assertEqual(self.rows['msp_periods'][0]['msp'], 80)
+
+        # Same valid_from: the unsaved period wins over the stored one
+        rules = rules_from_rows(rows)
+        self.assertEqual(rules['msp_periods'].at(date(2025, 7, 1)), 100)
+        self.assertEqual(rules['msp_periods'].at(date(2025, 7, 3)), 90)
+
+        rows = apply_rule_changes(self.rows, {'msp_periods': [{'id': 4, 'delete': True}]})
+        self.assertEqual(rows['msp_periods'], [])
+
+    def test_unknown_id(self):
+        with self.assertRaises(ValueError):
+            apply_rule_changes(self.rows, {'offers': [{'id': 99, 'increment_value': 5}]})
+
+
+class SimulatePricingAPITests(APITestCase):
+    """Test cases for the what-if pricing simulation endpoint."""
+
+    def setUp(self):
+        create_pricing_fixture(self)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('dynamic_pricing:pricing-simulate', kwargs={'property_id': self.property.id})
+
+    def test_simulate(self):
+        """Old and new prices per date, without writing anything."""
+        payload = {
+            'increments': [{'id': self.increment.id, 'increment_value': 20}],
+            'offers': [{'id': self.offer.id, 'delete': True}],
+            'msp_periods': [{
+                'valid_from': str(self.today + timedelta(days=71)),
+                'valid_until': str(self.today + timedelta(days=71)),
+                'msp': 200,
+            }],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        statements = [query['sql'].split()[0].upper() for query in queries.captured_queries]
+        self.assertFalse({'INSERT', 'UPDATE', 'DELETE'} & set(statements))
+
+        prices = response.data['prices']
+        self.assertEqual(len(prices), 365)
+        self.assertEqual(prices[0], {'checkin_date': str(self.today), 'old_price': 95, 'new_price': 100, 'delta': 5})
+        self.assertEqual(prices[70]['old_price'], 165)
+        self.assertEqual(prices[70]['new_price'], 180)
+        self.assertEqual(prices[71]['delta'], 130)
+        self.assertEqual(response.data['summary']['changed_dates'], 3)
+        self.assertEqual(response.data['summary']['max_delta'], 130)
+        self.assertEqual(DpOfferIncrements.objects.filter(property_id=self.property).count(), 1)
+        self.assertEqual(DpDynamicIncrementsV2.objects.get(id=self.increment.id).increment_value, 10)
+
+    def test_query_count_independent_of_horizon(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, {'days': 30}, format='json')
+        query_count = len(queries.captured_queries)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'days': 731}, format='json')
+        self.assertEqual(len(response.data['prices']), 731)
+        self.assertEqual(len(queries.captured_queries), query_count)
+
+    def test_invalid_changes(self):
+        response = self.client.post(self.url, {'offers': [{'id': 999999, 'increment_value': 5}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        # A new rule needs its cell and value
+        response = self.client.post(self.url, {'increments': [{'increment_value': 5}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_other_users_property(self):
+        self.client.force_authenticate(user=create_test_user())
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class RepricePortfolioCommandTests(TestCase):
+    """Test cases for the portfolio batch repricing command."""
+
+    def setUp(self):
+        create_pricing_fixture(self)
+        self.inactive = create_test_property(user=self.user, is_active=False)
+
+    def test_reprice(self):
+        """Each active property gets one row per priced date, matching the engine."""
+        start_date, expected = recommend_prices(self.property.id)
+        out = StringIO()
+        call_command('reprice_portfolio', workers=1, stdout=out)
+
+        self.assertIn('90 property-days', out.getvalue())
+        self.assertIn('property-days/s', out.getvalue())
+        rows = (
+            DpPriceChangeHistory.objects
+            .filter(property_id=self.property)
+            .exclude(base_price_choice='manual', recom_price=100)
+            .order_by('checkin_date')
+        )
+        self.assertEqual(len(rows), 90)
+        self.assertEqual(len({row.as_of for row in rows}), 1)
+        self.assertEqual([row.recom_price for row in rows], expected['recom_price'].astype(int).tolist())
+        self.assertEqual(rows[0].user_id, self.user.id)
+        self.assertEqual(rows[0].pms_hotel_id, self.property.pms_hotel_id or '')
+        self.assertFalse(DpPriceChangeHistory.objects.filter(property_id=self.inactive).exists())
+
+    def test_future_start_date_counts_lead_times_from_today(self):
+        """Lead times count from today, so a later --start-date prices like the engine does."""
+        start_date = self.today + timedelta(days=65)
+        _, expected = recommend_prices(self.property.id, start_date=start_date, days=10)
+        call_command('reprice_portfolio', workers=1, days=10, start_date=start_date.isoformat(), stdout=StringIO())
+
+        rows = DpPriceChangeHistory.objects.filter(property_id=self.property, checkin_date__gte=start_date)
+        prices = {row.checkin_date: row.recom_price for row in rows.exclude(base_price_choice='manual', recom_price=100)}
+        # Day 70 is 70 days out: the 10% '50-70' x '60+' increment applies
+        self.assertEqual(prices[self.today + timedelta(days=70)], 165)
+        self.assertEqual([prices[day] for day in sorted(prices)], expected['recom_price'].astype(int).tolist())
+
+    def test_run_refreshes_price_calendar(self):
+        """A run is visible in the current price calendar projection right away."""
+        call_command('reprice_portfolio', workers=1, days=30, stdout=StringIO())
+
+        run_as_of = DpPriceChangeHistory.objects.filter(property_id=self.property).latest('as_of').as_of
+        projected = DpCurrentPriceCalendar.objects.filter(
+            property_id=self.property, checkin_date__lt=self.today + timedelta(days=30)
+        )
+        self.assertEqual(projected.count(), 30)
+        self.assertEqual(set(projected.values_list('as_of', flat=True)), {run_as_of})
+
+    def test_dry_run(self):
+        out = StringIO()
+        call_command('reprice_portfolio', workers=1, days=30, dry_run=True, stdout=out)
+
+        self.assertIn('Would write 30', out.getvalue())
+        self.assertEqual(DpPriceChangeHistory.objects.filter(property_id=self.property).count(), 1)
+
+
+class IncrementMatrixTests(SimpleTestCase):
+    """Test cases for the compiled increment matrix lookups."""
+
+    def setUp(self):
+        self.rows = [
+            ('30-50', '3-7', 'Additional', 10),
+            ('90-100', '0-1', 'Percentage', 20),
+            ('100+', '60+', 'Percentage', 0),
+            ('unknown', '60+', 'Additional', 99),
+        ]
+        self.matrix = IncrementMatrix.compile(self.rows)
+
+    def test_lookup(self):
+        # Bins are lower-inclusive, like the engine: 30% is '30-50', 3 days is '3-7'
+        self.assertEqual(self.matrix.lookup(30, 3), ('Additional', 10.0))
+        self.assertEqual(self.matrix.lookup(0.95, 0), ('Percentage', 20.0))
+        self.assertEqual(self.matrix.lookup(29.9, 3), ('Additional', 0.0))
+        self.assertEqual(self.matrix.category('100+', '60+'), ('Percentage', 0.0))
+        with self.assertRaises(KeyError):
+            self.matrix.category('unknown', '60+')
+
+    def test_planes_match_engine(self):
+        planes = build_pricing_rules(increments=self.rows)['increments']
+        np.testing.assert_array_equal(planes, self.matrix.to_planes())
+        np.testing.assert_array_equal(build_pricing_rules(increments=self.matrix)['increments'], planes)
+        self.assertEqual(planes[INCREMENT_ADDITIONAL, 1, 2], 10)
+        self.assertEqual(planes[INCREMENT_PERCENTAGE, 5, 0], 20)
+
+
+class IncrementMatrixCacheTests(APITestCase):
+    """Test cases for caching the compiled increment matrix and its invalidation by the views."""
+
+    def setUp(self):
+        cache.clear()
+        clear_increment_matrix_cache()
+        create_pricing_fixture(self)
+        self.client.force_authenticate(user=self.user)
+
+    def test_cached(self):
+        self.assertEqual(get_increment_matrix(self.property.id).category('50-70', '60+'), ('Percentage', 10.0))
+        with self.assertNumQueries(0):
+            get_increment_matrix(self.property.id)
+
+        # Another process (empty in-process cache) reads the compiled matrix from the shared cache
+        clear_increment_matrix_cache()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_increment_matrix(self.property.id).lookup(60, 90), ('Percentage', 10.0))
+
+    def test_engine_uses_cached_matrix(self):
+        """The engine reads a property's increments through the cached matrix."""
+        load_pricing_rules(self.property.id)
+        # Settings, MSP, offers, room rates and LOS; no increments query once cached
+        with self.assertNumQueries(5):
+            rules = load_pricing_rules(self.property.id)
+        np.testing.assert_array_equal(rules['increments'], get_increment_matrix(self.property.id).to_planes())
+
+        self.client.patch(
+            reverse('dynamic_pricing:dynamic-setup-update', kwargs={'property_id': self.property.id, 'rule_id': self.increment.id}),
+            {'increment_value': 15}, format='json'
+        )
+        self.assertEqual(load_pricing_rules(self.property.id)['increments'][INCREMENT_PERCENTAGE, 2, 7], 15)
+
+    def test_version_token_expires(self):
+        with patch('dynamic_pricing.increment_matrix.cache') as mocked_cache:
+            mocked_cache.get.return_value = None
+            get_increment_matrix(self.property.id)
+        version_set = mocked_cache.set.call_args_list[0]
+        self.assertEqual(version_set.args[0], f"increment_matrix:version:{self.property.id}")
+        self.assertEqual(version_set.args[2], INCREMENT_MATRIX_CACHE_TIMEOUT)
+
+    def test_invalidated_by_writes(self):
+        get_increment_matrix(self.property.id)
+
+        response = self.client.patch(
+            reverse('dynamic_pricing:dynamic-setup-update', kwargs={'property_id': self.property.id, 'rule_id': self.increment.id}),
+            {'increment_value': 15}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_increment_matrix(self.property.id).category('50-70', '60+'), ('Percentage', 15.0))
+
+        response = self.client.patch(
+            reverse('dynamic_pricing:dynamic-setup-bulk-update', kwargs={'property_id': self.property.id}),
+            {'rules': [{'id': self.increment.id, 'increment_type': 'Additional', 'increment_value': 5}]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_increment_matrix(self.property.id).category('50-70', '60+'), ('Additional', 5.0))
+
+        response = self.client.post(
+            reverse('dynamic_pricing:dynamic-setup-create', kwargs={'property_id': self.property.id}),
+            {'occupancy_category': '0-30', 'lead_time_category': '0-1', 'increment_type': 'Additional', 'increment_value': -10},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(get_increment_matrix(self.property.id).lookup(10, 0), ('Additional', -10.0))
+
+        response = self.client.delete(
+            reverse('dynamic_pricing:dynamic-setup-delete', kwargs={'property_id': self.property.id, 'rule_id': self.increment.id})
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_increment_matrix(self.property.id).category('50-70', '60+'), ('Additional', 0.0))
+
+
+class BenchmarkEngineCommandTests(SimpleTestCase):
+    """The engine benchmark verifies the vectorized output against the per-date loop."""
+
+    def test_engine_suite(self):
+        out = StringIO()
+        call_command('benchmark_pricing', suite=['engine'], days=120, repeat=1, stdout=out)
+        self.assertIn('output verified identical', out.getvalue())
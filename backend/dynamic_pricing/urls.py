@@ -10,6 +10,8 @@ from .views import (
     PriceHistoryView,
     MSPPriceHistoryView,
     CompetitorAveragePriceHistoryView,
+    PriceCalendarView,
+    PriceCalendarAsOfView,
     OverwritePriceView,
     OverwritePriceRangeView,
     FetchCompetitorsView,
@@ -21,8 +23,14 @@ from .views import (
     property_msp_for_date,  # <-- add import
     lowest_competitor_prices,  # <-- new import
     competitor_prices_weekly_chart,  # <-- new import
+    competitor_prices_heatmap,
+    market_positioning_bands,
+    market_compression,
+    simulate_pricing,
     competitor_prices_for_date,  # <-- new import
     price_history_for_date_range,  # <-- new import
+    price_calendar_export,
+    price_history_timeline,
     CompetitorCandidateUpdateView,
     PropertyCompetitorUpdateView,
     CompetitorCandidateDeleteView,
@@ -78,6 +86,10 @@ urlpatterns = [
     # More specific competitor patterns first
     path('properties/<str:property_id>/competitors/date/', competitor_prices_for_date, name='competitor-prices-for-date'),
     path('properties/<str:property_id>/competitors/weekly-chart/', competitor_prices_weekly_chart, name='competitor-prices-weekly-chart'),
+    path('properties/<str:property_id>/competitors/heatmap/', competitor_prices_heatmap, name='competitor-prices-heatmap'),
+    path('properties/<str:property_id>/market-bands/', market_positioning_bands, name='market-positioning-bands'),
+    path('properties/<str:property_id>/market-compression/', market_compression, name='market-compression'),
+    path('properties/<str:property_id>/pricing/simulate/', simulate_pricing, name='pricing-simulate'),
     # General competitor patterns after specific ones
     path('properties/<str:property_id>/competitors/', PropertyCompetitorsListView.as_view(), name='property-competitors'),
     path('properties/<str:property_id>/competitors/<str:competitor_id>/', PropertyCompetitorUpdateView.as_view(), name='property-competitor-update'),
@@ -91,6 +103,8 @@ urlpatterns = [
     path('competitors/', CompetitorListView.as_view(), name='competitor-list'),
     path('competitors/create/', CompetitorCreateView.as_view(), name='competitor-create'),
     # Note: bulk-create endpoint is in booking/urls.py for backward compatibility with frontend
+    # Competitor price endpoints (before competitors/<competitor_id>/, which would shadow them)
+    path('competitors/lowest-prices/', lowest_competitor_prices, name='lowest-competitor-prices'),
     path('competitors/<str:competitor_id>/', CompetitorDetailView.as_view(), name='competitor-detail'),
     path('properties/<str:property_id>/competitors-list/', PropertyCompetitorsView.as_view(), name='property-competitors-list'),
     
@@ -103,6 +117,10 @@ urlpatterns = [
     path('properties/<str:property_id>/price-history/', PriceHistoryView.as_view(), name='price-history'),
     path('properties/<str:property_id>/msp-price-history/', MSPPriceHistoryView.as_view(), name='msp-price-history'),
     path('properties/<str:property_id>/competitor-average-price-history/', CompetitorAveragePriceHistoryView.as_view(), name='competitor-average-price-history'),
+    path('properties/<str:property_id>/price-calendar/', PriceCalendarView.as_view(), name='price-calendar'),
+    path('properties/<str:property_id>/price-calendar/as-of/', PriceCalendarAsOfView.as_view(), name='price-calendar-as-of'),
+    path('properties/<str:property_id>/price-calendar/export/', price_calendar_export, name='price-calendar-export'),
+    path('properties/<str:property_id>/price-history/timeline/', price_history_timeline, name='price-history-timeline'),
     path('properties/<str:property_id>/price-history/<str:checkin_date>/overwrite/', OverwritePriceView.as_view(), name='overwrite-price'),
     path('properties/<str:property_id>/price-history/overwrite-range/', OverwritePriceRangeView.as_view(), name='overwrite-price-range'),
     
@@ -112,9 +130,6 @@ urlpatterns = [
     # MSP for specific date
     path('properties/<str:property_id>/msp/date/', property_msp_for_date, name='property-msp-date'),
     
-    # Competitor price endpoints
-    path('competitors/lowest-prices/', lowest_competitor_prices, name='lowest-competitor-prices'),
-    
     # Special Offers (Offer Increments) endpoints
     path('properties/<str:property_id>/special-offers/', OfferIncrementsListView.as_view(), name='special-offers-list'),
     path('properties/<str:property_id>/special-offers/create/', OfferIncrementsCreateView.as_view(), name='special-offers-create'),
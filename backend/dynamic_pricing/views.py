@@ -7,9 +7,10 @@ from rest_framework.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
 import logging
 import time
+import numpy as np
 from datetime import datetime, timedelta
 from django.utils import timezone
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import IsAuthenticated
 from .models import DpMinimumSellingPrice, Property
 from .serializers import MinimumSellingPriceSerializer
@@ -25,7 +26,6 @@ from .serializers import (
     PropertyListSerializer,
     PropertyManagementSystemSerializer,
     MinimumSellingPriceSerializer,
-    PriceHistorySerializer,
     CompetitorCandidateSerializer,
     BulkCompetitorCandidateSerializer,
     PropertyCompetitorSerializer,
@@ -45,13 +45,52 @@ from .serializers import (
     CompetitorDetailSerializer,
     CompetitorListSerializer,
     BulkCompetitorCreateSerializer,
-    OverwritePriceHistorySerializer
+    OverwritePriceHistorySerializer,
+    PricingSimulationSerializer
 )
 
 from rest_framework.decorators import action
 from .models import DpHistoricalCompetitorPrice
-from .serializers import HistoricalCompetitorPriceSerializer
-from django.db import models
+from .price_calendar import (
+    get_latest_price_rows,
+    get_latest_price_values,
+    get_price_rows_as_of,
+    get_month_bounds,
+    get_overwrite_prices,
+    build_calendar_entry,
+    build_calendar_entries,
+    encode_price_history_rows,
+    PRICE_HISTORY_VALUE_FIELDS,
+    iter_calendar_entries,
+    CALENDAR_ENTRY_FIELDS,
+    TIMELINE_FIELDS,
+    get_price_timeline_page,
+    decode_timeline_cursor,
+    get_cached_calendar_data,
+    invalidate_price_calendar_cache,
+)
+from .columnar import (
+    CALENDAR_RENDERER_CLASSES,
+    wants_columnar,
+    encode_price_history_columnar,
+    encode_competitor_chart_columnar,
+)
+from .mv_refresh import with_refresh_headers
+from .market import reduce_best_prices, build_price_matrix, get_market_aggregates
+from .market_bands import get_market_bands
+from .room_classes import ROOM_CLASSES, get_room_class, room_class_names
+from .fx import get_price_converter, get_property_currency
+from .pricing_engine import simulate_rule_changes
+from .increment_matrix import invalidate_increment_matrix
+from .etags import (
+    compute_etag,
+    etag_matches,
+    with_etag,
+    not_modified_response,
+    get_price_history_validator,
+    get_competitor_prices_validator,
+)
+from django.db import IntegrityError, models, transaction
 import requests
 
 # Get logger for dynamic_pricing views
@@ -710,6 +749,7 @@ class PropertyMSPView(APIView):
                     })
             
             if created_msp_entries or updated_msp_entries:
+                invalidate_price_calendar_cache(property_id)
                 return Response({
                     'message': f'Successfully processed MSP entries (Created: {len(created_msp_entries)}, Updated: {len(updated_msp_entries)})',
                     'created_entries': created_msp_entries,
@@ -763,6 +803,7 @@ class PropertyMSPView(APIView):
             
             # Delete the MSP entry
             msp_entry.delete()
+            invalidate_price_calendar_cache(property_id)
             
             logger.info(f"MSP entry {msp_id} deleted successfully for property {property_id}")
             
@@ -856,8 +897,10 @@ class PropertyMSPView(APIView):
 class PriceHistoryView(APIView):
     """
     API endpoint for retrieving price history data for a property
+    Supports ?format=columnar for a compact parallel-array payload.
     """
     permission_classes = [IsAuthenticated]
+    renderer_classes = CALENDAR_RENDERER_CLASSES
     
     def get(self, request, property_id):
         """
@@ -956,37 +999,32 @@ class PriceHistoryView(APIView):
             else:
                 end_date = datetime(year, month + 1, 1).date() - timedelta(days=1)
 
-            # Single bulk query for the month, reduce to latest per checkin_date
-            qs = (
-                DpPriceChangeHistory.objects
-                .filter(
-                    property_id=property_id,
-                    checkin_date__gte=start_date,
-                    checkin_date__lte=end_date,
-                )
-                .order_by('checkin_date', '-as_of')
+            # Conditional GET: answer 304 before loading rows when nothing changed
+            columnar = wants_columnar(request)
+            etag = compute_etag(
+                'price_history', property_id, property_obj.name, start_date, end_date, columnar,
+                *get_price_history_validator(property_id, start_date, end_date)
             )
-            latest_by_date = {}
-            for row in qs:
-                if row.checkin_date not in latest_by_date:
-                    latest_by_date[row.checkin_date] = row
-            
-            # Prefetch all overwrites in one query to avoid N+1 in serializer
-            overwrites = {
-                (o.checkin_date, str(o.property_id)): o.overwrite_price
-                for o in OverwritePriceHistory.objects.filter(
-                    property=property_obj,
-                    checkin_date__gte=start_date,
-                    checkin_date__lte=end_date
+            if etag_matches(request, etag):
+                return not_modified_response(etag)
+
+            def build_price_history():
+                # Latest snapshot per checkin_date from the current price calendar projection
+                latest_by_date = get_latest_price_values(
+                    property_id, start_date, end_date, PRICE_HISTORY_VALUE_FIELDS
                 )
-            }
-            
-            # Serialize with prefetched overwrite data
-            price_history = [
-                PriceHistorySerializer(obj, context={'overwrites': overwrites}).data 
-                for obj in latest_by_date.values()
-            ]
-            price_history.sort(key=lambda x: x['checkin_date'])
+                
+                # Prefetch all overwrites in one query to avoid N+1 queries
+                overwrites = get_overwrite_prices(property_id, start_date, end_date)
+                
+                # Same output as PriceHistorySerializer, encoded straight from value tuples
+                return encode_price_history_rows(
+                    (latest_by_date[checkin_date] for checkin_date in sorted(latest_by_date)),
+                    overwrites
+                )
+
+            # Served from the calendar cache until a new snapshot or write invalidates it
+            price_history = get_cached_calendar_data(property_id, 'price_history', start_date, end_date, build_price_history)
             
             log_operation(
                 logger, LogLevel.INFO,
@@ -1005,6 +1043,9 @@ class PriceHistoryView(APIView):
                 'price_history': price_history,
                 'count': len(price_history)
             }
+            if columnar:
+                response_data['format'] = 'columnar'
+                response_data['price_history'] = encode_price_history_columnar(price_history)
             
             log_operation(
                 logger, LogLevel.INFO,
@@ -1015,7 +1056,7 @@ class PriceHistoryView(APIView):
                 entry_count=len(price_history)
             )
             
-            return Response(response_data, status=status.HTTP_200_OK)
+            return with_etag(Response(response_data, status=status.HTTP_200_OK), etag)
         except Property.DoesNotExist:
             log_operation(
                 logger, LogLevel.WARNING,
@@ -1102,31 +1143,23 @@ class MSPPriceHistoryView(APIView):
             else:
                 end_date = datetime(year, month + 1, 1).date() - timedelta(days=1)
 
-            # Single bulk query for the month, reduce to latest per checkin_date
-            qs = (
-                DpPriceChangeHistory.objects
-                .filter(
-                    property_id=property_id,
-                    checkin_date__gte=start_date,
-                    checkin_date__lte=end_date,
-                )
-                .order_by('checkin_date', '-as_of')
-            )
-            latest_by_date = {}
-            for row in qs:
-                if row.checkin_date not in latest_by_date:
-                    latest_by_date[row.checkin_date] = row
-            msp_price_history = []
-            for row in latest_by_date.values():
-                normalized_occupancy = self._normalize_occupancy(row.occupancy)
-                msp_price_history.append({
-                    'checkin_date': row.checkin_date.strftime('%Y-%m-%d'),
-                    'price': row.msp,
-                    'occupancy_level': self._get_occupancy_level(row.occupancy),
-                    'overwrite': False,
-                    'occupancy': normalized_occupancy,
-                })
-            msp_price_history.sort(key=lambda x: x['checkin_date'])
+            def build_msp_price_history():
+                # Latest snapshot per checkin_date from the current price calendar projection
+                latest_by_date = get_latest_price_rows(property_id, start_date, end_date)
+                entries = []
+                for row in latest_by_date.values():
+                    normalized_occupancy = self._normalize_occupancy(row.occupancy)
+                    entries.append({
+                        'checkin_date': row.checkin_date.strftime('%Y-%m-%d'),
+                        'price': row.msp,
+                        'occupancy_level': self._get_occupancy_level(row.occupancy),
+                        'overwrite': False,
+                        'occupancy': normalized_occupancy,
+                    })
+                entries.sort(key=lambda x: x['checkin_date'])
+                return entries
+
+            msp_price_history = get_cached_calendar_data(property_id, 'msp_price_history', start_date, end_date, build_msp_price_history)
             print(f"[MSPPriceHistoryView] Returning {len(msp_price_history)} MSP price history entries")
 
             response_data = {
@@ -1236,32 +1269,26 @@ class CompetitorAveragePriceHistoryView(APIView):
             else:
                 end_date = datetime(year, month + 1, 1).date() - timedelta(days=1)
 
-            # Single bulk query for the month, reduce to latest per checkin_date
-            qs = (
-                DpPriceChangeHistory.objects
-                .filter(
-                    property_id=property_id,
-                    checkin_date__gte=start_date,
-                    checkin_date__lte=end_date,
-                )
-                .order_by('checkin_date', '-as_of')
+            def build_competitor_avg_price_history():
+                # Latest snapshot per checkin_date from the current price calendar projection
+                latest_by_date = get_latest_price_rows(property_id, start_date, end_date)
+                entries = []
+                for row in latest_by_date.values():
+                    if row.competitor_average is not None:
+                        normalized_occupancy = self._normalize_occupancy(row.occupancy)
+                        entries.append({
+                            'checkin_date': row.checkin_date.strftime('%Y-%m-%d'),
+                            'price': row.competitor_average,
+                            'occupancy_level': self._get_occupancy_level(row.occupancy),
+                            'overwrite': False,
+                            'occupancy': normalized_occupancy,
+                        })
+                entries.sort(key=lambda x: x['checkin_date'])
+                return entries
+
+            competitor_avg_price_history = get_cached_calendar_data(
+                property_id, 'competitor_average_price_history', start_date, end_date, build_competitor_avg_price_history
             )
-            latest_by_date = {}
-            for row in qs:
-                if row.checkin_date not in latest_by_date:
-                    latest_by_date[row.checkin_date] = row
-            competitor_avg_price_history = []
-            for row in latest_by_date.values():
-                if row.competitor_average is not None:
-                    normalized_occupancy = self._normalize_occupancy(row.occupancy)
-                    competitor_avg_price_history.append({
-                        'checkin_date': row.checkin_date.strftime('%Y-%m-%d'),
-                        'price': row.competitor_average,
-                        'occupancy_level': self._get_occupancy_level(row.occupancy),
-                        'overwrite': False,
-                        'occupancy': normalized_occupancy,
-                    })
-            competitor_avg_price_history.sort(key=lambda x: x['checkin_date'])
             print(f"[CompetitorAveragePriceHistoryView] Returning {len(competitor_avg_price_history)} competitor average price history entries")
 
             response_data = {
@@ -1311,6 +1338,173 @@ class CompetitorAveragePriceHistoryView(APIView):
             return "high"
 
 
+class PriceCalendarView(APIView):
+    """
+    API endpoint for the unified dashboard price calendar of a property.
+    Returns price, MSP, competitor average, occupancy and overwrite series per checkin_date
+    from a single price history scan and a single overwrite prefetch.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, property_id):
+        """
+        Retrieve the unified price calendar for a property and month
+        Query params:
+            - year (int): Calendar year (defaults to current year)
+            - month (int): Calendar month (defaults to current month)
+            - include (str): "market_bands" to add the market positioning bands overlay
+        Response:
+            {
+                "property_id": "abc-123",
+                "year": 2025,
+                "month": 1,
+                "calendar": [
+                    {"checkin_date": "2025-01-01", "price": 120, "recom_price": 110, "overwrite": true,
+                     "overwrite_price": 120, "msp": 90, "competitor_average": 105.5,
+                     "occupancy": 55.0, "occupancy_level": "medium"},
+                    ...
+                ],
+                "count": 31,
+                "market_bands": [...]    # only with include=market_bands, see market_positioning_bands
+            }
+        """
+        try:
+            property_obj = request.user.profile.properties.filter(id=property_id).first()
+            if property_obj is None:
+                logger.warning(f"User {request.user.username} attempted to access property {property_id} without ownership")
+                return Response({
+                    'message': 'Property not found or access denied'
+                }, status=status.HTTP_404_NOT_FOUND)
+
+            try:
+                year = int(request.query_params.get('year', timezone.now().year))
+                month = int(request.query_params.get('month', timezone.now().month))
+                start_date, end_date = get_month_bounds(year, month)
+            except ValueError:
+                return Response({
+                    'message': 'Invalid year or month parameter'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            calendar = get_cached_calendar_data(
+                property_id, 'price_calendar', start_date, end_date,
+                lambda: build_calendar_entries(
+                    get_latest_price_rows(property_id, start_date, end_date),
+                    get_overwrite_prices(property_id, start_date, end_date),
+                )
+            )
+
+            response_data = {
+                'property_id': property_id,
+                'property_name': property_obj.name,
+                'year': year,
+                'month': month,
+                'calendar': calendar,
+                'count': len(calendar)
+            }
+            if 'market_bands' in request.query_params.get('include', '').split(','):
+                response_data['market_bands'] = get_market_bands(property_id, start_date, end_date)
+            return Response(response_data, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error retrieving price calendar for property {property_id}: {str(e)}", exc_info=True)
+            return Response({
+                'message': 'An error occurred while retrieving the price calendar',
+                'error': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class PriceCalendarAsOfView(APIView):
+    """
+    API endpoint reconstructing the unified price calendar of a property as it was
+    at a past timestamp (for disputes and post-mortems).
+    For each checkin_date the latest snapshot with as_of <= the requested timestamp is used.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, property_id):
+        """
+        Retrieve the price calendar for a month as of a past timestamp
+        Query params:
+            - as_of (ISO 8601 datetime): Point in time to reconstruct (required)
+            - year (int): Calendar year (defaults to current year)
+            - month (int): Calendar month (defaults to current month)
+        Response:
+            {
+                "property_id": "abc-123",
+                "as_of": "2025-01-10T08:00:00+00:00",
+                "year": 2025,
+                "month": 1,
+                "calendar": [
+                    {"checkin_date": "2025-01-01", "snapshot_as_of": "2025-01-10T06:00:00+00:00",
+                     "price": 120, "recom_price": 110, ...},
+                    ...
+                ],
+                "count": 31
+            }
+        Overwrites keep no history: only overwrites last updated at or before as_of are applied.
+        """
+        from django.utils.dateparse import parse_datetime
+
+        property_obj = request.user.profile.properties.filter(id=property_id).first()
+        if property_obj is None:
+            logger.warning(f"User {request.user.username} attempted to access property {property_id} without ownership")
+            return Response({
+                'message': 'Property not found or access denied'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        as_of_str = request.query_params.get('as_of')
+        if not as_of_str:
+            return Response({
+                'error': 'as_of query parameter is required (ISO 8601 datetime)'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            as_of = parse_datetime(as_of_str)
+        except ValueError:
+            as_of = None
+        if as_of is None:
+            return Response({
+                'error': 'Invalid as_of format, expected ISO 8601 datetime'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(as_of):
+            as_of = timezone.make_aware(as_of)
+
+        try:
+            year = int(request.query_params.get('year', timezone.now().year))
+            month = int(request.query_params.get('month', timezone.now().month))
+            start_date, end_date = get_month_bounds(year, month)
+        except ValueError:
+            return Response({
+                'message': 'Invalid year or month parameter'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            rows = get_price_rows_as_of(property_id, start_date, end_date, as_of)
+            overwrites = get_overwrite_prices(property_id, start_date, end_date, as_of=as_of)
+            calendar = []
+            for checkin_date in sorted(rows):
+                row = rows[checkin_date]
+                calendar.append({
+                    'checkin_date': checkin_date.strftime('%Y-%m-%d'),
+                    'snapshot_as_of': row.as_of.isoformat(),
+                    **build_calendar_entry(row, overwrites.get(checkin_date)),
+                })
+
+            return Response({
+                'property_id': property_id,
+                'property_name': property_obj.name,
+                'as_of': as_of.isoformat(),
+                'year': year,
+                'month': month,
+                'calendar': calendar,
+                'count': len(calendar)
+            }, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error reconstructing price calendar for property {property_id} as of {as_of}: {str(e)}", exc_info=True)
+            return Response({
+                'message': 'An error occurred while reconstructing the price calendar',
+                'error': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class OverwritePriceView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -1342,6 +1536,7 @@ class OverwritePriceView(APIView):
             )
             
             print(f"[OverwritePriceView] {'Created' if created else 'Updated'} overwrite price record with id: {overwrite_record.id}")
+            invalidate_price_calendar_cache(property_id)
 
             serializer = OverwritePriceHistorySerializer(overwrite_record)
             return Response({
@@ -1355,6 +1550,7 @@ class OverwritePriceView(APIView):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes(CALENDAR_RENDERER_CLASSES)
 def price_history_for_date_range(request, property_id):
     """
     Get price history data for a property for a specific date range.
@@ -1376,7 +1572,6 @@ def price_history_for_date_range(request, property_id):
     """
     from datetime import datetime, timedelta
     from .models import DpPriceChangeHistory
-    from .serializers import PriceHistorySerializer
 
     # Parse date parameters
     start_date_str = request.query_params.get('start_date')
@@ -1418,46 +1613,36 @@ def price_history_for_date_range(request, property_id):
 
         property_obj = get_object_or_404(Property, id=property_id)
 
-        # Single bulk query for all dates in range (optimized to avoid N+1)
-        qs = (
-            DpPriceChangeHistory.objects
-            .filter(
-                property_id=property_id,
-                checkin_date__gte=start_date,
-                checkin_date__lte=end_date,
-            )
-            .order_by('checkin_date', '-as_of')
+        # Conditional GET: answer 304 before loading rows when nothing changed
+        columnar = wants_columnar(request)
+        etag = compute_etag(
+            'price_history_range', property_id, property_obj.name, start_date, end_date, columnar,
+            *get_price_history_validator(property_id, start_date, end_date)
         )
-        
-        # Get latest record per date
-        latest_by_date = {}
-        for row in qs:
-            if row.checkin_date not in latest_by_date:
-                latest_by_date[row.checkin_date] = row
-        
-        # Prefetch all overwrites in one query to avoid N+1 in serializer
-        overwrites = {
-            (o.checkin_date, str(o.property_id)): o.overwrite_price
-            for o in OverwritePriceHistory.objects.filter(
-                property=property_obj,
-                checkin_date__gte=start_date,
-                checkin_date__lte=end_date
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+
+        def build_price_history():
+            # Latest record per date from the current price calendar projection
+            latest_by_date = get_latest_price_values(
+                property_id, start_date, end_date, PRICE_HISTORY_VALUE_FIELDS
             )
-        }
+            
+            # Prefetch all overwrites in one query to avoid N+1 queries
+            overwrites = get_overwrite_prices(property_id, start_date, end_date)
+            
+            # Same output as PriceHistorySerializer, encoded straight from value tuples
+            return encode_price_history_rows(
+                (latest_by_date[checkin_date] for checkin_date in sorted(latest_by_date)),
+                overwrites
+            )
+
+        # Served from the calendar cache until a new snapshot or write invalidates it
+        price_history = get_cached_calendar_data(property_id, 'price_history', start_date, end_date, build_price_history)
         
-        # Serialize with prefetched overwrite data
-        price_history = []
         total_price = 0
         valid_days = 0
-        
-        for checkin_date, record in sorted(latest_by_date.items()):
-            serializer = PriceHistorySerializer(record, context={'overwrites': overwrites})
-            price_data = serializer.data
-            price_history.append(price_data)
-            
-            # Debug logging for occupancy
-            print(f"[price_history_for_date_range] Date: {checkin_date}, Raw occupancy: {record.occupancy}, Serialized occupancy: {price_data.get('occupancy')}, Occupancy level: {price_data.get('occupancy_level')}")
-            
+        for price_data in price_history:
             # Add to total for average calculation
             if price_data['price'] is not None:
                 total_price += price_data['price']
@@ -1466,7 +1651,7 @@ def price_history_for_date_range(request, property_id):
         # Calculate average price
         average_price = round(total_price / valid_days, 2) if valid_days > 0 else 0
 
-        return Response({
+        response_data = {
             'property_id': property_id,
             'property_name': property_obj.name,
             'start_date': start_date_str,
@@ -1475,7 +1660,12 @@ def price_history_for_date_range(request, property_id):
             'average_price': average_price,
             'count': len(price_history),
             'valid_days': valid_days
-        }, status=status.HTTP_200_OK)
+        }
+        if columnar:
+            response_data['format'] = 'columnar'
+            response_data['price_history'] = encode_price_history_columnar(price_history)
+
+        return with_etag(Response(response_data, status=status.HTTP_200_OK), etag)
         
     except Property.DoesNotExist:
         logger.warning(f"Property {property_id} not found")
@@ -1490,6 +1680,200 @@ def price_history_for_date_range(request, property_id):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# Upper bound for a single calendar export (three years of check-in dates)
+MAX_CALENDAR_EXPORT_DAYS = 3 * 366
+
+
+class _EchoBuffer:
+    """
+    File-like object whose write() returns the value, for streaming csv.writer output.
+    """
+    def write(self, value):
+        return value
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def price_calendar_export(request, property_id):
+    """
+    Stream the unified price calendar of a property for a multi-month date range.
+    Rows are read through server-side cursors and written as they are produced,
+    so a full pricing horizon is a single request with flat memory use.
+    Query params:
+        - start_date (YYYY-MM-DD): First check-in date (defaults to today)
+        - end_date (YYYY-MM-DD): Last check-in date (defaults to the property's
+          future_days_to_price horizon, or 365 days)
+        - output (jsonl|csv): Stream format (defaults to jsonl)
+    Response:
+        jsonl: one JSON calendar entry per line
+            {"checkin_date": "2025-01-01", "price": 120, "recom_price": 110, "overwrite": true, ...}
+        csv: header row followed by one row per checkin_date
+    """
+    import csv
+    import json
+    from django.http import StreamingHttpResponse
+
+    output = request.query_params.get('output', 'jsonl')
+    if output not in ('jsonl', 'csv'):
+        return Response({
+            'error': 'output must be one of: jsonl, csv'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    property_obj = request.user.profile.properties.filter(id=property_id).first()
+    if property_obj is None:
+        logger.warning(f"User {request.user.username} attempted to access property {property_id} without ownership")
+        return Response({
+            'message': 'Property not found or access denied'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        start_date_str = request.query_params.get('start_date')
+        end_date_str = request.query_params.get('end_date')
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else timezone.now().date()
+        if end_date_str:
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+        else:
+            horizon_days = (
+                DpGeneralSettings.objects
+                .filter(property_id=property_id)
+                .values_list('future_days_to_price', flat=True)
+                .first()
+            ) or 365
+            end_date = start_date + timedelta(days=horizon_days - 1)
+    except ValueError:
+        return Response({
+            'error': 'Invalid date format, expected YYYY-MM-DD'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if end_date < start_date:
+        return Response({
+            'error': 'end_date must be after or equal to start_date'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if (end_date - start_date).days >= MAX_CALENDAR_EXPORT_DAYS:
+        return Response({
+            'error': f'Date range cannot exceed {MAX_CALENDAR_EXPORT_DAYS} days'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    entries = iter_calendar_entries(property_id, start_date, end_date)
+    filename = f"price_calendar_{property_id}_{start_date.isoformat()}_{end_date.isoformat()}"
+
+    if output == 'csv':
+        writer = csv.writer(_EchoBuffer())
+
+        def stream():
+            yield writer.writerow(CALENDAR_ENTRY_FIELDS)
+            for entry in entries:
+                yield writer.writerow([entry[field] for field in CALENDAR_ENTRY_FIELDS])
+
+        response = StreamingHttpResponse(stream(), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    else:
+        response = StreamingHttpResponse(
+            (json.dumps(entry) + '\n' for entry in entries),
+            content_type='application/x-ndjson'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}.jsonl"'
+
+    logger.info(f"Streaming price calendar export for property {property_id} ({start_date} to {end_date}, {output})")
+    return response
+
+
+# Page size bounds of the price evolution timeline
+DEFAULT_TIMELINE_PAGE_SIZE = 200
+MAX_TIMELINE_PAGE_SIZE = 1000
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def price_history_timeline(request, property_id):
+    """
+    Returns how the recommendation for one check-in date (or a date range) evolved
+    across as_of snapshots, delta-encoded and keyset-paginated. Check-in dates are
+    ascending and the snapshots of each date newest first; each snapshot carries the
+    values that changed since the previous (older) one, the oldest carries all values.
+    Query params:
+        - start_date (YYYY-MM-DD): First check-in date (required)
+        - end_date (YYYY-MM-DD): Last check-in date (defaults to start_date)
+        - limit: Snapshots scanned per page (default 200, max 1000)
+        - cursor: next_cursor of the previous page
+    Response:
+        {
+            "property_id": "abc-123",
+            "start_date": "2025-01-01",
+            "end_date": "2025-01-01",
+            "fields": ["recom_price", "msp", "occupancy", "competitor_average"],
+            "timeline": [
+                {"checkin_date": "2025-01-01", "as_of": "2024-12-02T06:00:00+00:00",
+                 "changes": {"recom_price": 125}},
+                {"checkin_date": "2025-01-01", "as_of": "2024-12-01T06:00:00+00:00",
+                 "changes": {"recom_price": 120, "msp": 80, "occupancy": 52.5, "competitor_average": 115.0}},
+                ...
+            ],
+            "count": 2,
+            "next_cursor": "MjAyNS0wMS0wMXwy..."   # null on the last page
+        }
+    """
+    property_obj = request.user.profile.properties.filter(id=property_id).first()
+    if property_obj is None:
+        logger.warning(f"User {request.user.username} attempted to access property {property_id} without ownership")
+        return Response({
+            'message': 'Property not found or access denied'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    start_date_str = request.query_params.get('start_date')
+    if not start_date_str:
+        return Response({
+            'error': 'start_date query parameter is required (YYYY-MM-DD)'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    end_date_str = request.query_params.get('end_date', start_date_str)
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+    except ValueError:
+        return Response({
+            'error': 'Invalid date format, expected YYYY-MM-DD'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if end_date < start_date:
+        return Response({
+            'error': 'end_date must be after or equal to start_date'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = int(request.query_params.get('limit', DEFAULT_TIMELINE_PAGE_SIZE))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= limit <= MAX_TIMELINE_PAGE_SIZE:
+        return Response({
+            'error': f'limit must be between 1 and {MAX_TIMELINE_PAGE_SIZE}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    after = None
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        try:
+            after = decode_timeline_cursor(cursor)
+        except ValueError:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        page = get_price_timeline_page(property_id, start_date, end_date, limit, after=after)
+        return Response({
+            'property_id': property_id,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'fields': TIMELINE_FIELDS,
+            'timeline': page['timeline'],
+            'count': len(page['timeline']),
+            'next_cursor': page['next_cursor'],
+        }, status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.error(f"Error retrieving price timeline for property {property_id}: {str(e)}", exc_info=True)
+        return Response({
+            'message': 'An error occurred while retrieving the price timeline',
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class OverwritePriceRangeView(APIView):
     """
     API endpoint to overwrite prices for a range of dates for a property.
@@ -1540,6 +1924,8 @@ class OverwritePriceRangeView(APIView):
                     record = existing_records[checkin_date]
                     record.overwrite_price = overwrite_price
                     record.user = request.user
+                    # bulk_update skips auto_now; the price history ETag is built on updated_at
+                    record.updated_at = timezone.now()
                     to_update.append(record)
                 else:
                     to_create.append(OverwritePriceHistory(
@@ -1559,10 +1945,11 @@ class OverwritePriceRangeView(APIView):
                     created_objects = OverwritePriceHistory.objects.bulk_create(to_create)
                 
                 if to_update:
-                    OverwritePriceHistory.objects.bulk_update(to_update, ['overwrite_price', 'user'])
+                    OverwritePriceHistory.objects.bulk_update(to_update, ['overwrite_price', 'user', 'updated_at'])
                     updated_count = len(to_update)
             except Exception as e:
                 errors.append(f"Bulk operation error: {str(e)}")
+            invalidate_price_calendar_cache(property_id)
             
             # Serialize results for response
             created_records = []
@@ -1598,6 +1985,8 @@ def property_msp_for_date(request, property_id):
     """
     Get the Minimum Selling Price (MSP) for a property for a specific date.
     Query param: date=YYYY-MM-DD
+    On overlapping periods the latest valid_from wins, then the newest entry, like the pricing engine.
+    One indexed query on (property_id, valid_from); range callers use load_msp_index instead.
     """
     from datetime import datetime
     date_str = request.query_params.get('date')
@@ -1609,77 +1998,106 @@ def property_msp_for_date(request, property_id):
         return Response({'error': 'Invalid date format, expected YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
 
     property_instance = get_object_or_404(Property, id=property_id)
-    msp_entry = DpMinimumSellingPrice.objects.filter(
-        property_id=property_instance,
-        valid_from__lte=date_obj,
-        valid_until__gte=date_obj
-    ).first()
+    msp_entry = (
+        DpMinimumSellingPrice.objects
+        .filter(property_id=property_instance, valid_from__lte=date_obj, valid_until__gte=date_obj)
+        .order_by('-valid_from', '-id')
+        .first()
+    )
     if not msp_entry:
         return Response({'error': 'No MSP configured for this date'}, status=status.HTTP_404_NOT_FOUND)
     serializer = MinimumSellingPriceSerializer(msp_entry)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-def get_lowest_competitor_prices_queryset(base_queryset=None):
+def get_lowest_competitor_prices_queryset(base_queryset=None, competitor_ids=None, start_date=None, end_date=None, after=None,
+                                          room_class=None):
     """
     Utility to get, for each (competitor, checkin_date), the row with the lowest raw_price.
     Filters out rows where max_persons < 0 or hotel_name == 'NOT PARSABLE'.
     Uses a window function to partition by competitor and checkin_date, ordering by raw_price.
+    Scope filters are applied before the window, so the window only ranks the rows in scope;
+    they are all partition keys, so the ranking within each partition is unchanged.
     Args:
         base_queryset: Optionally, a queryset to start from. If None, uses all DpHistoricalCompetitorPrice objects.
+        competitor_ids: Optionally, restrict to these competitors
+        start_date, end_date: Optionally, restrict to this checkin_date range
+        after: Optionally, a (competitor_id, checkin_date) keyset position; only later partitions are returned
+        room_class: Optionally, only rank rooms of this canonical room class (DpRoomClassMapping)
     Returns:
-        Queryset annotated with lowest price per (competitor, checkin_date).
+        Lazy queryset of the lowest price row per (competitor, checkin_date), ordered by (competitor_id, checkin_date).
     """
-    from django.db.models import F, Window
+    from django.db.models import F, Q, Window
     from django.db.models.functions import RowNumber
     from .models import DpHistoricalCompetitorPrice
-    from django.db import models
 
-    print(f"[COMPETITOR_PRICES_DEBUG] ===== START get_lowest_competitor_prices_queryset =====")
-    print(f"[COMPETITOR_PRICES_DEBUG] base_queryset provided: {base_queryset is not None}")
-    
-    qs = base_queryset or DpHistoricalCompetitorPrice.objects.all()
-    print(f"[COMPETITOR_PRICES_DEBUG] Initial queryset count: {qs.count()}")
-    
-    # Apply filters
+    qs = base_queryset if base_queryset is not None else DpHistoricalCompetitorPrice.objects.all()
     qs = qs.filter(
-        models.Q(max_persons__lt=0) | models.Q(max_persons__gte=2),
-        ~models.Q(hotel_name='NOT PARSABLE'),
-        models.Q(raw_price__gt=0)  # Exclude records with price 0 or null
+        Q(max_persons__lt=0) | Q(max_persons__gte=2),
+        ~Q(hotel_name='NOT PARSABLE'),
+        Q(raw_price__gt=0)  # Exclude records with price 0 or null
     )
-    print(f"[COMPETITOR_PRICES_DEBUG] After filtering (max_persons, hotel_name, and raw_price > 0): {qs.count()}")
-    
-    # Show sample of filtered data
-    sample_records = qs[:3]
-    for record in sample_records:
-        print(f"[COMPETITOR_PRICES_DEBUG] - Sample record: competitor_id={record.competitor_id}, price={record.raw_price}, max_persons={record.max_persons}, hotel_name='{record.hotel_name}'")
-    
-    qs = qs.annotate(
+    if competitor_ids is not None:
+        qs = qs.filter(competitor_id__in=competitor_ids)
+    if start_date is not None:
+        qs = qs.filter(checkin_date__gte=start_date)
+    if end_date is not None:
+        qs = qs.filter(checkin_date__lte=end_date)
+    if room_class is not None:
+        qs = qs.filter(room_name__in=room_class_names(room_class))
+    if after is not None:
+        after_competitor_id, after_date = after
+        qs = qs.filter(
+            Q(competitor_id__gt=after_competitor_id) | Q(competitor_id=after_competitor_id, checkin_date__gt=after_date)
+        )
+
+    return qs.annotate(
         rn=Window(
             expression=RowNumber(),
             partition_by=[F('competitor_id'), F('checkin_date')],
             order_by=F('raw_price').asc(nulls_last=True)
         )
-    ).filter(rn=1)
-    
-    print(f"[COMPETITOR_PRICES_DEBUG] After window function and filtering (rn=1): {qs.count()}")
-    
-    # Show final results
-    final_records = list(qs)
-    for record in final_records:
-        print(f"[COMPETITOR_PRICES_DEBUG] - Final record: competitor_id={record.competitor_id}, price={record.raw_price}, room_name='{record.room_name}'")
-    
-    print(f"[COMPETITOR_PRICES_DEBUG] ===== END get_lowest_competitor_prices_queryset =====")
-    return qs
+    ).filter(rn=1).order_by('competitor_id', 'checkin_date')
+
+
+# Columns returned by lowest_competitor_prices, in HistoricalCompetitorPriceSerializer order
+# (competitor_name is added from the property's competitors instead of a join)
+LOWEST_COMPETITOR_PRICE_FIELDS = [
+    'competitor_id', 'hotel_name', 'room_name', 'checkin_date', 'checkout_date',
+    'raw_price', 'currency', 'cancellation_type', 'max_persons', 'min_los', 'sold_out_message',
+    'taking_reservations', 'scrape_date', 'is_available', 'num_days', 'price', 'update_tz'
+]
+
+# Page size bounds and maximum date range of lowest_competitor_prices
+DEFAULT_LOWEST_PRICES_PAGE_SIZE = 500
+MAX_LOWEST_PRICES_PAGE_SIZE = 2000
+MAX_LOWEST_PRICES_RANGE_DAYS = 366
+
+
+def _encode_lowest_prices_cursor(competitor_id, checkin_date):
+    import base64
+    raw = f"{competitor_id}|{checkin_date.isoformat()}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def _decode_lowest_prices_cursor(cursor):
+    import base64
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        competitor_id, checkin_date = raw.split('|')
+        return int(competitor_id), datetime.strptime(checkin_date, '%Y-%m-%d').date()
+    except (UnicodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def lowest_competitor_prices(request):
     """
-    Retrieve, for each (competitor, checkin_date), the historical competitor price row with the lowest raw_price.
+    Retrieve, for each (competitor, checkin_date), the historical competitor price row with the lowest raw_price,
+    for the competitors of one property and a checkin_date range.
     Filters out rows where max_persons < 0 or hotel_name == 'NOT PARSABLE'.
-    Equivalent to the following SQL:
+    Equivalent to the following SQL (one window query per page):
 
         SELECT * FROM (
           SELECT *, ROW_NUMBER() OVER(
@@ -1692,19 +2110,127 @@ def lowest_competitor_prices(request):
               OR cp.max_persons >= 2
             )
             AND cp.hotel_name != 'NOT PARSABLE'
+            AND cp.competitor IN (<property competitors>)
+            AND cp.checkin_date BETWEEN <start_date> AND <end_date>
+            AND (cp.competitor, cp.checkin_date) > <cursor>
         ) ranked_prices
-        WHERE rn = 1;
+        WHERE rn = 1
+        ORDER BY competitor, checkin_date
+        LIMIT <limit + 1>;
 
+    Query params:
+        - property_id: Property whose competitors are returned (required)
+        - start_date, end_date (YYYY-MM-DD): checkin_date range (required, at most 366 days)
+        - limit: Rows per page (default 500, max 2000)
+        - cursor: next_cursor of the previous page
+        - room_class (str): Only rank rooms of this canonical class (e.g. double, see room_classes)
     Returns:
-        List of lowest price records per (competitor, checkin_date).
+        {"results": [lowest price rows], "count": 500, "next_cursor": "..." or null}
     """
-    qs = get_lowest_competitor_prices_queryset()
-    serializer = HistoricalCompetitorPriceSerializer(qs, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    from .models import DpPropertyCompetitor, Competitor
+
+    property_id = request.query_params.get('property_id')
+    start_date_str = request.query_params.get('start_date')
+    end_date_str = request.query_params.get('end_date')
+    if not property_id or not start_date_str or not end_date_str:
+        return Response({
+            'error': 'property_id, start_date and end_date query parameters are required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+    except ValueError:
+        return Response({
+            'error': 'Invalid date format, expected YYYY-MM-DD'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if end_date < start_date:
+        return Response({
+            'error': 'end_date must be after or equal to start_date'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if (end_date - start_date).days >= MAX_LOWEST_PRICES_RANGE_DAYS:
+        return Response({
+            'error': f'Date range cannot exceed {MAX_LOWEST_PRICES_RANGE_DAYS} days'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = int(request.query_params.get('limit', DEFAULT_LOWEST_PRICES_PAGE_SIZE))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= limit <= MAX_LOWEST_PRICES_PAGE_SIZE:
+        return Response({
+            'error': f'limit must be between 1 and {MAX_LOWEST_PRICES_PAGE_SIZE}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    after = None
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        try:
+            after = _decode_lowest_prices_cursor(cursor)
+        except ValueError:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        room_class = _parse_room_class(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not request.user.profile.properties.filter(id=property_id).exists():
+        logger.warning(f"User {request.user.username} attempted to access property {property_id} without ownership")
+        return Response({
+            'message': 'Property not found or access denied'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    competitor_names = dict(
+        Competitor.objects.filter(
+            id__in=DpPropertyCompetitor.objects.filter(
+                property_id=property_id,
+                deleted_at__isnull=True
+            ).values('competitor_id')
+        ).values_list('id', 'competitor_name')
+    )
+
+    qs = get_lowest_competitor_prices_queryset(
+        competitor_ids=list(competitor_names),
+        start_date=start_date,
+        end_date=end_date,
+        after=after,
+        room_class=room_class,
+    ).values(*LOWEST_COMPETITOR_PRICE_FIELDS)[:limit + 1]
+
+    # Single pass over the window query results; rows are encoded as they are read
+    results = []
+    next_cursor = None
+    for row in qs.iterator(chunk_size=limit + 1):
+        if len(results) == limit:
+            last = results[-1]
+            next_cursor = _encode_lowest_prices_cursor(last['competitor_id'], last['checkin_date'])
+            break
+        results.append({
+            'competitor_id': row['competitor_id'],
+            'competitor_name': competitor_names.get(row['competitor_id']),
+            **row,
+        })
+
+    return Response({
+        'results': results,
+        'count': len(results),
+        'next_cursor': next_cursor,
+    }, status=status.HTTP_200_OK)
+
+
+def _parse_room_class(request):
+    """
+    Return the validated ?room_class= filter of a competitor price request, or None.
+    Raises ValueError for unknown room classes.
+    """
+    room_class = request.query_params.get('room_class')
+    if room_class and room_class not in ROOM_CLASSES:
+        raise ValueError(f"Invalid room_class, expected one of: {', '.join(ROOM_CLASSES)}")
+    return room_class or None
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes(CALENDAR_RENDERER_CLASSES)
 def competitor_prices_weekly_chart(request, property_id):
     """
     Returns a matrix of lowest competitor prices for a property for a given week.
@@ -1713,14 +2239,20 @@ def competitor_prices_weekly_chart(request, property_id):
     - Cells: The lowest price for that competitor on that date
     Query params:
         - start_date (YYYY-MM-DD): The Monday of the week (required)
+        - room_class (str): Only compare rooms of this canonical class (e.g. double, see room_classes)
     Response:
         {
             "dates": ["2024-06-10", ...],
+            "currency": "EUR",
             "competitors": [
                 {"id": 1, "name": "Hotel X", "prices": [56, 57, ...]},
                 ...
             ]
         }
+    Prices are converted to the property currency with today's FX rates.
+    With ?format=columnar the response is encoded as parallel arrays
+    (see encode_competitor_chart_columnar).
+    X-Data-Refreshed-At / X-Data-Staleness-Seconds headers report when comp_prices_mv was last refreshed.
     """
     from datetime import datetime, timedelta
     from .models import DpPropertyCompetitor, CompetitorPriceMV, Competitor
@@ -1733,6 +2265,10 @@ def competitor_prices_weekly_chart(request, property_id):
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
     except ValueError:
         return Response({'error': 'Invalid start_date format, expected YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        room_class = _parse_room_class(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     # Build week dates (Monday to Sunday)
     week_dates = [start_date + timedelta(days=i) for i in range(7)]
     # Get competitors for the property (excluding deleted ones)
@@ -1743,84 +2279,308 @@ def competitor_prices_weekly_chart(request, property_id):
     competitors = list(competitor_links.values_list('competitor', flat=True))
     competitors = list(Competitor.objects.filter(id__in=competitors))
     competitor_ids = [comp.id for comp in competitors]
+    mv_filter = {'competitor_id__in': competitor_ids, 'checkin_date__in': week_dates}
+    if room_class:
+        mv_filter['room_name__in'] = room_class_names(room_class)
+
+    currency = get_property_currency(property_id)
+    rate_date = timezone.now().date()
+
+    # Conditional GET: answer 304 before loading rows when no scrape changed
+    columnar = wants_columnar(request)
+    etag = compute_etag(
+        'competitor_weekly_chart', property_id, start_date, columnar, room_class, currency, rate_date,
+        *get_competitor_prices_validator(competitors, mv_filter)
+    )
+    if etag_matches(request, etag):
+        return with_refresh_headers(not_modified_response(etag))
 
     # Fetch all MV rows for the competitors across the week dates
     mv_rows_qs = (
         CompetitorPriceMV.objects
-        .filter(competitor_id__in=competitor_ids, checkin_date__in=week_dates)
+        .filter(**mv_filter)
         .order_by('competitor_id', 'checkin_date', 'price', 'room_name')
     )
 
     # Build lookup: competitor_id -> date -> {best_price: number|None, sold_out: bool}
-    price_map = {}
-    for row in mv_rows_qs.values('competitor_id', 'checkin_date', 'price', 'sold_out_message'):
-        competitor_key = row['competitor_id']
-        try:
-            competitor_key = int(competitor_key)
-        except (TypeError, ValueError):
-            pass
-        checkin_date = row['checkin_date']
-        price = row['price']
-        sold_out_message = row.get('sold_out_message')
+    price_map = reduce_best_prices(
+        mv_rows_qs.values('competitor_id', 'checkin_date', 'price', 'currency', 'sold_out_message'),
+        convert=get_price_converter(currency, rate_date),
+    )
 
-        comp_map = price_map.setdefault(competitor_key, {})
-        day_entry = comp_map.setdefault(checkin_date, {'best_price': None, 'sold_out': False})
+    # Build response with the same shape used by the frontend, plus sold_out flags per day
+    competitors_data = build_price_matrix(competitors, week_dates, price_map)
+
+    dates = [d.isoformat() for d in week_dates]
+    if columnar:
+        return with_refresh_headers(with_etag(Response({
+            'format': 'columnar',
+            'currency': currency,
+            **encode_competitor_chart_columnar(dates, competitors_data),
+        }, status=status.HTTP_200_OK), etag))
+
+    return with_refresh_headers(with_etag(Response({
+        'dates': dates,
+        'currency': currency,
+        'competitors': competitors_data,
+    }, status=status.HTTP_200_OK), etag))
 
-        # Determine if this row indicates sold out
-        price_is_zero = False
-        try:
-            price_is_zero = (price is not None and float(price) == 0.0)
-        except Exception:
-            price_is_zero = False
 
-        if price_is_zero and sold_out_message:
-            day_entry['sold_out'] = True
-            # Do not set numeric price when sold out; continue
-            continue
+# Maximum date window of the competitor heatmap
+MAX_HEATMAP_DAYS = 366
 
-        # Track minimum non-zero positive price
-        try:
-            if price is not None and float(price) > 0.0:
-                if day_entry['best_price'] is None or float(price) < float(day_entry['best_price']):
-                    day_entry['best_price'] = price
-        except Exception:
-            # Ignore rows with non-numeric price
-            pass
 
-    # Build response with the same shape used by the frontend, plus sold_out flags per day
-    competitors_data = []
-    for comp in competitors:
-        comp_map = price_map.get(comp.id, {})
-        prices_for_week = []
-        sold_out_for_week = []
-        for d in week_dates:
-            entry = comp_map.get(d)
-            if not entry:
-                prices_for_week.append(None)
-                sold_out_for_week.append(False)
-                continue
-            if entry['best_price'] is not None:
-                prices_for_week.append(entry['best_price'])
-                sold_out_for_week.append(False)
-            elif entry['sold_out']:
-                # Represent sold-out as null (no numeric price)
-                prices_for_week.append(None)
-                sold_out_for_week.append(True)
-            else:
-                prices_for_week.append(None)
-                sold_out_for_week.append(False)
-
-        competitors_data.append({
-            'id': comp.id,
-            'name': comp.competitor_name,
-            'prices': prices_for_week,
-            'sold_out': sold_out_for_week,
-        })
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def competitor_prices_heatmap(request, property_id):
+    """
+    Returns a competitor x date matrix of lowest competitor prices for an arbitrary date window
+    (e.g. the 90-day market view) in one call.
+    Query params:
+        - start_date (YYYY-MM-DD): First check-in date (required)
+        - end_date (YYYY-MM-DD): Last check-in date (required, at most 366 days after start_date)
+        - room_class (str): Only compare rooms of this canonical class (e.g. double, see room_classes)
+    Response:
+        {
+            "start_date": "2025-06-01",
+            "end_date": "2025-08-29",
+            "days": 90,
+            "currency": "EUR",                         # property currency, prices converted with today's FX rates
+            "competitors": [{"id": 1, "name": "Hotel X"}, ...],
+            "prices": [[56, null, 57, ...], ...],     # one row per competitor, one column per day
+            "sold_out": [[0, 1, 0, ...], ...]
+        }
+    X-Data-Refreshed-At / X-Data-Staleness-Seconds headers report when comp_prices_mv was last refreshed.
+    """
+    from .models import DpPropertyCompetitor, CompetitorPriceMV, Competitor
 
-    return Response({
-        'dates': [d.isoformat() for d in week_dates],
-        'competitors': competitors_data,
-    }, status=status.HTTP_200_OK)
+    start_date_str = request.query_params.get('start_date')
+    end_date_str = request.query_params.get('end_date')
+    if not start_date_str or not end_date_str:
+        return Response({
+            'error': 'start_date and end_date query parameters are required (YYYY-MM-DD)'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+    except ValueError:
+        return Response({
+            'error': 'Invalid date format, expected YYYY-MM-DD'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if end_date < start_date:
+        return Response({
+            'error': 'end_date must be after or equal to start_date'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    days = (end_date - start_date).days + 1
+    if days > MAX_HEATMAP_DAYS:
+        return Response({
+            'error': f'Date range cannot exceed {MAX_HEATMAP_DAYS} days'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        room_class = _parse_room_class(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not request.user.profile.properties.filter(id=property_id).exists():
+        logger.warning(f"User {request.user.username} attempted to access property {property_id} without ownership")
+        return Response({
+            'message': 'Property not found or access denied'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    competitors = list(
+        Competitor.objects.filter(
+            id__in=DpPropertyCompetitor.objects.filter(
+                property_id=property_id,
+                deleted_at__isnull=True
+            ).values('competitor_id')
+        ).order_by('competitor_name', 'id')
+    )
+    # Range filter instead of checkin_date__in, so the (competitor_id, checkin_date) index is range-scanned
+    mv_filter = {
+        'competitor_id__in': [comp.id for comp in competitors],
+        'checkin_date__gte': start_date,
+        'checkin_date__lte': end_date,
+    }
+    if room_class:
+        mv_filter['room_name__in'] = room_class_names(room_class)
+
+    currency = get_property_currency(property_id)
+    rate_date = timezone.now().date()
+
+    # Conditional GET: answer 304 before loading rows when no scrape changed
+    etag = compute_etag(
+        'competitor_heatmap', property_id, start_date, end_date, room_class, currency, rate_date,
+        *get_competitor_prices_validator(competitors, mv_filter)
+    )
+    if etag_matches(request, etag):
+        return with_refresh_headers(not_modified_response(etag))
+
+    # Single fetch and single reduction pass over the whole window
+    price_map = reduce_best_prices(
+        CompetitorPriceMV.objects
+        .filter(**mv_filter)
+        .values('competitor_id', 'checkin_date', 'price', 'currency', 'sold_out_message')
+        .iterator(chunk_size=5000),
+        convert=get_price_converter(currency, rate_date),
+    )
+    dates = [start_date + timedelta(days=i) for i in range(days)]
+    matrix = build_price_matrix(competitors, dates, price_map)
+
+    return with_refresh_headers(with_etag(Response({
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'days': days,
+        'currency': currency,
+        'competitors': [{'id': row['id'], 'name': row['name']} for row in matrix],
+        'prices': [row['prices'] for row in matrix],
+        'sold_out': [[int(flag) for flag in row['sold_out']] for row in matrix],
+    }, status=status.HTTP_200_OK), etag))
+
+
+# Maximum date window of the market bands
+MAX_MARKET_BANDS_DAYS = 731
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def market_positioning_bands(request, property_id):
+    """
+    Returns p25/p50/p75 competitor price bands per checkin_date and where our recom_price sits within them.
+    Query params:
+        - start_date (YYYY-MM-DD): First check-in date (defaults to today)
+        - end_date (YYYY-MM-DD): Last check-in date (defaults to the end of the pricing horizon,
+          future_days_to_price; at most 731 days after start_date)
+        - min_competitors (int): Priced competitors required for a band (defaults to the property setting)
+    Response:
+        {
+            "property_id": "abc-123",
+            "start_date": "2025-06-01",
+            "end_date": "2026-05-31",
+            "bands": [
+                {"checkin_date": "2025-06-01", "p25": 95.0, "p50": 110.0, "p75": 128.5, "competitors": 12,
+                 "recom_price": 115.0, "position_pct": 58.33, "band": "p50_p75"},
+                ...
+            ],
+            "count": 365
+        }
+    X-Data-Refreshed-At / X-Data-Staleness-Seconds headers report when comp_prices_mv was last refreshed.
+    """
+    property_obj = request.user.profile.properties.filter(id=property_id).first()
+    if property_obj is None:
+        logger.warning(f"User {request.user.username} attempted to access property {property_id} without ownership")
+        return Response({
+            'message': 'Property not found or access denied'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        start_date_str = request.query_params.get('start_date')
+        end_date_str = request.query_params.get('end_date')
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else timezone.now().date()
+        if end_date_str:
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+        else:
+            horizon = (
+                DpGeneralSettings.objects
+                .filter(property_id=property_id)
+                .values_list('future_days_to_price', flat=True)
+                .first()
+            ) or 365
+            end_date = start_date + timedelta(days=horizon - 1)
+        min_competitors = request.query_params.get('min_competitors')
+        min_competitors = int(min_competitors) if min_competitors is not None else None
+    except ValueError:
+        return Response({
+            'error': 'Invalid parameters, expected start_date/end_date as YYYY-MM-DD and an integer min_competitors'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if end_date < start_date:
+        return Response({
+            'error': 'end_date must be after or equal to start_date'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if (end_date - start_date).days + 1 > MAX_MARKET_BANDS_DAYS:
+        return Response({
+            'error': f'Date range cannot exceed {MAX_MARKET_BANDS_DAYS} days'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        bands = get_market_bands(property_id, start_date, end_date, min_competitors=min_competitors)
+    except Exception as e:
+        logger.error(f"Error computing market bands for property {property_id}: {str(e)}", exc_info=True)
+        return Response({
+            'message': 'An error occurred while computing market bands',
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return with_refresh_headers(Response({
+        'property_id': property_id,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'bands': bands,
+        'count': len(bands),
+    }, status=status.HTTP_200_OK))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def market_compression(request, property_id):
+    """
+    Returns the daily market compression index (share of followed competitors sold out or not taking reservations).
+    Reads the maintained daily market aggregates only, no scrape rows.
+    Query params:
+        - start_date (YYYY-MM-DD): First check-in date (defaults to today)
+        - end_date (YYYY-MM-DD): Last check-in date (defaults to start_date + 364 days, at most 731 days)
+    Response:
+        {
+            "property_id": "abc-123",
+            "start_date": "2025-06-01",
+            "end_date": "2026-05-31",
+            "compression": [
+                {"checkin_date": "2025-06-01", "compression_index": 0.25, "unavailable_competitors": 2,
+                 "available_competitors": 6},
+                ...                               # dates without scrape data are omitted
+            ],
+            "count": 365
+        }
+    """
+    if not request.user.profile.properties.filter(id=property_id).exists():
+        logger.warning(f"User {request.user.username} attempted to access property {property_id} without ownership")
+        return Response({
+            'message': 'Property not found or access denied'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        start_date_str = request.query_params.get('start_date')
+        end_date_str = request.query_params.get('end_date')
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else timezone.now().date()
+        end_date = (
+            datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str
+            else start_date + timedelta(days=364)
+        )
+    except ValueError:
+        return Response({
+            'error': 'Invalid date format, expected YYYY-MM-DD'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if end_date < start_date or (end_date - start_date).days + 1 > MAX_MARKET_BANDS_DAYS:
+        return Response({
+            'error': f'end_date must be on or after start_date and within {MAX_MARKET_BANDS_DAYS} days'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    aggregates = get_market_aggregates(property_id, start_date, end_date)
+    compression = [
+        {
+            'checkin_date': checkin_date.isoformat(),
+            'compression_index': aggregates[checkin_date].compression_index,
+            'unavailable_competitors': aggregates[checkin_date].unavailable_competitors,
+            'available_competitors': aggregates[checkin_date].available_competitors,
+        }
+        for checkin_date in sorted(aggregates)
+    ]
+    return with_refresh_headers(Response({
+        'property_id': property_id,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'compression': compression,
+        'count': len(compression),
+    }, status=status.HTTP_200_OK))
 
 
 @api_view(['GET'])
@@ -1830,11 +2590,15 @@ def competitor_prices_for_date(request, property_id):
     Returns a list of lowest competitor prices for a property for a given date.
     Query params:
         - date (YYYY-MM-DD): The date to fetch prices for (required)
+        - room_class (str): Only compare rooms of this canonical class (e.g. double, see room_classes)
     Response:
         [
-            {"id": 1, "name": "Hotel X", "price": 56, "currency": "USD", "room_name": "Standard Room"},
+            {"id": 1, "name": "Hotel X", "price": 56, "currency": "USD", "room_name": "Standard Room",
+             "room_class": "double"},
             ...
         ]
+    Prices are converted to the property currency (the currency field) with today's FX rates.
+    X-Data-Refreshed-At / X-Data-Staleness-Seconds headers report when comp_prices_mv was last refreshed.
     """
     from datetime import datetime
     from .models import DpPropertyCompetitor, DpHistoricalCompetitorPrice, CompetitorPriceMV, Competitor
@@ -1849,6 +2613,10 @@ def competitor_prices_for_date(request, property_id):
         date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
     except ValueError:
         return Response({'error': 'Invalid date format, expected YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        room_class = _parse_room_class(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     # Get competitors for the property (excluding deleted ones)
     competitor_links = DpPropertyCompetitor.objects.filter(
@@ -1865,10 +2633,24 @@ def competitor_prices_for_date(request, property_id):
     # Fetch prices from materialized view using Django ORM (no raw SQL)
     # Convert competitor names to slug format for matching with MV
     mv_competitor_ids = [comp.id for comp in competitors]
+    mv_filter = {'competitor_id__in': mv_competitor_ids, 'checkin_date': date_obj}
+    if room_class:
+        mv_filter['room_name__in'] = room_class_names(room_class)
+
+    currency = get_property_currency(property_id)
+    rate_date = timezone.now().date()
+
+    # Conditional GET: answer 304 before loading rows when no scrape changed
+    etag = compute_etag(
+        'competitor_prices_for_date', property_id, date_obj, room_class, currency, rate_date,
+        *get_competitor_prices_validator(competitors, mv_filter)
+    )
+    if etag_matches(request, etag):
+        return with_refresh_headers(not_modified_response(etag))
     
     mv_rows_qs = (
         CompetitorPriceMV.objects
-        .filter(competitor_id__in=mv_competitor_ids, checkin_date=date_obj)
+        .filter(**mv_filter)
         .order_by('competitor_id', 'price', 'room_name')
     )
     mv_rows = list(mv_rows_qs.values('competitor_id', 'hotel_name', 'room_name', 'price', 'raw_price', 'currency', 'sold_out_message', 'update_tz'))
@@ -1887,6 +2669,7 @@ def competitor_prices_for_date(request, property_id):
         price_lookup[comp_key] = row
     
     # Build response - match competitors with their prices
+    convert = get_price_converter(currency, rate_date)
     competitors_data = []
     for comp in competitors:
         # Try to find a matching row by competitor name (converted to slug format)
@@ -1905,14 +2688,19 @@ def competitor_prices_for_date(request, property_id):
             # If price is zero and not sold out, hide this competitor (skip)
             if price_is_zero and not sold_out:
                 continue
+            price = None if sold_out else convert(row['price'], row.get('currency'))
+            # Without an FX rate the price cannot be shown in the property currency
+            if price is None and row['price'] is not None and not sold_out:
+                continue
 
             competitor_data = {
                 'id': comp.id,
                 'name': comp.competitor_name,
                 # If sold out, hide numeric price and signal sold_out to client
-                'price': None if sold_out else row['price'],
-                'currency': row.get('currency'),
+                'price': price,
+                'currency': currency,
                 'room_name': row.get('room_name'),
+                'room_class': get_room_class(row.get('room_name')),
                 'sold_out': sold_out,
                 'sold_out_message': row.get('sold_out_message') if sold_out else None,
             }
@@ -1922,7 +2710,7 @@ def competitor_prices_for_date(request, property_id):
 
     # Minimal summary log
     print(f"[COMPETITOR_PRICES] {len(competitors_data)} competitors returned for {date_obj}")
-    return Response(competitors_data, status=status.HTTP_200_OK)
+    return with_refresh_headers(with_etag(Response(competitors_data, status=status.HTTP_200_OK), etag))
 
 
 class FetchCompetitorsView(APIView):
@@ -2912,7 +3700,21 @@ class PropertyCompetitorUpdateView(APIView):
             if 'competitor_name' in request.data:
                 old_name = competitor.competitor_name
                 competitor.competitor_name = request.data['competitor_name']
-                competitor.save()
+                duplicate = Competitor.objects.filter(
+                    normalized_name=Competitor.normalize_name(competitor.competitor_name or '')
+                ).exclude(pk=competitor.pk)
+                if duplicate.exists():
+                    return Response({
+                        'message': 'A competitor with this name already exists'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                try:
+                    with transaction.atomic():
+                        competitor.save()
+                except IntegrityError:
+                    # Another request took the name between the check and the save
+                    return Response({
+                        'message': 'A competitor with this name already exists'
+                    }, status=status.HTTP_400_BAD_REQUEST)
                 print(f"📝 Updating competitor_name: '{old_name}' -> '{competitor.competitor_name}'")
             
             if 'booking_link' in request.data:
@@ -3478,6 +4280,9 @@ class DynamicIncrementsV2CreateView(APIView):
                             'errors': error_detail if isinstance(error_detail, dict) else None,
                         }, status=status.HTTP_400_BAD_REQUEST)
                     
+                    if result['created_rules']:
+                        invalidate_increment_matrix(property_id)
+
                     # Serialize the created rules for response
                     created_rules_data = DynamicIncrementsV2Serializer(
                         result['created_rules'], 
@@ -3504,6 +4309,7 @@ class DynamicIncrementsV2CreateView(APIView):
                 
                 if serializer.is_valid():
                     dynamic_increment = serializer.save()
+                    invalidate_increment_matrix(property_id)
                     
                     return Response({
                         'message': 'Dynamic increment created successfully',
@@ -3575,6 +4381,7 @@ class DynamicIncrementsV2UpdateView(APIView):
             
             if serializer.is_valid():
                 updated_rule = serializer.save()
+                invalidate_increment_matrix(property_id)
                 
                 return Response({
                     'message': 'Dynamic increment updated successfully',
@@ -3633,6 +4440,8 @@ class DynamicIncrementsV2BulkUpdateView(APIView):
             
             if serializer.is_valid():
                 result = serializer.update(property_instance, serializer.validated_data)
+                if result['updated_rules']:
+                    invalidate_increment_matrix(property_id)
                 
                 # Serialize the updated rules for response
                 updated_rules_data = DynamicIncrementsV2Serializer(
@@ -3697,6 +4506,7 @@ class DynamicIncrementsV2DeleteView(APIView):
             occupancy_category = dynamic_increment.get_occupancy_category_display()
             lead_time_category = dynamic_increment.get_lead_time_category_display()
             dynamic_increment.delete()
+            invalidate_increment_matrix(property_id)
             
             return Response({
                 'message': 'Dynamic increment deleted successfully',
@@ -4537,6 +5347,8 @@ class InitializePropertyDefaultsView(APIView):
                     print(f"[InitializePropertyDefaultsView] {error_msg}")
                     errors.append(error_msg)
             
+            if increments_created:
+                invalidate_increment_matrix(property_id)
             logger.info(f"Created {increments_created} dynamic increments, skipped {increments_skipped} existing ones")
             print(f"[InitializePropertyDefaultsView] Summary increments_created={increments_created} increments_skipped={increments_skipped} settings_created={settings_created}")
             
@@ -4855,3 +5667,92 @@ class PropertyCompetitorsView(APIView):
                 'message': 'An error occurred while retrieving the property competitors',
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def simulate_pricing(request, property_id):
+    """
+    Previews how unsaved dynamic increment, offer and MSP changes would move the recommended prices.
+    The changes are overlaid on the stored rules in memory; nothing is saved, and the rules and
+    inputs are loaded with a fixed number of queries whatever the horizon.
+    Body:
+        {
+            "increments": [{"id": 12, "increment_value": 15},                # update a stored rule
+                           {"occupancy_category": "80-90", "lead_time_category": "0-1",
+                            "increment_type": "Percentage", "increment_value": 10}],  # new rule
+            "msp_periods": [{"valid_from": "2025-08-01", "valid_until": "2025-08-31", "msp": 90}],
+            "offers": [{"id": 7, "delete": true}],                             # remove a stored rule
+            "start_date": "2025-06-01",                                        # optional, defaults to today
+            "days": 365                                                        # optional, at most 731
+        }
+    Response:
+        {
+            "property_id": "abc-123",
+            "start_date": "2025-06-01",
+            "days": 365,
+            "summary": {"changed_dates": 31, "avg_delta": 4.2, "min_delta": 0, "max_delta": 12},
+            "prices": [
+                {"checkin_date": "2025-06-01", "old_price": 100, "new_price": 110, "delta": 10},
+                ...                               # old/new price is null without a base price
+            ]
+        }
+    """
+    if not request.user.profile.properties.filter(id=property_id).exists():
+        logger.warning(f"User {request.user.username} attempted to access property {property_id} without ownership")
+        return Response({
+            'message': 'Property not found or access denied'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    serializer = PricingSimulationSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'error': 'Invalid simulation request',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+
+    try:
+        start_date, old, new = simulate_rule_changes(
+            property_id, data, start_date=data.get('start_date'), days=data['days']
+        )
+    except ValueError as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    old_prices = old['recom_price']
+    new_prices = new['recom_price']
+    delta = new_prices - old_prices
+    priced_delta = delta[~np.isnan(delta)]
+    prices = [
+        {
+            'checkin_date': (start_date + timedelta(days=i)).isoformat(),
+            'old_price': None if np.isnan(old_prices[i]) else int(old_prices[i]),
+            'new_price': None if np.isnan(new_prices[i]) else int(new_prices[i]),
+            'delta': None if np.isnan(delta[i]) else int(delta[i]),
+        }
+        for i in range(len(new_prices))
+    ]
+
+    log_operation(
+        logger, LogLevel.INFO,
+        f"Pricing simulation for property {property_id}",
+        "pricing_simulation",
+        request, request.user,
+        property_id=property_id,
+        days=data['days'],
+        changed_dates=int(np.count_nonzero(priced_delta))
+    )
+    return Response({
+        'property_id': property_id,
+        'start_date': start_date.isoformat(),
+        'days': data['days'],
+        'summary': {
+            'changed_dates': int(np.count_nonzero(priced_delta)),
+            'avg_delta': round(float(priced_delta.mean()), 2) if len(priced_delta) else None,
+            'min_delta': int(priced_delta.min()) if len(priced_delta) else None,
+            'max_delta': int(priced_delta.max()) if len(priced_delta) else None,
+        },
+        'prices': prices,
+    }, status=status.HTTP_200_OK)
@@ -287,6 +287,49 @@ def bulk_create_notifications(users, notification_type, title, description,
     return notifications
 
 
+def create_notifications_in_bulk(entries, batch_size=500):
+    """
+    Create many (different) notifications with bulk inserts
+    
+    Use for scheduled jobs that emit one notification per event; unlike
+    bulk_create_notifications this issues one INSERT per batch instead of one per user.
+    
+    Args:
+        entries: List of dicts with the create_notification arguments (user, notification_type,
+                 title, description and optionally category, priority, action_url, metadata,
+                 expires_in_days)
+        batch_size: Notifications inserted per query (default: 500)
+        
+    Returns:
+        List of created Notification objects
+    """
+    now = timezone.now()
+    notifications = []
+    for entry in entries:
+        expires_in_days = entry.get('expires_in_days')
+        user = entry['user']
+        notifications.append(Notification(
+            user_id=user if isinstance(user, int) else user.id,
+            type=entry['notification_type'],
+            title=entry['title'][:200],
+            description=entry['description'],
+            category=entry.get('category', 'general'),
+            priority=entry.get('priority', 'medium'),
+            action_url=entry.get('action_url'),
+            metadata=entry.get('metadata') or {},
+            expires_at=now + timedelta(days=expires_in_days) if expires_in_days else None,
+        ))
+    
+    try:
+        created = Notification.objects.bulk_create(notifications, batch_size=batch_size)
+    except Exception as e:
+        logger.error(f"Failed to bulk create {len(notifications)} notifications: {str(e)}", exc_info=True)
+        return []
+    
+    logger.info(f"Bulk inserted {len(created)} notifications")
+    return created
+
+
 def delete_expired_notifications():
     """
     Delete all expired notifications from the database
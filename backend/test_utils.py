@@ -134,3 +134,48 @@ def create_test_property_competitor(property, user=None, competitor=None, **kwar
     }
     defaults.update(kwargs)
     return DpPropertyCompetitor.objects.create(**defaults)
+
+
+class UnmanagedTablesMixin:
+    """
+    Test case mixin that creates tables for unmanaged models (e.g. comp_prices_mv).
+
+    Tables are created before the class-level transaction starts, since the SQLite
+    schema editor cannot run inside an atomic block.
+    """
+    unmanaged_models = []
+
+    @classmethod
+    def setUpClass(cls):
+        from django.db import connection
+        with connection.schema_editor() as editor:
+            for model in cls.unmanaged_models:
+                editor.create_model(model)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        from django.db import connection
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            for model in cls.unmanaged_models:
+                editor.delete_model(model)
+
+
+def create_test_competitor_price(competitor, checkin_date, price, **kwargs):
+    """Create a test comp_prices_mv row (requires UnmanagedTablesMixin)."""
+    from django.utils import timezone
+    from dynamic_pricing.models import CompetitorPriceMV
+
+    defaults = {
+        'competitor_id': competitor.id,
+        'hotel_name': competitor.competitor_name,
+        'room_name': 'Standard Room',
+        'checkin_date': checkin_date,
+        'raw_price': price,
+        'price': price,
+        'currency': 'EUR',
+        'update_tz': timezone.now(),
+    }
+    defaults.update(kwargs)
+    return CompetitorPriceMV.objects.create(**defaults)
@@ -267,8 +267,31 @@ EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 
-# Redis settings (commented out - not needed for current setup)
-# REDIS_URL = config('REDIS_URL', default='redis://redis:6379/0')
+# Cache settings
+# Redis backs the price calendar response cache. Invalidations must reach every
+# gunicorn worker and management command, so a per-process local memory cache is
+# only allowed for local development
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'vivere',
+        }
+    }
+elif not DEBUG or ENVIRONMENT == 'production':
+    from django.core.exceptions import ImproperlyConfigured
+    raise ImproperlyConfigured('REDIS_URL must be set outside local development (shared cache required)')
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds a cached price calendar response is kept (writes invalidate it explicitly)
+PRICE_CALENDAR_CACHE_TIMEOUT = config('PRICE_CALENDAR_CACHE_TIMEOUT', default=900, cast=int)
 
 SOCIALACCOUNT_PROVIDERS = {
     'google': {